@@ -1,20 +1,70 @@
+import sys
 import psycopg2
+from psycopg2.extras import execute_values
 import pandas as pd
 import numpy as np
+from typing import Dict, List, Optional, Tuple
 from read_data import EmssanarDataReader
+from enriquecimiento_cups import COLUMNAS_BANDERAS
+from metricas import medir
+from instrumentacion_bd import ConexionInstrumentada
+from sentencias_preparadas import SentenciaPreparada
 
 class Query:
-    def __init__(self):
-        self.conn = psycopg2.connect(
+    # Columna de solicitudes_servicios -> clave del registro leído del Excel
+    _CAMPOS_SOLICITUD = (
+        ("codigo_servicio_completo", "codigo_servicio_completo"),
+        ("doc_afiliado", "doc_afiliado"),
+        ("numero_solicitud", "numero_solicitud"),
+        ("cod_diag", "cod_diag"),
+        ("desc_diag", "desc_diag"),
+        ("clasificacion_servicios_acceso", "clasificacion_servicios_acceso"),
+        ("descr_servicio_1", "descr_servicio_1"),
+        ("estado_solicitud", "estado_solicitud"),
+        ("num_autorizacion", "num_autorizacion"),
+        ("fecha_autorizacion_1", "fecha_autorizacion_1"),
+        ("ips_asignada", "ips_asignada"),
+        ("ciudad_ips_asignada", "ciudad_ips_asignada"),
+        ("cantidad", "cantidad"),
+        ("primer_nom", "primer_nom"),
+        ("segundo_nom", "segundo_nom"),
+        ("primer_ape", "primer_ape"),
+        ("segundo_ape", "segundo_ape"),
+        ("edad_anios", "edad_anios"),
+        ("estado_solicitud_2", "estado_solicitud_2"),
+        ("ips_solicitante", "ips_solicita"),
+    )
+
+    # Índice de la consulta por afiliado (ver GestorEsquema.INDICES)
+    _INDICE_AFILIADO = "idx_solicitudes_servicios_doc_afiliado"
+
+    # Sentencias de una fila (inserción fila por fila y verificación individual) que se
+    # preparan en el servidor una vez por conexión (ver sentencias_preparadas.py)
+    _EXISTE_SOLICITUD = SentenciaPreparada(
+        "solicitud_existe", "SELECT COUNT(*) FROM solicitudes_servicios WHERE numero_solicitud = %s;")
+
+    def __init__(self, conn=None, preparar: Optional[bool] = None):
+        """
+        Args:
+            conn: Conexión ya abierta (p. ej. del pool de MonitorConexion). Si se omite
+                se abre una con los parámetros por defecto.
+            preparar: Usar sentencias preparadas en el servidor para las sentencias de una
+                fila; None toma sentencias_preparadas.PREPARADAS_HABILITADAS.
+        """
+        self.preparar = preparar
+        self._conexion_propia = conn is None
+        self.conn = conn if conn is not None else psycopg2.connect(
             host="192.168.9.177",
             port=5432,
             database="practica",
             user="postgres",
-            password="postgres"
+            password="postgres",
+            connection_factory=ConexionInstrumentada
         )
 
     def cerrar_conexion(self):
-        if self.conn:
+        """Cierra la conexión si fue abierta por esta instancia (las recibidas las cierra su dueño)."""
+        if self.conn and self._conexion_propia:
             self.conn.close()
 
     def obtener_solicitudes_existentes(self) -> set:
@@ -56,60 +106,7 @@ class Query:
         
         try:
             cursor = self.conn.cursor()
-
-            query = """
-                INSERT INTO solicitudes_servicios (
-                    codigo_servicio_completo,
-                    doc_afiliado,
-                    numero_solicitud,
-                    cod_diag,
-                    desc_diag,
-                    clasificacion_servicios_acceso,
-                    descr_servicio_1,
-                    estado_solicitud,
-                    num_autorizacion,
-                    fecha_autorizacion_1,
-                    ips_asignada,
-                    ciudad_ips_asignada,
-                    cantidad,
-                    primer_nom,
-                    segundo_nom,
-                    primer_ape,
-                    segundo_ape,
-                    edad_anios,
-                    estado_solicitud_2,
-                    ips_solicitante
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                    %s,%s,
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s
-                );
-            """
-
-            values = (
-                data.get("codigo_servicio_completo"),
-                data.get("doc_afiliado"),
-                data.get("numero_solicitud"),
-                data.get("cod_diag"),
-                data.get("desc_diag"),
-                data.get("clasificacion_servicios_acceso"),
-                data.get("descr_servicio_1"),
-                data.get("estado_solicitud"),
-                data.get("num_autorizacion"),
-                data.get("fecha_autorizacion_1"),
-                data.get("ips_asignada"),
-                data.get("ciudad_ips_asignada"),
-                data.get("cantidad"),
-                data.get("primer_nom"),
-                data.get("segundo_nom"),
-                data.get("primer_ape"),
-                data.get("segundo_ape"),
-                data.get("edad_anios"),
-                data.get("estado_solicitud_2"),
-                data.get("ips_solicita"),
-            )
-
-            cursor.execute(query, values)
+            self._ejecutar_insercion(cursor, data)
             self.conn.commit()
             cursor.close()
             return True
@@ -118,7 +115,149 @@ class Query:
             print(f"Error insertando solicitud {numero_solicitud}:", e)
             self.conn.rollback()
             return False
+
+    def _sql_insertar(self, valores: str = None, tabla: str = None) -> str:
+        """
+        INSERT en solicitudes_servicios (o en una de sus particiones); por defecto con los
+        marcadores de una fila.
+        """
+        if valores is None:
+            valores = "(" + ", ".join(["%s"] * len(self._CAMPOS_SOLICITUD)) + ")"
+        columnas = ", ".join(columna for columna, _ in self._CAMPOS_SOLICITUD)
+        return f"INSERT INTO {tabla or 'solicitudes_servicios'} ({columnas}) VALUES {valores}"
+
+    def _ejecutar_insercion(self, cursor, data: dict, tabla: str = None):
+        """INSERT de una fila como sentencia preparada (una por tabla de destino)."""
+        SentenciaPreparada.para("solicitud_insertar", self._sql_insertar(tabla=tabla)).ejecutar(
+            cursor, self._valores_solicitud(data), self.preparar)
+
+    def _valores_solicitud(self, data: dict) -> tuple:
+        """Valores de un registro en el orden de _CAMPOS_SOLICITUD."""
+        return tuple(data.get(clave) for _, clave in self._CAMPOS_SOLICITUD)
+
+    def insertar_solicitudes_lote(self, registros: List[Dict], tamano_pagina: int = 500,
+                                  metricas=None, tabla: str = None) -> Tuple[int, List[Tuple[str, str]]]:
+        """
+        Inserta un lote de solicitudes (ya filtradas contra las existentes) en una transacción,
+        con INSERT ... VALUES de varias filas (execute_values).
+        Si el lote falla se revierte y se reintenta fila por fila para aislar los registros con error.
+        Con metricas (MetricasEjecucion) se registran las etapas 'carga' y 'commit'.
+        Con tabla (una partición, ver esquema_solicitudes.repartir_por_particion) se inserta
+        directamente en ella, sin el enrutamiento fila por fila de la tabla particionada.
+        
+        Returns:
+            (insertados, errores): cantidad insertada y (numero_solicitud, mensaje) por cada
+            registro rechazado.
+        """
+        if not registros:
+            return 0, []
+        try:
+            cursor = self.conn.cursor()
+            with medir(metricas, 'carga') as medida:
+                self._enviar_lote(cursor, registros, tamano_pagina, tabla)
+                medida['filas'] = len(registros)
+            with medir(metricas, 'commit'):
+                self.conn.commit()
+            cursor.close()
+            return len(registros), []
+        except Exception:
+            self.conn.rollback()
+        
+        with medir(metricas, 'carga', filas=len(registros)):
+            return self._insertar_filas(registros, tabla)
+
+    def _enviar_lote(self, cursor, registros: List[Dict], tamano_pagina: int, tabla: str = None):
+        """Envía el INSERT del lote (sin commit); QueryPipeline lo reemplaza por el modo pipeline."""
+        execute_values(cursor, self._sql_insertar("%s", tabla),
+                       [self._valores_solicitud(r) for r in registros], page_size=tamano_pagina)
+
+    def _insertar_filas(self, registros: List[Dict], tabla: str = None) -> Tuple[int, List[Tuple[str, str]]]:
+        """Inserta fila por fila, con commit individual (respaldo de insertar_solicitudes_lote)."""
+        insertados, errores = 0, []
+        for data in registros:
+            try:
+                cursor = self.conn.cursor()
+                self._ejecutar_insercion(cursor, data, tabla)
+                self.conn.commit()
+                cursor.close()
+                insertados += 1
+            except Exception as e:
+                self.conn.rollback()
+                errores.append((str(data.get("numero_solicitud")), str(e).strip()))
+        return insertados, errores
     
+    def obtener_banderas_cups(self) -> pd.DataFrame:
+        """
+        Obtiene del catálogo codigos_cups las banderas preparacion_especial y remitido
+        para enriquecer las solicitudes (ver enriquecimiento_cups.enriquecer_con_cups).
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT codigo_cups, preparacion_especial, remitido FROM codigos_cups;")
+            resultados = cursor.fetchall()
+            cursor.close()
+            return pd.DataFrame(resultados, columns=['codigo_cups', 'preparacion_especial', 'remitido'])
+        except Exception as e:
+            print(f"Error obteniendo banderas CUPS: {e}")
+            self.conn.rollback()
+            return pd.DataFrame(columns=['codigo_cups', 'preparacion_especial', 'remitido'])
+
+    def consultar_por_afiliado(self, doc_afiliado) -> pd.DataFrame:
+        """
+        Solicitudes de un afiliado en solicitudes_servicios (todas las cargas), con las mismas
+        columnas, en el mismo orden e indexadas igual que EmssanarDataReader.consultar_por_afiliado,
+        más las banderas preparacion_especial y remitido del catálogo codigos_cups (el mismo
+        cruce que la vista v_solicitudes_cups; False si el código no está en el catálogo).
+        Los errores de la base de datos se propagan (no se confunden con "sin registros").
+        """
+        columnas = ", ".join(f"s.{columna}" if columna == clave else f"s.{columna} AS {clave}"
+                             for columna, clave in self._CAMPOS_SOLICITUD)
+        banderas = ", ".join(f"COALESCE(c.{columna}, FALSE) AS {columna}" for columna in COLUMNAS_BANDERAS)
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                f"""SELECT {columnas}, {banderas}
+                    FROM solicitudes_servicios s
+                    LEFT JOIN codigos_cups c ON c.codigo_cups = s.codigo_servicio_completo
+                    WHERE s.doc_afiliado = %s
+                    ORDER BY s.fecha_autorizacion_1, s.numero_solicitud;""", (str(doc_afiliado).strip(),))
+            nombres = [d[0] for d in cursor.description]
+            df = pd.DataFrame(cursor.fetchall(), columns=nombres)
+            cursor.close()
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        df = df[list(EmssanarDataReader.COLUMNAS_REQUERIDAS) + list(COLUMNAS_BANDERAS)]
+        df['doc_afiliado'] = df['doc_afiliado'].astype(str)
+        return df.set_index('doc_afiliado', drop=False)
+
+    def verificar_indice_afiliado(self) -> bool:
+        """
+        Comprueba en el catálogo que el índice por doc_afiliado exista y sea válido (una
+        creación interrumpida lo deja inválido) y advierte si no. No crea nada: el índice lo
+        crean GestorEsquema.asegurar, migrar_cli.py --crear-esquema o crear_indice_afiliado.sql.
+        Retorna True si el índice está disponible.
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT i.indisvalid FROM pg_index i WHERE i.indexrelid = to_regclass(%s);",
+                           (self._INDICE_AFILIADO,))
+            fila = cursor.fetchone()
+            cursor.close()
+            self.conn.commit()
+        except Exception as e:
+            print(f"No se pudo verificar el índice por afiliado: {e}")
+            self.conn.rollback()
+            return False
+        if fila is None:
+            print(f"Falta el índice {self._INDICE_AFILIADO}: la consulta por afiliado recorrerá toda la tabla "
+                  f"(créelo con migrar_cli.py --crear-esquema o crear_indice_afiliado.sql)")
+        elif not fila[0]:
+            print(f"El índice {self._INDICE_AFILIADO} es inválido (creación interrumpida): "
+                  f"elimínelo y vuelva a crearlo (crear_indice_afiliado.sql)")
+        return bool(fila and fila[0])
+
     def existe_solicitud(self, numero_solicitud: str) -> bool:
         """
         Verifica si una solicitud ya existe en la base de datos.
@@ -126,8 +265,7 @@ class Query:
         """
         try:
             cursor = self.conn.cursor()
-            query = "SELECT COUNT(*) FROM solicitudes_servicios WHERE numero_solicitud = %s;"
-            cursor.execute(query, (str(numero_solicitud),))
+            self._EXISTE_SOLICITUD.ejecutar(cursor, (str(numero_solicitud),), self.preparar)
             resultado = cursor.fetchone()
             cursor.close()
             return resultado[0] > 0
@@ -136,67 +274,21 @@ class Query:
             return False
 
 if __name__ == "__main__":
+    # Migración con los parámetros por defecto; para otra base de datos, archivos,
+    # tamaño de lote o salida JSON usar migrar_cli.py (mismo motor)
+    from motor_migracion import CanalConsola, MotorMigracion
+
     print("Iniciando proceso de migración Excel -> Base de Datos...")
     
-    # 1. Instanciar el lector de datos
-    lector = EmssanarDataReader()
-    
     try:
-        # 2. Cargar los datos (accedemos al método interno para forzar carga completa)
-        lector._cargar_datos()
-        df = lector._df
+        motor = MotorMigracion(crear_query=Query, canal=CanalConsola(stream=sys.stdout))
+        stats = motor.migrar_archivo(EmssanarDataReader().ruta_archivo)
         
-        if df is not None and not df.empty:
-            print(f"Se encontraron {len(df)} registros para procesar.")
-            
-            
-            df = df.where(pd.notnull(df), None)
-            
-            # 4. Conectar a Base de Datos y obtener solicitudes existentes
-            db = Query()
-            print("Verificando registros existentes en la base de datos...")
-            solicitudes_existentes = db.obtener_solicitudes_existentes()
-            print(f"Se encontraron {len(solicitudes_existentes)} registros ya existentes en la base de datos.")
-            
-            # 5. Filtrar registros nuevos (que no existen en la BD)
-            print("Filtrando registros nuevos...")
-            df['numero_solicitud_str'] = df['numero_solicitud'].astype(str)
-            df_nuevos = df[~df['numero_solicitud_str'].isin(solicitudes_existentes)].copy()
-            df_nuevos = df_nuevos.drop(columns=['numero_solicitud_str'])
-            
-            duplicados = len(df) - len(df_nuevos)
-            print(f"Registros nuevos a insertar: {len(df_nuevos)}")
-            print(f"Registros duplicados (omitidos): {duplicados}")
-            
-            # 6. Insertar solo los registros nuevos
-            if not df_nuevos.empty:
-                contador = 0
-                insertados = 0
-                
-                for index, row in df_nuevos.iterrows():
-                    # Convertimos la fila a diccionario
-                    data = row.to_dict()
-                    
-                    # Insertar (ya sabemos que no existe, pero mantenemos la verificación por seguridad)
-                    if db.insertar_solicitud_servicio(data, solicitudes_existentes):
-                        insertados += 1
-                    
-                    contador += 1
-                    if contador % 100 == 0:
-                        print(f"Procesados {contador}/{len(df_nuevos)} registros nuevos...")
-                
-                print(f"\n¡Proceso completado!")
-                print(f"Total registros en Excel: {len(df)}")
-                print(f"Registros nuevos insertados: {insertados}")
-                print(f"Registros duplicados (omitidos): {duplicados}")
-            else:
-                print(f"\n¡Proceso completado!")
-                print(f"Todos los registros ({len(df)}) ya existen en la base de datos.")
-                print(f"No se insertaron nuevos registros.")
-            
-            db.cerrar_conexion()
-        else:
-            print("El archivo Excel parece estar vacío o no se cargaron datos.")
-            
+        print(f"\n¡Proceso completado!")
+        print(f"Total registros en Excel: {stats['total']}")
+        print(f"Registros nuevos insertados: {stats['insertados']}")
+        print(f"Registros duplicados (omitidos): {stats['duplicados']}")
+        print(f"Requieren preparación especial: {stats['preparacion_especial']}")
+        print(f"Para remitir a laboratorio de referencia: {stats['remitido']}")
     except Exception as e:
         print(f"Ocurrió un error crítico: {e}")
@@ -0,0 +1,35 @@
+-- Script de actualización para búsquedas por nombre en codigos_cups
+-- Ejecutar después de setup_codigos_cups_table.sql (en pgAdmin o psql)
+-- También puede aplicarse desde Python con CupsQuery.actualizar_esquema_busqueda()
+
+-- Extensiones necesarias: trigramas y eliminación de tildes
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() no es IMMUTABLE y no puede usarse en un índice;
+-- esta envoltura fija el diccionario y sí puede indexarse
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS
+$$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+
+-- Índice GIN de trigramas sobre el nombre normalizado (minúsculas y sin tildes).
+-- Atiende LIKE '%texto%' sin recorrer toda la tabla.
+CREATE INDEX IF NOT EXISTS idx_codigos_cups_nombre_trgm
+    ON codigos_cups USING gin (f_unaccent(LOWER(nombre_estudio)) gin_trgm_ops);
+
+-- Índices para la paginación por clave, ordenada por nombre (COALESCE evita perder filas sin
+-- nombre) o por código. COLLATE "C" ordena por bytes, igual que el catálogo en memoria de la
+-- aplicación, para que el orden no dependa de cuál de los dos respondió
+DROP INDEX IF EXISTS idx_codigos_cups_nombre_codigo;
+CREATE INDEX IF NOT EXISTS idx_codigos_cups_nombre_codigo_c
+    ON codigos_cups ((COALESCE(nombre_estudio, '') COLLATE "C"), (codigo_cups COLLATE "C"));
+CREATE INDEX IF NOT EXISTS idx_codigos_cups_codigo_c
+    ON codigos_cups ((codigo_cups COLLATE "C"));
+
+-- Actualizar estadísticas para que el planificador use el nuevo índice
+ANALYZE codigos_cups;
+
+-- Verificar los índices de la tabla
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename = 'codigos_cups';
@@ -0,0 +1,128 @@
+import threading
+from typing import Callable, ContextManager, Optional, Tuple
+
+import pandas as pd
+
+from Query import Query
+
+
+class LectorAfiliadosBD:
+    """
+    Consulta por afiliado sobre solicitudes_servicios con la misma interfaz que
+    EmssanarDataReader (cargado, cargar, consultar_por_afiliado), para usarla como fuente
+    de BuscadorAfiliados. La "carga" es verificar que exista el índice por doc_afiliado
+    (solo se advierte si falta: el esquema lo crea GestorEsquema).
+    """
+
+    def __init__(self, conexion: Callable[[], ContextManager]):
+        """
+        Args:
+            conexion: Retorna un context manager que entrega una conexión (p. ej. MonitorConexion.conexion).
+        """
+        self._conexion = conexion
+        self._indice_verificado = False
+
+    @property
+    def cargado(self) -> bool:
+        return self._indice_verificado
+
+    def cargar(self):
+        """Verifica el índice por doc_afiliado una vez por sesión (sin crearlo)."""
+        with self._conexion() as conn:
+            Query(conn=conn).verificar_indice_afiliado()
+        self._indice_verificado = True
+
+    def consultar_por_afiliado(self, doc_afiliado) -> pd.DataFrame:
+        with self._conexion() as conn:
+            return Query(conn=conn).consultar_por_afiliado(doc_afiliado)
+
+
+class BuscadorAfiliados:
+    """
+    Atiende las consultas por afiliado de la interfaz en un hilo propio.
+
+    La fuente es un archivo Excel o la base de datos (LectorAfiliadosBD, con archivo None).
+    La primera consulta sobre un archivo carga su índice (caché pickle o lectura del Excel),
+    lo que puede tardar minutos; mientras tanto las nuevas consultas quedan en espera y la
+    más reciente se atiende apenas el índice está listo. Cancelar descarta la consulta
+    pendiente y la que espera al índice; la carga en sí no puede interrumpirse, pero su
+    resultado se conserva para las consultas siguientes sobre el mismo archivo.
+    """
+
+    def __init__(self, obtener_lector: Callable[[str], object],
+                 al_cargando: Callable[[int, str], None],
+                 al_resultado: Callable[[int, str, pd.DataFrame], None],
+                 al_error: Callable[[int, str], None]):
+        """
+        Args:
+            obtener_lector: Retorna el EmssanarDataReader (con caché) de un archivo, o el
+                LectorAfiliadosBD si el archivo es None.
+            al_cargando: Se llama (desde el hilo del buscador) con (generacion, archivo)
+                cuando la consulta debe esperar la carga del índice.
+            al_resultado: Se llama con (generacion, documento, resultados).
+            al_error: Se llama con (generacion, mensaje).
+        """
+        self._obtener_lector = obtener_lector
+        self._al_cargando = al_cargando
+        self._al_resultado = al_resultado
+        self._al_error = al_error
+        self._condicion = threading.Condition()
+        self._pendiente: Optional[Tuple[Optional[str], str]] = None
+        self._generacion = 0
+        self._activo = True
+        self._hilo = threading.Thread(target=self._ciclo, daemon=True)
+        self._hilo.start()
+
+    @property
+    def generacion(self) -> int:
+        """Generación de la última solicitud recibida."""
+        return self._generacion
+
+    def solicitar(self, archivo: Optional[str], documento: str) -> int:
+        """
+        Encola la consulta de un documento (archivo None = base de datos), reemplazando la
+        pendiente. Retorna su generación.
+        """
+        with self._condicion:
+            self._generacion += 1
+            self._pendiente = (archivo, documento)
+            self._condicion.notify()
+            return self._generacion
+
+    def cancelar(self):
+        """Descarta la consulta pendiente y la que esté en curso."""
+        with self._condicion:
+            self._generacion += 1
+            self._pendiente = None
+
+    def detener(self):
+        """Detiene el hilo al terminar la consulta en curso."""
+        with self._condicion:
+            self._activo = False
+            self._pendiente = None
+            self._condicion.notify()
+
+    def _ciclo(self):
+        while True:
+            with self._condicion:
+                while self._activo and self._pendiente is None:
+                    self._condicion.wait()
+                if not self._activo:
+                    break
+                (archivo, documento), self._pendiente = self._pendiente, None
+                generacion = self._generacion
+
+            try:
+                lector = self._obtener_lector(archivo)
+                if not lector.cargado:
+                    self._al_cargando(generacion, archivo)
+                    lector.cargar()
+                # Durante la carga pudo llegar otra consulta o una cancelación
+                if generacion != self._generacion:
+                    continue
+                resultados = lector.consultar_por_afiliado(documento)
+                if generacion == self._generacion:
+                    self._al_resultado(generacion, documento, resultados)
+            except Exception as e:
+                if generacion == self._generacion:
+                    self._al_error(generacion, str(e))
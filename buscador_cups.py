@@ -0,0 +1,124 @@
+import threading
+from typing import Callable, Dict, Optional
+
+from psycopg2.extensions import QueryCanceledError
+
+
+class BuscadorCupsIncremental:
+    """
+    Ejecuta las búsquedas CUPS de la interfaz en un único hilo con una conexión persistente.
+    Solo se atiende la solicitud más reciente: las pendientes se descartan y la que está
+    en curso se cancela en el servidor (connection.cancel()) cuando llega una nueva.
+    Cada resultado se entrega con su número de generación para que la interfaz
+    ignore los que ya no corresponden a lo escrito.
+    """
+
+    def __init__(self, crear_conexion: Callable[[], object],
+                 al_resultado: Callable[[int, Dict], None],
+                 al_error: Callable[[int, str], None]):
+        """
+        Args:
+            crear_conexion: Fábrica que retorna un CupsQuery conectado.
+            al_resultado: Se llama (desde el hilo del buscador) con (generacion, resultado).
+            al_error: Se llama (desde el hilo del buscador) con (generacion, mensaje).
+        """
+        self._crear_conexion = crear_conexion
+        self._al_resultado = al_resultado
+        self._al_error = al_error
+        self._db = None
+        self._condicion = threading.Condition()
+        self._pendiente: Optional[Dict] = None
+        self._generacion = 0
+        self._en_curso: Optional[int] = None
+        self._cancelando: Optional[int] = None
+        self._activo = True
+        self._hilo = threading.Thread(target=self._ciclo, daemon=True)
+        self._hilo.start()
+
+    @property
+    def generacion(self) -> int:
+        """Generación de la última solicitud recibida."""
+        return self._generacion
+
+    def solicitar(self, parametros: Dict) -> int:
+        """
+        Encola una búsqueda (argumentos de CupsQuery.buscar_pagina_con_total),
+        reemplazando la pendiente y cancelando la que esté en ejecución.
+        Retorna la generación asignada.
+        """
+        with self._condicion:
+            self._generacion += 1
+            self._pendiente = dict(parametros)
+            self._pedir_cancelacion()
+            self._condicion.notify()
+            return self._generacion
+
+    def descartar(self):
+        """Invalida la solicitud pendiente y la que esté en curso sin lanzar una nueva."""
+        with self._condicion:
+            self._generacion += 1
+            self._pendiente = None
+            self._pedir_cancelacion()
+
+    def _pedir_cancelacion(self):
+        """
+        Cancela la sentencia en curso (con la condición tomada) desde un hilo auxiliar:
+        connection.cancel() abre otra conexión al servidor y espera su respuesta, lo que
+        congelaría la interfaz con latencia o con el servidor caído.
+        """
+        en_curso = self._en_curso
+        if en_curso is None or self._cancelando == en_curso or self._db is None:
+            return
+        self._cancelando = en_curso
+        threading.Thread(target=self._cancelar_en_servidor, args=(self._db.conn, en_curso), daemon=True).start()
+
+    def _cancelar_en_servidor(self, conn, en_curso: int):
+        """Pide al servidor abortar la sentencia de la generación en_curso, si sigue ejecutándose."""
+        with self._condicion:
+            if self._en_curso != en_curso:
+                return
+        try:
+            if not conn.closed:
+                conn.cancel()
+        except Exception:
+            pass
+
+    def detener(self):
+        """Detiene el hilo y cierra la conexión."""
+        with self._condicion:
+            self._activo = False
+            self._pendiente = None
+            self._pedir_cancelacion()
+            self._condicion.notify()
+
+    def _ciclo(self):
+        while True:
+            with self._condicion:
+                while self._activo and self._pendiente is None:
+                    self._condicion.wait()
+                if not self._activo:
+                    break
+                parametros, self._pendiente = self._pendiente, None
+                generacion = self._en_curso = self._generacion
+
+            try:
+                if self._db is None or self._db.conn.closed:
+                    self._db = self._crear_conexion()
+                resultado = self._db.buscar_pagina_con_total(**parametros)
+                if generacion == self._generacion:
+                    self._al_resultado(generacion, resultado)
+            except QueryCanceledError:
+                # Una cancelación dirigida a la consulta anterior puede llegar tarde al servidor:
+                # si esta sigue siendo la vigente, se reintenta
+                with self._condicion:
+                    if generacion == self._generacion and self._pendiente is None:
+                        self._pendiente = parametros
+            except Exception as e:
+                if generacion == self._generacion:
+                    self._al_error(generacion, f"Error: {str(e)}")
+            finally:
+                with self._condicion:
+                    self._en_curso = self._cancelando = None
+
+        if self._db is not None:
+            self._db.cerrar_conexion()
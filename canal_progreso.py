@@ -0,0 +1,52 @@
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+class CanalProgreso:
+    """
+    Canal de progreso entre hilos de trabajo y la interfaz.
+
+    Los hilos solo sobrescriben el último valor de progreso y de cada estadística
+    (y acumulan líneas de log) bajo un lock; la interfaz toma una instantánea a
+    frecuencia fija. Así el costo en el hilo de Tk no depende de cuántas filas
+    procese el trabajador, a diferencia de encolar un mensaje por fila.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._progreso: Optional[Tuple[float, str]] = None
+        self._estado: Optional[str] = None
+        self._stats: Dict[str, str] = {}
+        self._logs: List[Tuple[str, str]] = []
+
+    def progreso(self, valor: float, texto: str = ""):
+        """Publica el avance (0-100) y su texto; solo se conserva el último."""
+        with self._lock:
+            self._progreso = (valor, texto)
+
+    def estado(self, texto: str):
+        """Publica un texto de estado; solo se conserva el último."""
+        with self._lock:
+            self._estado = texto
+
+    def stat(self, clave: str, valor):
+        """Publica el valor de una estadística; solo se conserva el último por clave."""
+        with self._lock:
+            self._stats[clave] = str(valor)
+
+    def log(self, mensaje: str, tipo: str = "info"):
+        """Agrega una línea de log con la hora en que se generó."""
+        texto = f"[{datetime.now().strftime('%H:%M:%S')}] {mensaje}\n"
+        with self._lock:
+            self._logs.append((texto, tipo))
+
+    def tomar(self) -> Tuple[Optional[Tuple[float, str]], Optional[str], Dict[str, str], List[Tuple[str, str]]]:
+        """
+        Retorna y reinicia lo publicado desde la última toma:
+        (progreso, estado, stats, logs). progreso/estado son None si no cambiaron.
+        """
+        with self._lock:
+            resultado = (self._progreso, self._estado, self._stats, self._logs)
+            self._progreso, self._estado, self._stats, self._logs = None, None, {}, []
+        return resultado
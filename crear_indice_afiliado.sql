@@ -0,0 +1,19 @@
+-- Índice para la consulta por afiliado sobre solicitudes_servicios
+-- (Query.consultar_por_afiliado; la consulta solo verifica que exista y advierte si falta:
+-- también lo crea migrar_cli.py --crear-esquema o la interfaz al ofrecer completar el esquema)
+-- Ejecutar en psql fuera de una transacción: CONCURRENTLY no bloquea las inserciones
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_solicitudes_servicios_doc_afiliado
+    ON solicitudes_servicios (doc_afiliado);
+
+ANALYZE solicitudes_servicios;
+
+-- Si una creación se interrumpió el índice queda inválido: eliminarlo y volver a crearlo
+SELECT c.relname AS indice, i.indisvalid AS valido
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+WHERE c.relname = 'idx_solicitudes_servicios_doc_afiliado';
+
+-- Verificar que la consulta use el índice (Index Scan / Bitmap Index Scan)
+EXPLAIN ANALYZE
+SELECT * FROM solicitudes_servicios WHERE doc_afiliado = '1089196373';
@@ -0,0 +1,28 @@
+-- Cruce de solicitudes_servicios con el catálogo codigos_cups en la base de datos
+-- Ejecutar en pgAdmin o psql después de setup_codigos_cups_table.sql
+
+-- La migración guarda codigo_servicio_completo normalizado (sin espacios ni '.0' final, como
+-- enriquecimiento_cups.normalizar_codigos), así que el cruce es por igualdad sobre la columna.
+-- Normalizar una vez las filas cargadas antes de ese cambio:
+UPDATE solicitudes_servicios
+SET codigo_servicio_completo = regexp_replace(TRIM(codigo_servicio_completo), '\.0$', '')
+WHERE codigo_servicio_completo <> regexp_replace(TRIM(codigo_servicio_completo), '\.0$', '');
+
+-- Índice sobre la clave del cruce en solicitudes (codigos_cups.codigo_cups ya es UNIQUE)
+CREATE INDEX IF NOT EXISTS idx_solicitudes_codigo_servicio
+    ON solicitudes_servicios (codigo_servicio_completo);
+
+-- Vista con las banderas de preparación especial y remisión de cada solicitud
+CREATE OR REPLACE VIEW v_solicitudes_cups AS
+SELECT
+    s.*,
+    COALESCE(c.preparacion_especial, FALSE) AS preparacion_especial,
+    COALESCE(c.remitido, FALSE) AS remitido
+FROM solicitudes_servicios s
+LEFT JOIN codigos_cups c
+    ON c.codigo_cups = s.codigo_servicio_completo;
+
+-- Ejemplo: solicitudes de un afiliado que requieren preparación o remisión
+-- SELECT numero_solicitud, codigo_servicio_completo, preparacion_especial, remitido
+-- FROM v_solicitudes_cups
+-- WHERE doc_afiliado = '1089196373' AND (preparacion_especial OR remitido);
@@ -0,0 +1,254 @@
+import bisect
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+
+def normalizar_texto(texto) -> str:
+    """Convierte el texto a minúsculas y elimina tildes para búsquedas insensibles a acentos."""
+    if texto is None:
+        return ""
+    descompuesto = unicodedata.normalize('NFKD', str(texto).lower())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+class _NodoTrie:
+    """Nodo del trie de códigos CUPS."""
+    __slots__ = ('hijos', 'posicion')
+
+    def __init__(self):
+        self.hijos: Dict[str, '_NodoTrie'] = {}
+        self.posicion: Optional[int] = None
+
+
+class _IndiceCatalogo:
+    """
+    Instantánea inmutable del catálogo: registros ordenados por código,
+    trie de prefijos sobre codigo_cups e índice de tokens sobre el nombre normalizado.
+    """
+
+    def __init__(self, registros: List[Dict]):
+        self.registros = sorted(registros, key=lambda r: str(r['codigo_cups']))
+        self.nombres = [normalizar_texto(r['nombre_estudio']) for r in self.registros]
+        self.nombres_minusculas = [str(r['nombre_estudio'] or '').lower() for r in self.registros]
+        # Claves en orden de punto de código, el mismo de CupsQuery._ORDENES_PAGINA (COLLATE "C")
+        self.claves_codigo = [(str(r['codigo_cups']),) for r in self.registros]
+        self.claves_nombre = [(r['nombre_estudio'] or '', str(r['codigo_cups'])) for r in self.registros]
+        self.raiz = _NodoTrie()
+        self.tokens: Dict[str, set] = {}
+
+        for posicion, registro in enumerate(self.registros):
+            nodo = self.raiz
+            for caracter in str(registro['codigo_cups']).strip():
+                nodo = nodo.hijos.setdefault(caracter, _NodoTrie())
+            nodo.posicion = posicion
+
+            for token in self.nombres[posicion].split():
+                self.tokens.setdefault(token, set()).add(posicion)
+
+    def _nodo(self, prefijo: str) -> Optional[_NodoTrie]:
+        nodo = self.raiz
+        for caracter in prefijo:
+            nodo = nodo.hijos.get(caracter)
+            if nodo is None:
+                return None
+        return nodo
+
+    def posicion_codigo(self, codigo: str) -> Optional[int]:
+        """Posición del código exacto, o None si no existe."""
+        nodo = self._nodo(codigo)
+        return nodo.posicion if nodo is not None else None
+
+    def posiciones_prefijo(self, prefijo: str) -> List[int]:
+        """Posiciones (en orden de código) de los códigos que empiezan por el prefijo."""
+        nodo = self._nodo(prefijo)
+        if nodo is None:
+            return []
+        posiciones, pendientes = [], [nodo]
+        while pendientes:
+            actual = pendientes.pop()
+            if actual.posicion is not None:
+                posiciones.append(actual.posicion)
+            pendientes.extend(actual.hijos.values())
+        return sorted(posiciones)
+
+    def posiciones_nombre(self, consulta: str) -> set:
+        """
+        Posiciones cuyo nombre normalizado contiene la consulta (equivalente a LIKE '%x%').
+        Los tokens de la consulta reducen los candidatos y la subcadena completa se verifica al final.
+        """
+        candidatos = None
+        for token_consulta in consulta.split():
+            coincidencias = set()
+            for token, posiciones in self.tokens.items():
+                if token_consulta in token:
+                    coincidencias |= posiciones
+            candidatos = coincidencias if candidatos is None else candidatos & coincidencias
+            if not candidatos:
+                return set()
+        if candidatos is None:
+            return set(range(len(self.registros)))
+        return {p for p in candidatos if consulta in self.nombres[p]}
+
+
+class CupsCatalog:
+    """
+    Caché en memoria de la tabla codigos_cups.
+    Se carga una sola vez por base de datos y se invalida con una verificación de versión
+    (cantidad de filas, id máximo y xmin máximo, que cambia también con los UPDATE).
+    """
+
+    _instancias: Dict[Tuple, 'CupsCatalog'] = {}
+    _lock_instancias = threading.Lock()
+
+    _SQL_VERSION = """SELECT COUNT(*), COALESCE(MAX(id), 0), COALESCE(MAX(xmin::text::bigint), 0)
+                      FROM codigos_cups;"""
+    _SQL_CARGA = "SELECT id, codigo_cups, nombre_estudio, preparacion_especial, remitido FROM codigos_cups;"
+
+    def __init__(self, intervalo_verificacion: float = 30.0):
+        """
+        Args:
+            intervalo_verificacion: Segundos durante los cuales se confía en la versión
+                cargada sin volver a consultar la base de datos.
+        """
+        self.intervalo_verificacion = intervalo_verificacion
+        self._indice: Optional[_IndiceCatalogo] = None
+        self._version: Optional[tuple] = None
+        self._ultima_verificacion = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def obtener(cls, host: str, port: int, database: str) -> 'CupsCatalog':
+        """Retorna el catálogo compartido para una base de datos (uno por proceso)."""
+        clave = (host, int(port), database)
+        with cls._lock_instancias:
+            if clave not in cls._instancias:
+                cls._instancias[clave] = cls()
+            return cls._instancias[clave]
+
+    @property
+    def cargado(self) -> bool:
+        return self._indice is not None
+
+    def invalidar(self):
+        """Fuerza la verificación de versión en el próximo uso."""
+        self._ultima_verificacion = 0.0
+
+    def asegurar_vigente(self, conn) -> bool:
+        """
+        Verifica la versión contra la base de datos (como máximo una vez por intervalo)
+        y recarga el catálogo si cambió. Retorna True si el catálogo quedó utilizable.
+        """
+        if self._indice is not None and time.monotonic() - self._ultima_verificacion < self.intervalo_verificacion:
+            return True
+
+        with self._lock:
+            if self._indice is not None and time.monotonic() - self._ultima_verificacion < self.intervalo_verificacion:
+                return True
+
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self._SQL_VERSION)
+                version = tuple(cursor.fetchone())
+                if version != self._version or self._indice is None:
+                    cursor.execute(self._SQL_CARGA)
+                    registros = [{
+                        'id': row[0],
+                        'codigo_cups': row[1],
+                        'nombre_estudio': row[2],
+                        'preparacion_especial': row[3],
+                        'remitido': row[4]
+                    } for row in cursor.fetchall()]
+                    self._indice = _IndiceCatalogo(registros)
+                    self._version = version
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+            self._ultima_verificacion = time.monotonic()
+            return True
+
+    def _filtrar(self, codigo_cups: str = None, nombre_busqueda: str = None,
+                 preparacion_especial: Optional[bool] = None,
+                 remitido: Optional[bool] = None,
+                 sin_acentos: bool = True) -> Tuple[_IndiceCatalogo, List[int]]:
+        """
+        Retorna el índice consultado y las posiciones que cumplen los filtros, en orden de
+        codigo_cups. Las posiciones solo valen para ese índice: asegurar_vigente puede
+        reemplazar self._indice desde otro hilo.
+        El índice de tokens ignora tildes; con sin_acentos=False se verifica además
+        la coincidencia exacta en minúsculas, como hace la base de datos.
+        """
+        indice = self._indice
+        if indice is None:
+            raise RuntimeError("El catálogo CUPS no está cargado")
+
+        if codigo_cups:
+            posicion = indice.posicion_codigo(str(codigo_cups).strip())
+            posiciones = [] if posicion is None else [posicion]
+        else:
+            posiciones = None
+
+        if nombre_busqueda and nombre_busqueda.strip():
+            por_nombre = indice.posiciones_nombre(normalizar_texto(nombre_busqueda.strip()))
+            if not sin_acentos:
+                consulta = nombre_busqueda.strip().lower()
+                por_nombre = {p for p in por_nombre if consulta in indice.nombres_minusculas[p]}
+            posiciones = sorted(por_nombre) if posiciones is None else [p for p in posiciones if p in por_nombre]
+
+        if posiciones is None:
+            posiciones = range(len(indice.registros))
+
+        registros = indice.registros
+        return indice, [
+            p for p in posiciones
+            if (preparacion_especial is None or bool(registros[p]['preparacion_especial']) == bool(preparacion_especial))
+            and (remitido is None or bool(registros[p]['remitido']) == bool(remitido))
+        ]
+
+    def buscar(self, codigo_cups: str = None, nombre_busqueda: str = None,
+               preparacion_especial: Optional[bool] = None,
+               remitido: Optional[bool] = None, limite: int = 500,
+               sin_acentos: bool = True) -> List[Dict]:
+        """Búsqueda local con los mismos filtros que CupsQuery.buscar_con_filtros."""
+        indice, posiciones = self._filtrar(codigo_cups, nombre_busqueda, preparacion_especial, remitido, sin_acentos)
+        return [dict(indice.registros[p]) for p in posiciones[:limite]]
+
+    def contar(self, codigo_cups: str = None, nombre_busqueda: str = None,
+               preparacion_especial: Optional[bool] = None,
+               remitido: Optional[bool] = None, sin_acentos: bool = True) -> int:
+        """Conteo local con los mismos filtros que CupsQuery.contar_registros."""
+        _, posiciones = self._filtrar(codigo_cups, nombre_busqueda, preparacion_especial, remitido, sin_acentos)
+        return len(posiciones)
+
+    def buscar_por_prefijo(self, prefijo: str, limite: int = 100) -> List[Dict]:
+        """Códigos CUPS que empiezan por el prefijo indicado, ordenados por código."""
+        indice = self._indice
+        if indice is None:
+            raise RuntimeError("El catálogo CUPS no está cargado")
+        posiciones = indice.posiciones_prefijo(str(prefijo).strip())
+        return [dict(indice.registros[p]) for p in posiciones[:limite]]
+
+    def buscar_pagina(self, codigo_cups: str = None, nombre_busqueda: str = None,
+                      preparacion_especial: Optional[bool] = None,
+                      remitido: Optional[bool] = None, sin_acentos: bool = True,
+                      orden: str = 'codigo', despues_de: Optional[tuple] = None,
+                      limite: int = 200) -> Tuple[List[Dict], Optional[tuple]]:
+        """Paginación por clave local, equivalente a CupsQuery.obtener_pagina."""
+        indice, posiciones = self._filtrar(codigo_cups, nombre_busqueda, preparacion_especial, remitido, sin_acentos)
+        claves = indice.claves_nombre if orden == 'nombre' else indice.claves_codigo
+
+        ordenadas = [claves[p] for p in posiciones]
+        if orden == 'nombre':
+            pares = sorted(zip(ordenadas, posiciones))
+            ordenadas = [clave for clave, _ in pares]
+            posiciones = [p for _, p in pares]
+
+        inicio = bisect.bisect_right(ordenadas, tuple(despues_de)) if despues_de is not None else 0
+        pagina = posiciones[inicio:inicio + limite]
+        siguiente = claves[pagina[-1]] if pagina and inicio + limite < len(posiciones) else None
+        return [dict(indice.registros[p]) for p in pagina], siguiente
@@ -3,6 +3,10 @@ from psycopg2.extras import execute_batch
 import pandas as pd
 from typing import Dict, Optional, List
 from contextlib import contextmanager
+from cups_catalog import CupsCatalog
+from metricas import medir
+from instrumentacion_bd import ConexionInstrumentada
+from sentencias_preparadas import SentenciaPreparada
 
 
 class CupsQuery:
@@ -13,31 +17,86 @@ class CupsQuery:
     
     # Campos estándar para evitar repetición
     _CAMPOS_SELECT = "id, codigo_cups, nombre_estudio, preparacion_especial, remitido"
+    
+    # Nombre normalizado (minúsculas y sin tildes) cubierto por el índice de trigramas
+    _NOMBRE_NORMALIZADO = "f_unaccent(LOWER(nombre_estudio))"
+    
+    # Órdenes soportados por la paginación por clave (keyset): columnas de orden y clave del cursor.
+    # COLLATE "C" ordena por bytes (en UTF-8, por punto de código), igual que las claves de
+    # CupsCatalog en Python: un cursor sirve en cualquiera de las dos fuentes
+    _ORDENES_PAGINA = {
+        'codigo': ('codigo_cups COLLATE "C"', ('codigo_cups COLLATE "C"',)),
+        'nombre': ('COALESCE(nombre_estudio, \'\') COLLATE "C", codigo_cups COLLATE "C"',
+                   ('COALESCE(nombre_estudio, \'\') COLLATE "C"', 'codigo_cups COLLATE "C"')),
+    }
+    
+    # Respaldo sin la extensión unaccent: solo vocales tildadas y diéresis del español
+    _NOMBRE_SIN_TILDES = "translate(LOWER(nombre_estudio), 'áéíóúü', 'aeiouu')"
+    
+    # Búsqueda por código exacto, preparada en el servidor una vez por conexión
+    # (buscar_con_filtros y las búsquedas paginadas preparan una sentencia por combinación de filtros)
+    _BUSCAR_POR_CODIGO = SentenciaPreparada(
+        "cups_por_codigo", f"SELECT {_CAMPOS_SELECT} FROM codigos_cups WHERE codigo_cups = %s;")
+    
+    # DDL de actualizar_codigos_cups_busqueda.sql (sin las consultas de verificación)
+    _DDL_BUSQUEDA = (
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+        "CREATE EXTENSION IF NOT EXISTS unaccent;",
+        """CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+               LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS
+           $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;""",
+        """CREATE INDEX IF NOT EXISTS idx_codigos_cups_nombre_trgm
+               ON codigos_cups USING gin (f_unaccent(LOWER(nombre_estudio)) gin_trgm_ops);""",
+        "DROP INDEX IF EXISTS idx_codigos_cups_nombre_codigo;",
+        """CREATE INDEX IF NOT EXISTS idx_codigos_cups_nombre_codigo_c
+               ON codigos_cups ((COALESCE(nombre_estudio, '') COLLATE "C"), (codigo_cups COLLATE "C"));""",
+        """CREATE INDEX IF NOT EXISTS idx_codigos_cups_codigo_c
+               ON codigos_cups ((codigo_cups COLLATE "C"));""",
+        "ANALYZE codigos_cups;",
+    )
 
     def __init__(self, host: str = "192.168.9.177", port: int = 5432, 
                  database: str = "practica", user: str = "postgres", 
-                 password: str = "postgres"):
-        """Inicializa la conexión a la base de datos."""
-        self.conn = psycopg2.connect(
+                 password: str = "postgres", usar_catalogo: bool = False, conn=None,
+                 preparar: Optional[bool] = None):
+        """
+        Inicializa la conexión a la base de datos.
+        
+        Args:
+            usar_catalogo: Si es True, las búsquedas y conteos se sirven desde el
+                catálogo en memoria (CupsCatalog), con la base de datos como respaldo.
+            conn: Conexión ya abierta (p. ej. del pool de MonitorConexion) a usar en lugar
+                de abrir una nueva; cerrar_conexion() no la cierra.
+            preparar: Usar sentencias preparadas en el servidor para buscar_por_codigo,
+                buscar_con_filtros, obtener_pagina y buscar_pagina_con_total; None toma
+                sentencias_preparadas.PREPARADAS_HABILITADAS.
+        """
+        self.preparar = preparar
+        self._conexion_propia = conn is None
+        self.conn = conn if conn is not None else psycopg2.connect(
             host=host,
             port=port,
             database=database,
             user=user,
-            password=password
+            password=password,
+            connection_factory=ConexionInstrumentada
         )
+        self._catalogo = CupsCatalog.obtener(host, port, database) if usar_catalogo else None
+        self._trgm_disponible: Optional[bool] = None
 
     def cerrar_conexion(self):
-        """Cierra la conexión a la base de datos."""
-        if self.conn:
+        """Cierra la conexión a la base de datos (si fue abierta por esta instancia)."""
+        if self.conn and self._conexion_propia:
             self.conn.close()
 
     @contextmanager
-    def _cursor(self):
-        """Context manager para cursores con auto-commit y rollback en error."""
+    def _cursor(self, metricas=None):
+        """Context manager para cursores con auto-commit y rollback en error (commit medido si hay metricas)."""
         cursor = self.conn.cursor()
         try:
             yield cursor
-            self.conn.commit()
+            with medir(metricas, 'commit'):
+                self.conn.commit()
         except Exception:
             self.conn.rollback()
             raise
@@ -58,6 +117,85 @@ class CupsQuery:
         """Convierte múltiples filas a lista de diccionarios."""
         return [self._row_to_dict(row) for row in rows]
 
+    def _catalogo_vigente(self) -> Optional[CupsCatalog]:
+        """Retorna el catálogo en memoria si está habilitado y vigente, o None para usar la BD."""
+        if self._catalogo is None:
+            return None
+        try:
+            return self._catalogo if self._catalogo.asegurar_vigente(self.conn) else None
+        except Exception as e:
+            print(f"Catálogo CUPS no disponible, consultando la BD: {e}")
+            return None
+
+    def _invalidar_catalogo(self):
+        """Marca el catálogo para verificación tras una escritura."""
+        if self._catalogo is not None:
+            self._catalogo.invalidar()
+
+    def actualizar_esquema_busqueda(self) -> bool:
+        """
+        Aplica la actualización de actualizar_codigos_cups_busqueda.sql:
+        extensiones pg_trgm/unaccent e índice GIN de trigramas sobre el nombre normalizado.
+        Requiere permisos para crear extensiones. Retorna True si se aplicó correctamente.
+        """
+        try:
+            with self._cursor() as cursor:
+                for sentencia in self._DDL_BUSQUEDA:
+                    cursor.execute(sentencia)
+            self._trgm_disponible = True
+            return True
+        except Exception as e:
+            print(f"Error actualizando esquema de búsqueda: {e}")
+            self._trgm_disponible = None
+            return False
+
+    def _busqueda_trgm_disponible(self) -> bool:
+        """
+        Indica (con caché) si la base de datos tiene pg_trgm y f_unaccent instalados.
+        Solo se guarda una respuesta de la base: si la verificación falla se usa la búsqueda
+        sin trigramas y se vuelve a verificar en la próxima llamada. La cancelación
+        (conn.cancel() de BuscadorCupsIncremental) se propaga a quien buscaba.
+        """
+        if self._trgm_disponible is None:
+            try:
+                with self._cursor() as cursor:
+                    cursor.execute(
+                        """SELECT to_regprocedure('f_unaccent(text)') IS NOT NULL
+                                  AND EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm');"""
+                    )
+                    self._trgm_disponible = bool(cursor.fetchone()[0])
+            except psycopg2.extensions.QueryCanceledError:
+                raise
+            except Exception as e:
+                print(f"No se pudo verificar la búsqueda por trigramas: {e}")
+                return False
+        return self._trgm_disponible
+
+    def _condicion_nombre(self, nombre_busqueda: str, sin_acentos: bool = False) -> tuple:
+        """
+        Construye la condición LIKE '%texto%' sobre el nombre.
+        Con pg_trgm el filtro principal usa la expresión indexada; si se distinguen tildes
+        se añade la comparación exacta en minúsculas como verificación.
+        """
+        patron = f"%{nombre_busqueda.strip()}%"
+        
+        if self._busqueda_trgm_disponible():
+            condicion = f"{self._NOMBRE_NORMALIZADO} LIKE f_unaccent(LOWER(%s))"
+            if sin_acentos:
+                return condicion, [patron]
+            return f"{condicion} AND LOWER(nombre_estudio) LIKE LOWER(%s)", [patron, patron]
+        
+        if sin_acentos:
+            return f"{self._NOMBRE_SIN_TILDES} LIKE translate(LOWER(%s), 'áéíóúü', 'aeiouu')", [patron]
+        return "LOWER(nombre_estudio) LIKE LOWER(%s)", [patron]
+
+    def _orden_similitud(self, nombre_busqueda: str) -> tuple:
+        """Cláusula ORDER BY por similitud de trigramas (o alfabética si no hay pg_trgm)."""
+        if self._busqueda_trgm_disponible():
+            return (f"similarity({self._NOMBRE_NORMALIZADO}, f_unaccent(LOWER(%s))) DESC, nombre_estudio",
+                    [nombre_busqueda.strip()])
+        return "nombre_estudio", []
+
     def obtener_codigos_existentes(self) -> Dict[str, Dict]:
         """
         Obtiene todos los códigos CUPS existentes en la base de datos.
@@ -71,10 +209,12 @@ class CupsQuery:
             print(f"Error obteniendo códigos existentes: {e}")
             return {}
 
-    def procesar_dataframe(self, df: pd.DataFrame) -> Dict[str, int]:
+    def procesar_dataframe(self, df: pd.DataFrame, metricas=None) -> Dict[str, int]:
         """
         Procesa un DataFrame completo de códigos CUPS usando batch operations.
         Inserta nuevos registros y actualiza existentes de forma eficiente.
+        Con metricas (MetricasEjecucion) se registran las etapas deduplicacion,
+        transformacion, carga y commit.
         
         Retorna un diccionario con estadísticas:
         - insertados: cantidad de registros nuevos insertados
@@ -85,7 +225,8 @@ class CupsQuery:
             return {'insertados': 0, 'actualizados': 0, 'errores': 0, 'total': 0}
         
         # Obtener códigos existentes una sola vez
-        codigos_existentes = set(self.obtener_codigos_existentes().keys())
+        with medir(metricas, 'deduplicacion', filas=len(df)):
+            codigos_existentes = set(self.obtener_codigos_existentes().keys())
         
         estadisticas = {
             'insertados': 0,
@@ -101,31 +242,32 @@ class CupsQuery:
         registros_nuevos = []
         registros_actualizar = []
         
-        for _, row in df.iterrows():
-            codigo = str(row['codigo_cups']).strip()
-            nombre = str(row['nombre_estudio']).strip() if pd.notna(row['nombre_estudio']) else None
-            prep_esp = bool(row['preparacion_especial']) if pd.notna(row['preparacion_especial']) else False
-            remitido = bool(row['remitido']) if pd.notna(row['remitido']) else False
-            
-            datos = (codigo, nombre, prep_esp, remitido)
-            
-            if codigo in codigos_existentes:
-                registros_actualizar.append((nombre, prep_esp, remitido, codigo))
-            else:
-                registros_nuevos.append(datos)
-                codigos_existentes.add(codigo)  # Evitar duplicados en el mismo batch
+        with medir(metricas, 'transformacion', filas=len(df)):
+            for _, row in df.iterrows():
+                codigo = str(row['codigo_cups']).strip()
+                nombre = str(row['nombre_estudio']).strip() if pd.notna(row['nombre_estudio']) else None
+                prep_esp = bool(row['preparacion_especial']) if pd.notna(row['preparacion_especial']) else False
+                remitido = bool(row['remitido']) if pd.notna(row['remitido']) else False
+                
+                datos = (codigo, nombre, prep_esp, remitido)
+                
+                if codigo in codigos_existentes:
+                    registros_actualizar.append((nombre, prep_esp, remitido, codigo))
+                else:
+                    registros_nuevos.append(datos)
+                    codigos_existentes.add(codigo)  # Evitar duplicados en el mismo batch
         
         # Ejecutar batch insert
         if registros_nuevos:
             try:
-                with self._cursor() as cursor:
-                    execute_batch(
+                with self._cursor(metricas) as cursor, medir(metricas, 'carga') as medida:
+                    self._enviar_lote(
                         cursor,
                         """INSERT INTO codigos_cups (codigo_cups, nombre_estudio, preparacion_especial, remitido)
                            VALUES (%s, %s, %s, %s);""",
-                        registros_nuevos,
-                        page_size=100
+                        registros_nuevos
                     )
+                    medida['filas'] = len(registros_nuevos)
                 estadisticas['insertados'] = len(registros_nuevos)
                 print(f"  Insertados: {len(registros_nuevos)} registros")
             except Exception as e:
@@ -135,23 +277,28 @@ class CupsQuery:
         # Ejecutar batch update
         if registros_actualizar:
             try:
-                with self._cursor() as cursor:
-                    execute_batch(
+                with self._cursor(metricas) as cursor, medir(metricas, 'carga') as medida:
+                    self._enviar_lote(
                         cursor,
                         """UPDATE codigos_cups
                            SET nombre_estudio = %s, preparacion_especial = %s, remitido = %s
                            WHERE codigo_cups = %s;""",
-                        registros_actualizar,
-                        page_size=100
+                        registros_actualizar
                     )
+                    medida['filas'] = len(registros_actualizar)
                 estadisticas['actualizados'] = len(registros_actualizar)
                 print(f"  Actualizados: {len(registros_actualizar)} registros")
             except Exception as e:
                 print(f"Error en batch update: {e}")
                 estadisticas['errores'] += len(registros_actualizar)
         
+        self._invalidar_catalogo()
         return estadisticas
 
+    def _enviar_lote(self, cursor, sql: str, registros: List[tuple]):
+        """Ejecuta la sentencia para cada registro, 100 por ida y vuelta (CupsQueryPipeline usa el modo pipeline)."""
+        execute_batch(cursor, sql, registros, page_size=100)
+
     def insertar_o_actualizar_codigo(self, codigo_cups: str, nombre_estudio: str, 
                                      preparacion_especial: bool, remitido: bool,
                                      codigos_existentes: dict = None) -> bool:
@@ -192,6 +339,7 @@ class CupsQuery:
                            VALUES (%s, %s, %s, %s);""",
                         (codigo, nombre, prep, rem)
                     )
+            self._invalidar_catalogo()
             return True
             
         except Exception as e:
@@ -229,6 +377,7 @@ class CupsQuery:
                     f"UPDATE codigos_cups SET {', '.join(updates)} WHERE codigo_cups = %s;",
                     values
                 )
+            self._invalidar_catalogo()
             return True
         except Exception as e:
             print(f"Error actualizando código CUPS {codigo_cups}: {e}")
@@ -236,7 +385,7 @@ class CupsQuery:
 
     def _construir_where(self, codigo_cups: str = None, nombre_busqueda: str = None,
                          preparacion_especial: Optional[bool] = None,
-                         remitido: Optional[bool] = None) -> tuple:
+                         remitido: Optional[bool] = None, sin_acentos: bool = False) -> tuple:
         """Construye la cláusula WHERE para las búsquedas."""
         condiciones, valores = [], []
         
@@ -245,8 +394,9 @@ class CupsQuery:
             valores.append(str(codigo_cups).strip())
         
         if nombre_busqueda:
-            condiciones.append("LOWER(nombre_estudio) LIKE LOWER(%s)")
-            valores.append(f"%{nombre_busqueda.strip()}%")
+            condicion, valores_nombre = self._condicion_nombre(nombre_busqueda, sin_acentos)
+            condiciones.append(condicion)
+            valores.extend(valores_nombre)
         
         if preparacion_especial is not None:
             condiciones.append("preparacion_especial = %s")
@@ -262,25 +412,29 @@ class CupsQuery:
         """Busca un código CUPS por su código exacto."""
         try:
             with self._cursor() as cursor:
-                cursor.execute(
-                    f"SELECT {self._CAMPOS_SELECT} FROM codigos_cups WHERE codigo_cups = %s;",
-                    (str(codigo_cups).strip(),)
-                )
+                self._BUSCAR_POR_CODIGO.ejecutar(cursor, (str(codigo_cups).strip(),), self.preparar)
                 resultado = cursor.fetchone()
                 return self._row_to_dict(resultado) if resultado else None
         except Exception as e:
             print(f"Error buscando código CUPS {codigo_cups}: {e}")
             return None
 
-    def buscar_por_nombre(self, nombre_busqueda: str, limite: int = 100) -> List[Dict]:
-        """Busca códigos CUPS por nombre de estudio (búsqueda parcial, case-insensitive)."""
+    def buscar_por_nombre(self, nombre_busqueda: str, limite: int = 100,
+                          sin_acentos: bool = False) -> List[Dict]:
+        """
+        Busca códigos CUPS por nombre de estudio (búsqueda parcial, case-insensitive).
+        Los resultados se ordenan por similitud con el texto buscado cuando pg_trgm está disponible.
+        """
         try:
+            condicion, valores = self._condicion_nombre(nombre_busqueda, sin_acentos)
+            orden, valores_orden = self._orden_similitud(nombre_busqueda)
+            
             with self._cursor() as cursor:
                 cursor.execute(
                     f"""SELECT {self._CAMPOS_SELECT} FROM codigos_cups
-                        WHERE LOWER(nombre_estudio) LIKE LOWER(%s)
-                        ORDER BY nombre_estudio LIMIT %s;""",
-                    (f"%{nombre_busqueda.strip()}%", limite)
+                        WHERE {condicion}
+                        ORDER BY {orden} LIMIT %s;""",
+                    valores + valores_orden + [limite]
                 )
                 return self._rows_to_list(cursor.fetchall())
         except Exception as e:
@@ -290,29 +444,54 @@ class CupsQuery:
     def buscar_con_filtros(self, codigo_cups: str = None, nombre_busqueda: str = None,
                            preparacion_especial: Optional[bool] = None,
                            remitido: Optional[bool] = None,
-                           limite: int = 500) -> List[Dict]:
+                           limite: int = 500, sin_acentos: bool = False,
+                           ordenar_por_similitud: bool = False) -> List[Dict]:
         """
         Busca códigos CUPS con múltiples filtros.
+        
+        Args:
+            sin_acentos: Si es True, la búsqueda por nombre ignora las tildes.
+            ordenar_por_similitud: Si es True y hay búsqueda por nombre, ordena por similitud
+                de trigramas en lugar de por código.
         """
+        catalogo = None if (ordenar_por_similitud and nombre_busqueda) else self._catalogo_vigente()
+        if catalogo is not None:
+            return catalogo.buscar(codigo_cups, nombre_busqueda, preparacion_especial, remitido,
+                                   limite, sin_acentos=sin_acentos)
+        
         try:
             where_clause, valores = self._construir_where(
-                codigo_cups, nombre_busqueda, preparacion_especial, remitido
+                codigo_cups, nombre_busqueda, preparacion_especial, remitido, sin_acentos
             )
+            orden = "codigo_cups"
+            if ordenar_por_similitud and nombre_busqueda:
+                orden, valores_orden = self._orden_similitud(nombre_busqueda)
+                valores.extend(valores_orden)
             valores.append(limite)
             
+            sentencia = SentenciaPreparada.para(
+                "cups_filtros",
+                f"""SELECT {self._CAMPOS_SELECT} FROM codigos_cups
+                    WHERE {where_clause} ORDER BY {orden} LIMIT %s;""")
             with self._cursor() as cursor:
-                cursor.execute(
-                    f"""SELECT {self._CAMPOS_SELECT} FROM codigos_cups
-                        WHERE {where_clause} ORDER BY codigo_cups LIMIT %s;""",
-                    valores
-                )
+                sentencia.ejecutar(cursor, valores, self.preparar)
                 return self._rows_to_list(cursor.fetchall())
         except Exception as e:
             print(f"Error en búsqueda con filtros: {e}")
             return []
 
-    def obtener_todos(self, limite: int = 1000, offset: int = 0) -> List[Dict]:
-        """Obtiene todos los códigos CUPS con paginación."""
+    def obtener_todos(self, limite: int = 1000, offset: int = 0,
+                      despues_de_codigo: Optional[str] = None) -> List[Dict]:
+        """
+        Obtiene todos los códigos CUPS con paginación.
+        
+        Con despues_de_codigo (último código de la página anterior) se pagina por clave,
+        con costo constante por página; offset se conserva por compatibilidad.
+        """
+        if despues_de_codigo is not None:
+            registros, _ = self.obtener_pagina(limite=limite, despues_de=(despues_de_codigo,))
+            return registros
+        
         try:
             with self._cursor() as cursor:
                 cursor.execute(
@@ -325,13 +504,189 @@ class CupsQuery:
             print(f"Error obteniendo todos los códigos: {e}")
             return []
 
+    @staticmethod
+    def cursor_pagina(registro: Dict, orden: str = 'codigo') -> tuple:
+        """Clave de paginación (cursor) correspondiente a un registro."""
+        if orden == 'nombre':
+            return (registro['nombre_estudio'] or '', registro['codigo_cups'])
+        return (registro['codigo_cups'],)
+
+    def obtener_pagina(self, codigo_cups: str = None, nombre_busqueda: str = None,
+                       preparacion_especial: Optional[bool] = None,
+                       remitido: Optional[bool] = None, sin_acentos: bool = False,
+                       orden: str = 'codigo', despues_de: Optional[tuple] = None,
+                       limite: int = 200) -> tuple:
+        """
+        Paginación por clave (keyset): retorna la página que sigue al cursor `despues_de`
+        y el cursor de la página siguiente (None si es la última).
+        
+        Args:
+            orden: 'codigo' (por codigo_cups) o 'nombre' (por nombre_estudio y codigo_cups).
+            despues_de: Cursor retornado por la llamada anterior; None para la primera página.
+        
+        Retorna una tupla (registros, siguiente_cursor).
+        """
+        if orden not in self._ORDENES_PAGINA:
+            raise ValueError(f"Orden de paginación no soportado: {orden}")
+        
+        catalogo = self._catalogo_vigente()
+        if catalogo is not None:
+            return catalogo.buscar_pagina(codigo_cups, nombre_busqueda, preparacion_especial, remitido,
+                                          sin_acentos=sin_acentos, orden=orden,
+                                          despues_de=despues_de, limite=limite)
+        
+        try:
+            where_clause, valores = self._construir_where(
+                codigo_cups, nombre_busqueda, preparacion_especial, remitido, sin_acentos
+            )
+            orden_sql, columnas_clave = self._ORDENES_PAGINA[orden]
+            
+            if despues_de is not None:
+                where_clause += f" AND ({', '.join(columnas_clave)}) > ({', '.join(['%s'] * len(columnas_clave))})"
+                valores.extend(despues_de)
+            
+            # Se pide una fila extra para saber si existe una página siguiente
+            valores.append(limite + 1)
+            
+            sentencia = SentenciaPreparada.para(
+                "cups_pagina",
+                f"""SELECT {self._CAMPOS_SELECT} FROM codigos_cups
+                    WHERE {where_clause} ORDER BY {orden_sql} LIMIT %s;""")
+            with self._cursor() as cursor:
+                sentencia.ejecutar(cursor, valores, self.preparar)
+                registros = self._rows_to_list(cursor.fetchall())
+        except Exception as e:
+            print(f"Error obteniendo página de códigos: {e}")
+            return [], None
+        
+        if len(registros) > limite:
+            registros = registros[:limite]
+            return registros, self.cursor_pagina(registros[-1], orden)
+        return registros, None
+
+    def buscar_pagina_con_total(self, codigo_cups: str = None, nombre_busqueda: str = None,
+                                preparacion_especial: Optional[bool] = None,
+                                remitido: Optional[bool] = None, sin_acentos: bool = False,
+                                orden: str = 'codigo', despues_de: Optional[tuple] = None,
+                                limite: int = 200, estimar_total: bool = False) -> Dict:
+        """
+        Obtiene una página (paginación por clave) y el total de coincidencias en una sola
+        sentencia y una sola transacción, en lugar de buscar y contar por separado.
+        
+        Args:
+            estimar_total: Si es True y no se filtra por código ni por nombre, el total no se
+                cuenta: se estima con pg_class.reltuples y, con filtros de banderas, la frecuencia
+                de cada valor en pg_stats. El estimado nunca es menor que las filas ya recibidas
+                y si la primera página trae todas las coincidencias el total es exacto.
+        
+        Retorna un diccionario con: registros, siguiente (cursor), total y estimado (bool).
+        """
+        if orden not in self._ORDENES_PAGINA:
+            raise ValueError(f"Orden de paginación no soportado: {orden}")
+        
+        catalogo = self._catalogo_vigente()
+        if catalogo is not None:
+            registros, siguiente = catalogo.buscar_pagina(
+                codigo_cups, nombre_busqueda, preparacion_especial, remitido, sin_acentos=sin_acentos,
+                orden=orden, despues_de=despues_de, limite=limite)
+            total = catalogo.contar(codigo_cups, nombre_busqueda, preparacion_especial, remitido,
+                                    sin_acentos=sin_acentos)
+            return {'registros': registros, 'siguiente': siguiente, 'total': total, 'estimado': False}
+        
+        where_clause, valores_where = self._construir_where(
+            codigo_cups, nombre_busqueda, preparacion_especial, remitido, sin_acentos
+        )
+        orden_sql, columnas_clave = self._ORDENES_PAGINA[orden]
+        
+        # Solo se estiman las búsquedas sin filtro de código ni de nombre: con ellos el COUNT es
+        # barato (índices) y la estimación del planificador para LIKE '%x%' no es confiable
+        estimado = estimar_total and not codigo_cups and not nombre_busqueda
+        if estimado:
+            sql_total, valores = self._sql_total_estimado(preparacion_especial, remitido, where_clause, valores_where)
+        else:
+            sql_total = f"SELECT COUNT(*) AS total FROM codigos_cups WHERE {where_clause}"
+            valores = list(valores_where)
+        
+        where_pagina = where_clause
+        valores.extend(valores_where)
+        if despues_de is not None:
+            where_pagina += f" AND ({', '.join(columnas_clave)}) > ({', '.join(['%s'] * len(columnas_clave))})"
+            valores.extend(despues_de)
+        valores.append(limite + 1)
+        
+        # El LEFT JOIN LATERAL garantiza una fila con el total aunque la página esté vacía;
+        # el ORDER BY externo solo puede referirse a columnas de p. Como en buscar_con_filtros,
+        # cada combinación de filtros, orden y cursor es una sentencia preparada distinta
+        sentencia = SentenciaPreparada.para(
+            "cups_pagina_total",
+            f"""SELECT t.total, p.*
+                FROM ({sql_total}) t
+                LEFT JOIN LATERAL (
+                    SELECT {self._CAMPOS_SELECT} FROM codigos_cups
+                    WHERE {where_pagina} ORDER BY {orden_sql} LIMIT %s
+                ) p ON TRUE
+                ORDER BY {orden_sql};""")
+        try:
+            with self._cursor() as cursor:
+                sentencia.ejecutar(cursor, valores, self.preparar)
+                filas = cursor.fetchall()
+        except psycopg2.extensions.QueryCanceledError:
+            # Cancelación solicitada por quien llama (p. ej. búsqueda incremental): no es "sin resultados"
+            raise
+        except Exception as e:
+            print(f"Error en búsqueda con total: {e}")
+            return {'registros': [], 'siguiente': None, 'total': 0, 'estimado': False}
+        
+        total = int(filas[0][0]) if filas else 0
+        registros = self._rows_to_list([fila[1:] for fila in filas if fila[1] is not None])
+        siguiente = None
+        if len(registros) > limite:
+            registros = registros[:limite]
+            siguiente = self.cursor_pagina(registros[-1], orden)
+        
+        if estimado:
+            if despues_de is None and siguiente is None:
+                # Una sola página: las coincidencias son exactamente las recibidas
+                total, estimado = len(registros), False
+            else:
+                # Nunca mostrar menos de lo recibido (más la fila extra que indica otra página)
+                total = max(total, len(registros) + (1 if siguiente is not None else 0))
+        return {'registros': registros, 'siguiente': siguiente, 'total': total, 'estimado': estimado}
+
+    @staticmethod
+    def _sql_total_estimado(preparacion_especial: Optional[bool], remitido: Optional[bool],
+                            where_clause: str, valores_where: list) -> tuple:
+        """
+        Subconsulta del total estimado: reltuples por la frecuencia de cada bandera filtrada en
+        pg_stats (0 si el valor no figura entre los más comunes). Si la tabla nunca se analizó
+        (reltuples -1/0 o sin estadísticas de la columna) se cuenta con el filtro.
+        """
+        fracciones, valores = "", []
+        for columna, valor in (("preparacion_especial", preparacion_especial), ("remitido", remitido)):
+            if valor is None:
+                continue
+            fracciones += f""" * (SELECT COALESCE(s.most_common_freqs[
+                                  array_position(s.most_common_vals::text::boolean[], %s)], 0)
+                              FROM pg_stats s WHERE s.schemaname = current_schema()
+                              AND s.tablename = 'codigos_cups' AND s.attname = '{columna}')"""
+            valores.append(bool(valor))
+        sql = f"""SELECT COALESCE(CASE WHEN c.reltuples > 0 THEN round(c.reltuples{fracciones})::bigint END,
+                               (SELECT COUNT(*) FROM codigos_cups WHERE {where_clause})) AS total
+                  FROM pg_class c WHERE c.oid = 'codigos_cups'::regclass"""
+        return sql, valores + list(valores_where)
+
     def contar_registros(self, codigo_cups: str = None, nombre_busqueda: str = None,
                          preparacion_especial: Optional[bool] = None,
-                         remitido: Optional[bool] = None) -> int:
+                         remitido: Optional[bool] = None, sin_acentos: bool = False) -> int:
         """Cuenta el número de registros que coinciden con los filtros."""
+        catalogo = self._catalogo_vigente()
+        if catalogo is not None:
+            return catalogo.contar(codigo_cups, nombre_busqueda, preparacion_especial, remitido,
+                                   sin_acentos=sin_acentos)
+        
         try:
             where_clause, valores = self._construir_where(
-                codigo_cups, nombre_busqueda, preparacion_especial, remitido
+                codigo_cups, nombre_busqueda, preparacion_especial, remitido, sin_acentos
             )
             
             with self._cursor() as cursor:
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+
+# Banderas del catálogo CUPS que se agregan a cada solicitud
+COLUMNAS_BANDERAS = ('preparacion_especial', 'remitido')
+
+
+def normalizar_codigos(serie: pd.Series) -> pd.Series:
+    """
+    Normaliza códigos para el cruce: texto sin espacios y sin el '.0' de celdas numéricas.
+    Los vacíos quedan vacíos. MotorMigracion guarda codigo_servicio_completo ya normalizado,
+    por lo que en la base de datos el cruce con codigos_cups es por igualdad sobre la columna
+    (indexada) sin más transformaciones.
+    """
+    return serie.astype(str).str.strip().str.replace(r'\.0$', '', regex=True).where(serie.notna(), None)
+
+
+def enriquecer_con_cups(df: pd.DataFrame, df_cups: pd.DataFrame,
+                        columna_codigo: str = 'codigo_servicio_completo') -> pd.DataFrame:
+    """
+    Agrega preparacion_especial y remitido a las solicitudes cruzando
+    columna_codigo contra codigo_cups del catálogo.
+
+    El cruce es un hash join vectorizado (Index.get_indexer): una sola pasada sobre las
+    solicitudes, sin iterar filas, y conserva el orden y el índice de df (doc_afiliado).
+    Las solicitudes cuyo código no está en el catálogo quedan en False.
+    """
+    resultado = df.copy()
+    if df.empty or df_cups is None or df_cups.empty or columna_codigo not in df.columns:
+        for columna in COLUMNAS_BANDERAS:
+            resultado[columna] = False
+        return resultado
+
+    catalogo = df_cups.assign(codigo_cups=normalizar_codigos(df_cups['codigo_cups']))
+    catalogo = catalogo.drop_duplicates(subset=['codigo_cups'], keep='first')
+    indice = pd.Index(catalogo['codigo_cups'])
+
+    posiciones = indice.get_indexer(normalizar_codigos(df[columna_codigo]))
+    encontrados = posiciones >= 0
+    for columna in COLUMNAS_BANDERAS:
+        valores = catalogo[columna].fillna(False).astype(bool).to_numpy()
+        resultado[columna] = np.where(encontrados, valores[np.where(encontrados, posiciones, 0)], False)
+    return resultado
+
+
+def resumen_banderas(df: pd.DataFrame) -> dict:
+    """Cuenta las solicitudes marcadas con cada bandera CUPS."""
+    return {columna: int(df[columna].sum()) if columna in df.columns else 0 for columna in COLUMNAS_BANDERAS}
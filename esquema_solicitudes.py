@@ -0,0 +1,471 @@
+import re
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+GRANULARIDADES = ("mensual", "anual")
+
+
+def periodo(fecha, granularidad: str) -> Tuple[date, date]:
+    """Inicio (incluido) y fin (excluido) del mes o año de la fecha."""
+    if granularidad == "anual":
+        return date(fecha.year, 1, 1), date(fecha.year + 1, 1, 1)
+    siguiente = date(fecha.year + 1, 1, 1) if fecha.month == 12 else date(fecha.year, fecha.month + 1, 1)
+    return date(fecha.year, fecha.month, 1), siguiente
+
+
+def nombre_particion(desde: date, granularidad: str) -> str:
+    """solicitudes_servicios_p2024 (anual) o solicitudes_servicios_p2024_03 (mensual)."""
+    sufijo = f"{desde.year}" if granularidad == "anual" else f"{desde.year}_{desde.month:02d}"
+    return f"{GestorEsquema.TABLA}_p{sufijo}"
+
+
+def repartir_por_particion(registros: List[Dict], granularidad: str,
+                           particiones: Dict[date, str]) -> Dict[Optional[str], List[Dict]]:
+    """
+    Agrupa los registros por la partición que les corresponde según fecha_autorizacion_1
+    (ver GestorEsquema.asegurar_particiones). Solo se asignan a una partición las fechas ya
+    convertidas a datetime; el resto (vacías o texto) queda en la clave None, para insertarse en
+    la tabla principal y que PostgreSQL las enrute (a la partición por defecto si no hay otra).
+    """
+    grupos: Dict[Optional[str], List[Dict]] = {}
+    for registro in registros:
+        fecha = registro.get('fecha_autorizacion_1')
+        tabla = particiones.get(periodo(fecha, granularidad)[0]) if isinstance(fecha, datetime) else None
+        grupos.setdefault(tabla, []).append(registro)
+    return grupos
+
+
+class GestorEsquema:
+    """
+    Crea y verifica la tabla solicitudes_servicios y sus índices.
+
+    Sin el índice único sobre numero_solicitud cada existe_solicitud y cada deduplicación es
+    un recorrido secuencial, y nada impide que un reintento duplique solicitudes. Los índices
+    se crean con CREATE INDEX CONCURRENTLY (no bloquean las inserciones en curso), por lo que
+    las operaciones de creación se ejecutan en autocommit.
+
+    La tabla puede estar particionada por rango de fecha_autorizacion_1 (mensual o anual, ver
+    convertir_a_particionada). En ese caso PostgreSQL exige que el índice único incluya la
+    columna de partición, así que la unicidad global de numero_solicitud queda a cargo de la
+    deduplicación de la migración. CONCURRENTLY no se admite sobre la tabla particionada: cada
+    índice se crea vacío en ella (ON ONLY), concurrentemente en cada partición y se adjunta (ver
+    _crear_indice_particionado). La retención elimina particiones completas.
+    """
+
+    TABLA = "solicitudes_servicios"
+    TABLA_SIN_PARTICION = "solicitudes_servicios_sin_particion"
+    PARTICION_DEFECTO = "solicitudes_servicios_pdefecto"
+
+    # Columnas en el orden de Query._CAMPOS_SOLICITUD. Las banderas de CUPS no se guardan aquí:
+    # salen del cruce con codigos_cups (vista v_solicitudes_cups, que usa s.*)
+    COLUMNAS: Tuple[Tuple[str, str], ...] = (
+        ("codigo_servicio_completo", "VARCHAR(50)"),
+        ("doc_afiliado", "VARCHAR(30)"),
+        ("numero_solicitud", "VARCHAR(50) NOT NULL"),
+        ("cod_diag", "VARCHAR(20)"),
+        ("desc_diag", "VARCHAR"),
+        ("clasificacion_servicios_acceso", "VARCHAR"),
+        ("descr_servicio_1", "VARCHAR"),
+        ("estado_solicitud", "VARCHAR(50)"),
+        ("num_autorizacion", "VARCHAR(50)"),
+        ("fecha_autorizacion_1", "TIMESTAMP"),
+        ("ips_asignada", "VARCHAR"),
+        ("ciudad_ips_asignada", "VARCHAR(100)"),
+        ("cantidad", "INTEGER"),
+        ("primer_nom", "VARCHAR(100)"),
+        ("segundo_nom", "VARCHAR(100)"),
+        ("primer_ape", "VARCHAR(100)"),
+        ("segundo_ape", "VARCHAR(100)"),
+        ("edad_anios", "INTEGER"),
+        ("estado_solicitud_2", "VARCHAR(50)"),
+        ("ips_solicitante", "VARCHAR"),
+    )
+
+    # nombre -> (columna, único)
+    INDICES: Dict[str, Tuple[str, bool]] = {
+        "idx_solicitudes_servicios_numero_solicitud": ("numero_solicitud", True),
+        "idx_solicitudes_servicios_doc_afiliado": ("doc_afiliado", False),
+        "idx_solicitudes_servicios_fecha_autorizacion": ("fecha_autorizacion_1", False),
+        "idx_solicitudes_servicios_estado": ("estado_solicitud", False),
+    }
+
+    def __init__(self, conn):
+        """
+        Args:
+            conn: Conexión abierta; no se cierra. Su modo autocommit se restaura al terminar.
+        """
+        self.conn = conn
+
+    def ddl_tabla(self, particionada: bool = False, secuencia: Optional[str] = None) -> str:
+        """
+        Args:
+            particionada: PARTITION BY RANGE (fecha_autorizacion_1), sin clave primaria (tendría
+                que incluir la fecha, que puede venir vacía).
+            secuencia: Secuencia existente para id (al convertir una tabla); por defecto SERIAL.
+        """
+        columnas = ",\n    ".join(f"{nombre} {tipo}" for nombre, tipo in self.COLUMNAS)
+        if not particionada:
+            return f"CREATE TABLE IF NOT EXISTS {self.TABLA} (\n    id SERIAL PRIMARY KEY,\n    {columnas}\n);"
+        id_ = f"id INTEGER NOT NULL DEFAULT nextval('{secuencia}')" if secuencia else "id SERIAL NOT NULL"
+        return (f"CREATE TABLE IF NOT EXISTS {self.TABLA} (\n    {id_},\n    {columnas}\n) "
+                f"PARTITION BY RANGE (fecha_autorizacion_1);")
+
+    def _columnas_indice(self, nombre: str, particionada: bool = False) -> str:
+        columna, unico = self.INDICES[nombre]
+        return f"{columna}, fecha_autorizacion_1" if unico and particionada else columna
+
+    def ddl_indice(self, nombre: str, particionada: bool = False) -> str:
+        """
+        CREATE INDEX CONCURRENTLY sobre la tabla. Con particionada=True, sin CONCURRENTLY, para
+        crearlo dentro de una transacción (convertir_a_particionada); fuera de ella ver
+        _crear_indice_particionado.
+        """
+        unico = "UNIQUE " if self.INDICES[nombre][1] else ""
+        concurrente = "" if particionada else "CONCURRENTLY "
+        return (f"CREATE {unico}INDEX {concurrente}IF NOT EXISTS {nombre} "
+                f"ON {self.TABLA} ({self._columnas_indice(nombre, particionada)});")
+
+    def _consultar(self, sql: str, valores: tuple = ()) -> List[tuple]:
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, valores)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def verificar(self) -> Dict:
+        """
+        Estado del esquema sin modificar nada. Solo consulta el catálogo (to_regclass,
+        information_schema, pg_index), por lo que es inmediato aun con la tabla grande: los
+        números de solicitud repetidos se cuentan en asegurar(), antes de crear el índice único.
+
+        Returns:
+            {'tabla', 'columnas_faltantes', 'indices_faltantes', 'indices_invalidos',
+             'problemas' (textos para mostrar), 'ok'}
+        """
+        try:
+            tabla = self._consultar("SELECT to_regclass(%s) IS NOT NULL;", (self.TABLA,))[0][0]
+            resultado = {'tabla': tabla, 'particionada': False, 'granularidad': None,
+                         'columnas_faltantes': [], 'indices_faltantes': [], 'indices_invalidos': []}
+            if tabla:
+                resultado['particionada'] = self.es_particionada()
+                if resultado['particionada']:
+                    resultado['granularidad'] = self.granularidad()
+                existentes = {fila[0] for fila in self._consultar(
+                    "SELECT column_name FROM information_schema.columns "
+                    "WHERE table_schema = current_schema() AND table_name = %s;", (self.TABLA,))}
+                resultado['columnas_faltantes'] = [n for n, _ in self.COLUMNAS if n not in existentes]
+                indices = dict(self._consultar(
+                    "SELECT c.relname, i.indisvalid FROM pg_index i "
+                    "JOIN pg_class c ON c.oid = i.indexrelid WHERE i.indrelid = %s::regclass;", (self.TABLA,)))
+                resultado['indices_faltantes'] = [n for n in self.INDICES if n not in indices]
+                resultado['indices_invalidos'] = [n for n in self.INDICES if indices.get(n) is False]
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        problemas = []
+        if not resultado['tabla']:
+            problemas.append(f"No existe la tabla {self.TABLA}")
+        if resultado['columnas_faltantes']:
+            problemas.append(f"Faltan columnas: {', '.join(resultado['columnas_faltantes'])}")
+        if resultado['indices_faltantes']:
+            problemas.append(f"Faltan índices: {', '.join(resultado['indices_faltantes'])}")
+        if resultado['indices_invalidos']:
+            problemas.append(f"Índices inválidos (creación interrumpida): {', '.join(resultado['indices_invalidos'])}")
+        resultado['problemas'] = problemas
+        resultado['ok'] = not problemas
+        return resultado
+
+    def contar_duplicados(self, tabla: Optional[str] = None, columnas: str = "numero_solicitud") -> int:
+        """Valores de las columnas (por defecto numero_solicitud) que aparecen más de una vez."""
+        return self._consultar(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM {tabla or self.TABLA} "
+            f"GROUP BY {columnas} HAVING COUNT(*) > 1) d;")[0][0]
+
+    def asegurar(self, indices: List[str] = None, particionar: Optional[str] = None) -> Dict:
+        """
+        Crea la tabla, las columnas y los índices que falten (recreando los inválidos) y
+        analiza la tabla si se creó algo. El índice único se omite mientras haya números de
+        solicitud repetidos: esos registros deben depurarse a mano.
+
+        Args:
+            indices: Índices a asegurar (por defecto todos los de INDICES).
+            particionar: 'mensual' o 'anual' para crear la tabla particionada si no existe
+                (una tabla existente se convierte con convertir_a_particionada).
+
+        Returns:
+            El resultado de verificar() después de los cambios, con 'creados' (lista de objetos
+            creados) y 'duplicados' (números de solicitud repetidos si se omitió el índice único).
+        """
+        estado = self.verificar()
+        creados = []
+        duplicados = 0
+        autocommit = self.conn.autocommit
+        try:
+            self.conn.autocommit = True
+            cursor = self.conn.cursor()
+            try:
+                particionada = estado['particionada'] or (not estado['tabla'] and particionar is not None)
+                if not estado['tabla']:
+                    cursor.execute(self.ddl_tabla(particionada))
+                    creados.append(self.TABLA)
+                    if particionada:
+                        cursor.execute(self._ddl_particion_defecto())
+                        creados.append(self.PARTICION_DEFECTO)
+                tipos = dict(self.COLUMNAS)
+                for columna in estado['columnas_faltantes']:
+                    tipo = tipos[columna].replace(" NOT NULL", "")
+                    cursor.execute(f"ALTER TABLE {self.TABLA} ADD COLUMN IF NOT EXISTS {columna} {tipo};")
+                    creados.append(columna)
+                for nombre in indices or list(self.INDICES):
+                    invalido = nombre in estado['indices_invalidos']
+                    if invalido and not particionada:
+                        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {nombre};")
+                    elif not invalido and estado['tabla'] and nombre not in estado['indices_faltantes']:
+                        continue
+                    if self.INDICES[nombre][1] and estado['tabla']:
+                        # El GROUP BY recorre la tabla: solo justo antes de construir el índice único
+                        duplicados = self.contar_duplicados(columnas=self._columnas_indice(nombre, particionada))
+                        if duplicados:
+                            continue
+                    if particionada:
+                        # En la tabla particionada un índice inválido es una creación interrumpida: se retoma
+                        self._crear_indice_particionado(cursor, nombre)
+                    else:
+                        cursor.execute(self.ddl_indice(nombre))
+                    creados.append(nombre)
+                if creados:
+                    cursor.execute(f"ANALYZE {self.TABLA};")
+            finally:
+                cursor.close()
+        finally:
+            self.conn.autocommit = autocommit
+        resultado = self.verificar()
+        resultado['creados'] = creados
+        resultado['duplicados'] = duplicados
+        if duplicados:
+            resultado['problemas'].append(f"{duplicados} número(s) de solicitud repetidos impiden el índice único")
+            resultado['ok'] = False
+        return resultado
+
+    def _crear_indice_particionado(self, cursor, nombre: str):
+        """
+        Crea un índice de la tabla particionada sin bloquear las inserciones: vacío (e inválido)
+        sobre la tabla (ON ONLY), con CONCURRENTLY en cada partición y adjuntando cada uno; queda
+        válido al adjuntar el de la última partición. Si se interrumpe, volver a llamarlo sigue
+        con las particiones pendientes. El cursor debe estar en autocommit.
+        """
+        unico = "UNIQUE " if self.INDICES[nombre][1] else ""
+        columnas = self._columnas_indice(nombre, particionada=True)
+        cursor.execute(f"CREATE {unico}INDEX IF NOT EXISTS {nombre} ON ONLY {self.TABLA} ({columnas});")
+        # Particiones que ya tienen un índice adjunto (las creadas después heredan el índice)
+        adjuntas = {fila[0] for fila in self._consultar(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_index x ON x.indexrelid = i.inhrelid "
+            "JOIN pg_class c ON c.oid = x.indrelid WHERE i.inhparent = %s::regclass;", (nombre,))}
+        sufijo = nombre.replace(f"idx_{self.TABLA}_", "", 1)
+        for particion in self.particiones():
+            if particion in adjuntas:
+                continue
+            indice = f"{particion}_{sufijo}_idx"
+            valido = self._consultar("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s);", (indice,))
+            if valido and not valido[0][0]:
+                cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {indice};")
+            cursor.execute(f"CREATE {unico}INDEX CONCURRENTLY IF NOT EXISTS {indice} ON {particion} ({columnas});")
+            cursor.execute(f"ALTER INDEX {nombre} ATTACH PARTITION {indice};")
+
+    def analizar(self):
+        """ANALYZE de la tabla (tras una carga, para que el planificador vea las filas nuevas)."""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"ANALYZE {self.TABLA};")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    # === PARTICIONES ===
+
+    def es_particionada(self) -> bool:
+        filas = self._consultar("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s);", (self.TABLA,))
+        return bool(filas) and filas[0][0] == 'p'
+
+    def particiones(self) -> Dict[str, Tuple[Optional[datetime], Optional[datetime]]]:
+        """Particiones -> (desde, hasta); (None, None) para la partición por defecto."""
+        resultado = {}
+        for nombre, limites in self._consultar(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass "
+                "ORDER BY c.relname;", (self.TABLA,)):
+            rango = re.search(r"FROM \('([^']+)'\) TO \('([^']+)'\)", limites or "")
+            resultado[nombre] = ((datetime.fromisoformat(rango.group(1)), datetime.fromisoformat(rango.group(2)))
+                                 if rango else (None, None))
+        return resultado
+
+    def granularidad(self) -> Optional[str]:
+        """'mensual' o 'anual' según el rango de las particiones existentes (None si no hay)."""
+        for desde, hasta in self.particiones().values():
+            if desde is not None:
+                return "anual" if (hasta - desde).days > 31 else "mensual"
+        return None
+
+    def _ddl_particion(self, desde: date, granularidad: str) -> str:
+        hasta = periodo(desde, granularidad)[1]
+        return (f"CREATE TABLE IF NOT EXISTS {nombre_particion(desde, granularidad)} PARTITION OF {self.TABLA} "
+                f"FOR VALUES FROM ('{desde.isoformat()}') TO ('{hasta.isoformat()}');")
+
+    def _ddl_particion_defecto(self) -> str:
+        return f"CREATE TABLE IF NOT EXISTS {self.PARTICION_DEFECTO} PARTITION OF {self.TABLA} DEFAULT;"
+
+    def asegurar_particiones(self, fechas: Iterable, granularidad: str) -> Dict[date, str]:
+        """
+        Crea las particiones que falten para las fechas (una transacción por partición).
+        Si una no puede crearse (p. ej. la partición por defecto ya tiene filas de ese periodo)
+        se informa y esas filas seguirán yendo a la partición por defecto.
+
+        Returns:
+            Inicio de cada periodo -> partición que lo cubre (para repartir_por_particion).
+        """
+        rangos = [(desde.date(), hasta.date(), nombre) for nombre, (desde, hasta) in self.particiones().items()
+                  if desde is not None]
+        resultado = {}
+        for inicio, fin in sorted({periodo(fecha, granularidad) for fecha in fechas}):
+            cubre = next((nombre for desde, hasta, nombre in rangos if desde <= inicio and fin <= hasta), None)
+            if cubre is None:
+                cursor = self.conn.cursor()
+                try:
+                    cursor.execute(self._ddl_particion(inicio, granularidad))
+                    self.conn.commit()
+                    cubre = nombre_particion(inicio, granularidad)
+                    rangos.append((inicio, fin, cubre))
+                except Exception as e:
+                    self.conn.rollback()
+                    print(f"No se pudo crear la partición {nombre_particion(inicio, granularidad)}: {e}")
+                finally:
+                    cursor.close()
+            if cubre is not None:
+                resultado[inicio] = cubre
+        return resultado
+
+    def eliminar_particiones_anteriores(self, limite: date) -> List[str]:
+        """
+        Retención: separa y elimina las particiones cuyo periodo termina antes de `limite`
+        (o en ese día). Es inmediato frente a un DELETE: no recorre filas ni deja espacio muerto.
+
+        Returns:
+            Nombres de las particiones eliminadas.
+        """
+        if not self.es_particionada():
+            raise ValueError(f"{self.TABLA} no está particionada (ver convertir_a_particionada)")
+        limite = datetime(limite.year, limite.month, limite.day)
+        eliminadas = []
+        for nombre, (desde, hasta) in self.particiones().items():
+            if hasta is None or hasta > limite:
+                continue
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute(f"ALTER TABLE {self.TABLA} DETACH PARTITION {nombre};")
+                cursor.execute(f"DROP TABLE {nombre};")
+                self.conn.commit()
+                eliminadas.append(nombre)
+            except Exception:
+                self.conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        return eliminadas
+
+    def convertir_a_particionada(self, granularidad: str) -> Dict:
+        """
+        Convierte la tabla existente en una tabla particionada, en una sola transacción:
+        la tabla actual se renombra a TABLA_SIN_PARTICION (queda como respaldo; eliminarla a mano
+        al verificar), se crea la particionada con una partición por periodo con datos más la
+        partición por defecto, se copian las filas (conservando id y su secuencia) y se recrean
+        los índices y las vistas que dependían de la tabla. Bloquea la tabla mientras copia:
+        ejecutar en una ventana de mantenimiento.
+
+        Returns:
+            {'filas', 'particiones', 'tabla_anterior', 'vistas', 'indices_omitidos'}
+        """
+        if granularidad not in GRANULARIDADES:
+            raise ValueError(f"Granularidad no válida: {granularidad} (use {' o '.join(GRANULARIDADES)})")
+        estado = self.verificar()
+        if not estado['tabla']:
+            self.asegurar(particionar=granularidad)
+            return {'filas': 0, 'particiones': 0, 'tabla_anterior': None, 'vistas': [], 'indices_omitidos': []}
+        if estado['particionada']:
+            raise ValueError(f"{self.TABLA} ya está particionada ({estado['granularidad'] or 'sin particiones'})")
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"LOCK TABLE {self.TABLA} IN ACCESS EXCLUSIVE MODE;")
+            cursor.execute(
+                "SELECT DISTINCT v.oid::regclass::text, pg_get_viewdef(v.oid) FROM pg_depend d "
+                "JOIN pg_rewrite r ON r.oid = d.objid JOIN pg_class v ON v.oid = r.ev_class "
+                "WHERE d.refobjid = %s::regclass AND v.relkind = 'v';", (self.TABLA,))
+            vistas = cursor.fetchall()
+            cursor.execute(
+                "SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisunique FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid WHERE i.indrelid = %s::regclass "
+                "AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = i.indexrelid);", (self.TABLA,))
+            indices = cursor.fetchall()
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id');", (self.TABLA,))
+            secuencia = cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = %s;", (self.TABLA,))
+            existentes = {fila[0] for fila in cursor.fetchall()}
+
+            for nombre, _ in vistas:
+                cursor.execute(f"DROP VIEW {nombre};")
+            # Los índices se recrean sobre la tabla nueva con el mismo nombre
+            for nombre, _, _ in indices:
+                cursor.execute(f"DROP INDEX {nombre};")
+            cursor.execute(f"ALTER TABLE {self.TABLA} RENAME TO {self.TABLA_SIN_PARTICION};")
+
+            cursor.execute(self.ddl_tabla(particionada=True, secuencia=secuencia))
+            if secuencia:
+                cursor.execute(f"ALTER SEQUENCE {secuencia} OWNED BY {self.TABLA}.id;")
+            cursor.execute(self._ddl_particion_defecto())
+            unidad = "year" if granularidad == "anual" else "month"
+            cursor.execute(f"SELECT DISTINCT date_trunc('{unidad}', fecha_autorizacion_1) "
+                           f"FROM {self.TABLA_SIN_PARTICION} WHERE fecha_autorizacion_1 IS NOT NULL;")
+            periodos = sorted(fila[0].date() for fila in cursor.fetchall())
+            for desde in periodos:
+                cursor.execute(self._ddl_particion(desde, granularidad))
+
+            columnas = ", ".join(["id"] + [n for n, _ in self.COLUMNAS if n in existentes])
+            cursor.execute(f"INSERT INTO {self.TABLA} ({columnas}) "
+                           f"SELECT {columnas} FROM {self.TABLA_SIN_PARTICION};")
+            filas = cursor.rowcount
+
+            omitidos = []
+            for nombre in self.INDICES:
+                if self.INDICES[nombre][1] and self.contar_duplicados(
+                        columnas=self._columnas_indice(nombre, particionada=True)):
+                    omitidos.append(nombre)
+                    continue
+                cursor.execute(self.ddl_indice(nombre, particionada=True))
+            for nombre, definicion, unico in indices:
+                if nombre in self.INDICES:
+                    continue
+                if unico:
+                    # Un índice único sin la columna de partición no puede existir en la tabla particionada
+                    omitidos.append(nombre)
+                    continue
+                cursor.execute(definicion + ";")
+            for nombre, definicion in vistas:
+                cursor.execute(f"CREATE VIEW {nombre} AS {definicion}")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        self.analizar()
+        return {'filas': filas, 'particiones': len(periodos), 'tabla_anterior': self.TABLA_SIN_PARTICION,
+                'vistas': [nombre for nombre, _ in vistas], 'indices_omitidos': omitidos}
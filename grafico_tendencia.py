@@ -0,0 +1,83 @@
+import statistics
+import tkinter as tk
+from typing import List, Optional, Sequence, Tuple
+
+
+class GraficoTendencia(tk.Canvas):
+    """
+    Gráfico de línea sobre un Canvas para la tendencia de una serie (p. ej. filas/s por ejecución).
+
+    Dibuja los puntos en orden, la mediana como línea punteada y resalta en otro color los
+    puntos marcados (ejecuciones con fallos o canceladas). Se redibuja al cambiar de tamaño.
+    """
+
+    MARGEN_IZQ = 60
+    MARGEN_DER = 15
+    MARGEN_SUP = 15
+    MARGEN_INF = 30
+
+    def __init__(self, parent, titulo: str = "", color_linea: str = "#2563EB", color_destacado: str = "#DC2626",
+                 color_mediana: str = "#94A3B8", bg: str = "#FFFFFF", height: int = 200, **kwargs):
+        super().__init__(parent, bg=bg, height=height, highlightthickness=0, **kwargs)
+        self.titulo = titulo
+        self.color_linea = color_linea
+        self.color_destacado = color_destacado
+        self.color_mediana = color_mediana
+        self._puntos: List[Tuple[str, float, bool]] = []
+        self.bind("<Configure>", lambda e: self._dibujar())
+
+    def establecer_serie(self, puntos: Sequence[Tuple[str, Optional[float], bool]]):
+        """
+        Args:
+            puntos: (etiqueta del eje x, valor, destacado) en orden cronológico; los valores
+                None se omiten.
+        """
+        self._puntos = [(etiqueta, float(valor), destacado) for etiqueta, valor, destacado in puntos
+                        if valor is not None]
+        self._dibujar()
+
+    def _dibujar(self):
+        self.delete("all")
+        ancho, alto = self.winfo_width(), self.winfo_height()
+        x0, y0 = self.MARGEN_IZQ, self.MARGEN_SUP
+        x1, y1 = ancho - self.MARGEN_DER, alto - self.MARGEN_INF
+        if x1 - x0 < 20 or y1 - y0 < 20:
+            return
+
+        self.create_line(x0, y1, x1, y1, fill="#CBD5E1")
+        self.create_line(x0, y0, x0, y1, fill="#CBD5E1")
+        if self.titulo:
+            self.create_text(x0 + 5, y0, text=self.titulo, anchor="nw", fill="#475569", font=("Segoe UI", 8))
+        if not self._puntos:
+            self.create_text((x0 + x1) / 2, (y0 + y1) / 2, text="Sin datos", fill="#94A3B8",
+                             font=("Segoe UI", 9))
+            return
+
+        valores = [valor for _, valor, _ in self._puntos]
+        maximo = max(valores) * 1.1 or 1
+        def y(valor):
+            return y1 - (valor / maximo) * (y1 - y0)
+        paso = (x1 - x0) / max(len(self._puntos) - 1, 1)
+        coordenadas = [(x0 + i * paso if len(self._puntos) > 1 else (x0 + x1) / 2, y(valor))
+                       for i, (_, valor, _) in enumerate(self._puntos)]
+
+        for valor in (0, maximo / 2, maximo):
+            self.create_text(x0 - 6, y(valor), text=f"{valor:,.0f}", anchor="e", fill="#64748B",
+                             font=("Segoe UI", 7))
+
+        mediana = statistics.median(valores)
+        self.create_line(x0, y(mediana), x1, y(mediana), fill=self.color_mediana, dash=(4, 3))
+        self.create_text(x1, y(mediana) - 2, text=f"mediana {mediana:,.0f}", anchor="se",
+                         fill=self.color_mediana, font=("Segoe UI", 7))
+
+        if len(coordenadas) > 1:
+            self.create_line(*[c for punto in coordenadas for c in punto], fill=self.color_linea, width=2)
+        radio = 3 if len(coordenadas) < 60 else 2
+        for (cx, cy), (_, _, destacado) in zip(coordenadas, self._puntos):
+            color = self.color_destacado if destacado else self.color_linea
+            self.create_oval(cx - radio, cy - radio, cx + radio, cy + radio, fill=color, outline=color)
+
+        self.create_text(x0, y1 + 6, text=self._puntos[0][0], anchor="nw", fill="#64748B", font=("Segoe UI", 7))
+        if len(self._puntos) > 1:
+            self.create_text(x1, y1 + 6, text=self._puntos[-1][0], anchor="ne", fill="#64748B",
+                             font=("Segoe UI", 7))
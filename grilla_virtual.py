@@ -0,0 +1,193 @@
+import math
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, Dict, List, Optional, Sequence, Set
+
+
+class GrillaVirtual(tk.Frame):
+    """
+    Tabla virtualizada sobre ttk.Treeview para resultados grandes.
+
+    Los datos viven en una lista de filas (backing array) y el Treeview solo contiene
+    tantos ítems como filas caben en pantalla; al desplazarse se reescriben sus valores
+    en lugar de insertar o borrar ítems. Los anchos de columna se calculan con una muestra.
+    La selección se guarda por posición en los datos y se vuelve a aplicar a los ítems en
+    cada desplazamiento, de modo que acompaña a sus filas y no a la posición en pantalla.
+    """
+
+    # Filas usadas para estimar el ancho de las columnas
+    FILAS_MUESTRA = 200
+
+    def __init__(self, parent, columnas: Sequence[str] = (), encabezados: Optional[Dict[str, str]] = None,
+                 height: int = 10, formatear: Optional[Callable[[Sequence], Sequence]] = None,
+                 bg: Optional[str] = None, **kwargs):
+        """
+        Args:
+            columnas: Identificadores de las columnas.
+            encabezados: Texto de encabezado por columna (por defecto el identificador).
+            height: Filas visibles iniciales (se ajusta al redimensionar).
+            formatear: Convierte una fila de datos en los valores a mostrar; se aplica
+                solo a las filas visibles.
+        """
+        super().__init__(parent, bg=bg, **kwargs)
+        self._filas: Sequence = []
+        self._inicio = 0
+        self._visibles = height
+        self._formatear = formatear or self._formatear_por_defecto
+        self._items: List[str] = []
+        # Posiciones (en _filas) seleccionadas y la de la fila activa para el teclado
+        self._seleccion: Set[int] = set()
+        self._actual: Optional[int] = None
+
+        self.tree = ttk.Treeview(self, show="headings", height=height, selectmode="extended")
+        self._scroll_y = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._yview)
+        self._scroll_x = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self._scroll_x.set)
+
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        self._scroll_y.grid(row=0, column=1, sticky='ns')
+        self._scroll_x.grid(row=1, column=0, sticky='ew')
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        # Etiqueta propia delante de las del Treeview: la rueda del mouse desplaza la grilla
+        # y no se propaga a los bindings del contenedor desplazable de la pestaña
+        etiqueta = f"GrillaVirtual{id(self)}"
+        self.tree.bindtags((etiqueta,) + self.tree.bindtags())
+        self.tree.bind_class(etiqueta, "<MouseWheel>", self._on_rueda)
+        self.tree.bind_class(etiqueta, "<Button-4>", lambda e: self._desplazar(-3))
+        self.tree.bind_class(etiqueta, "<Button-5>", lambda e: self._desplazar(3))
+        self.tree.bind_class(etiqueta, "<Up>", lambda e: self._mover_seleccion(-1))
+        self.tree.bind_class(etiqueta, "<Down>", lambda e: self._mover_seleccion(1))
+        self.tree.bind_class(etiqueta, "<Prior>", lambda e: self._mover_seleccion(-self._visibles))
+        self.tree.bind_class(etiqueta, "<Next>", lambda e: self._mover_seleccion(self._visibles))
+        self.tree.bind("<<TreeviewSelect>>", self._on_seleccion)
+        self.tree.bind("<Configure>", self._on_configure)
+
+        if columnas:
+            self.configurar_columnas(columnas, encabezados)
+
+    @staticmethod
+    def _formatear_por_defecto(fila: Sequence) -> List[str]:
+        return ["" if v is None or (isinstance(v, float) and math.isnan(v)) else str(v) for v in fila]
+
+    @property
+    def total(self) -> int:
+        return len(self._filas)
+
+    def configurar_columnas(self, columnas: Sequence[str], encabezados: Optional[Dict[str, str]] = None,
+                            anchos: Optional[Dict[str, int]] = None, alineacion: Optional[Dict[str, str]] = None):
+        """Define las columnas de la tabla."""
+        encabezados = encabezados or {}
+        self.tree['columns'] = list(columnas)
+        for col in columnas:
+            self.tree.heading(col, text=encabezados.get(col, col), anchor="w")
+            self.tree.column(col, width=(anchos or {}).get(col, 120), minwidth=60,
+                             anchor=(alineacion or {}).get(col, "w"))
+
+    def ajustar_anchos(self, minimo: int = 80, maximo: int = 300):
+        """Calcula el ancho de cada columna a partir de una muestra de filas."""
+        columnas = list(self.tree['columns'])
+        muestra = [self._formatear(fila) for fila in self._filas[:self.FILAS_MUESTRA]]
+        for i, col in enumerate(columnas):
+            largo = max((len(fila[i]) for fila in muestra if i < len(fila)), default=0)
+            ancho = min(max(len(str(col)) * 10 + 20, largo * 8 + 20, minimo), maximo)
+            self.tree.column(col, width=int(ancho))
+
+    def establecer_datos(self, filas: Sequence, ajustar_anchos: bool = False):
+        """Reemplaza los datos (lista de filas) y muestra el inicio."""
+        self._filas = filas
+        self._inicio = 0
+        self._seleccion = set()
+        self._actual = None
+        if ajustar_anchos:
+            self.ajustar_anchos()
+        self._renderizar()
+
+    def limpiar(self):
+        """Elimina todos los datos."""
+        self.establecer_datos([])
+
+    def _asegurar_items(self):
+        """Crea o elimina ítems del Treeview para que coincidan con las filas visibles."""
+        necesarios = min(self._visibles, len(self._filas))
+        if len(self._items) > necesarios:
+            self.tree.delete(*self._items[necesarios:])
+            del self._items[necesarios:]
+        while len(self._items) < necesarios:
+            self._items.append(self.tree.insert("", tk.END, values=()))
+
+    def _renderizar(self):
+        """Vuelca en los ítems existentes la ventana visible de filas."""
+        maximo_inicio = max(0, len(self._filas) - self._visibles)
+        self._inicio = min(max(0, self._inicio), maximo_inicio)
+        self._asegurar_items()
+        for desplazamiento, iid in enumerate(self._items):
+            self.tree.item(iid, values=self._formatear(self._filas[self._inicio + desplazamiento]))
+        # La selección sigue a las filas de datos: se limpia si salieron de la ventana
+        self.tree.selection_set([self._items[p - self._inicio] for p in sorted(self._seleccion)
+                                 if self._inicio <= p < self._inicio + len(self._items)])
+        if self._actual is not None and self._inicio <= self._actual < self._inicio + len(self._items):
+            self.tree.focus(self._items[self._actual - self._inicio])
+
+        total = len(self._filas)
+        if total:
+            self._scroll_y.set(self._inicio / total, min(1.0, (self._inicio + self._visibles) / total))
+        else:
+            self._scroll_y.set(0.0, 1.0)
+
+    def _desplazar(self, filas: int):
+        self._inicio += filas
+        self._renderizar()
+        return "break"
+
+    def _mover_seleccion(self, filas: int):
+        """Mueve la fila seleccionada (teclado); la ventana solo se desplaza al pasar sus bordes."""
+        if not self._filas:
+            return "break"
+        if self._actual is None:
+            actual = self._inicio if filas > 0 else self._inicio + len(self._items) - 1
+        else:
+            actual = min(max(0, self._actual + filas), len(self._filas) - 1)
+        self._actual = actual
+        self._seleccion = {actual}
+        if actual < self._inicio:
+            self._inicio = actual
+        elif actual >= self._inicio + self._visibles:
+            self._inicio = actual - self._visibles + 1
+        self._renderizar()
+        return "break"
+
+    def _on_seleccion(self, event):
+        """
+        Traduce la selección del Treeview (clic del usuario o la aplicada en _renderizar) a
+        posiciones de datos; las seleccionadas fuera de la ventana visible se conservan.
+        """
+        visibles = range(self._inicio, self._inicio + len(self._items))
+        self._seleccion = {p for p in self._seleccion if p not in visibles} | {
+            self._inicio + self._items.index(iid) for iid in self.tree.selection() if iid in self._items}
+        foco = self.tree.focus()
+        if foco in self._items:
+            self._actual = self._inicio + self._items.index(foco)
+
+    def _yview(self, *args):
+        """Comando del scrollbar vertical ('moveto' o 'scroll')."""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self._inicio = int(float(args[1]) * len(self._filas))
+            self._renderizar()
+        elif args[0] == "scroll":
+            paso = int(args[1]) * (self._visibles if args[2] == "pages" else 1)
+            self._desplazar(paso)
+
+    def _on_rueda(self, event):
+        return self._desplazar(int(-1 * (event.delta / 120)) * 3)
+
+    def _on_configure(self, event):
+        """Recalcula cuántas filas caben al cambiar el tamaño del widget."""
+        alto_fila = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        visibles = max(1, (event.height - alto_fila) // alto_fila)
+        if visibles != self._visibles:
+            self._visibles = visibles
+            self._renderizar()
@@ -0,0 +1,151 @@
+import getpass
+import hashlib
+import json
+import os
+import socket
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+# DDL de setup_migration_runs_table.sql (sin las consultas de verificación)
+_DDL = (
+    """CREATE TABLE IF NOT EXISTS migration_runs (
+           id SERIAL PRIMARY KEY,
+           proceso VARCHAR(20) NOT NULL,
+           archivo VARCHAR,
+           hash_archivo CHAR(64),
+           usuario VARCHAR(100),
+           equipo VARCHAR(100),
+           inicio TIMESTAMP NOT NULL,
+           fin TIMESTAMP NOT NULL,
+           duracion_s NUMERIC(12, 3),
+           etapas JSONB,
+           filas_leidas INTEGER DEFAULT 0,
+           insertados INTEGER DEFAULT 0,
+           actualizados INTEGER DEFAULT 0,
+           omitidos INTEGER DEFAULT 0,
+           fallidos INTEGER DEFAULT 0,
+           filas_por_segundo NUMERIC(12, 1),
+           cancelado BOOLEAN DEFAULT FALSE,
+           error VARCHAR
+       );""",
+    "CREATE INDEX IF NOT EXISTS idx_migration_runs_proceso_inicio ON migration_runs (proceso, inicio DESC);",
+)
+
+_COLUMNAS = ("proceso", "archivo", "hash_archivo", "usuario", "equipo", "inicio", "fin", "duracion_s",
+             "etapas", "filas_leidas", "insertados", "actualizados", "omitidos", "fallidos",
+             "filas_por_segundo", "cancelado", "error")
+
+
+def hash_archivos(rutas: Iterable[str]) -> Optional[str]:
+    """SHA-256 del contenido de los archivos (en orden); None si ninguno existe."""
+    digest = hashlib.sha256()
+    leido = False
+    for ruta in rutas:
+        if ruta and os.path.isfile(ruta):
+            with open(ruta, "rb") as archivo:
+                for bloque in iter(lambda: archivo.read(1024 * 1024), b""):
+                    digest.update(bloque)
+            leido = True
+    return digest.hexdigest() if leido else None
+
+
+def ejecucion_desde_resumen(proceso: str, archivos: List[str], resumen: Dict, filas_leidas: int,
+                            insertados: int = 0, actualizados: int = 0, omitidos: int = 0, fallidos: int = 0,
+                            cancelado: bool = False, error: Optional[str] = None,
+                            usuario: Optional[str] = None) -> Dict:
+    """
+    Fila de migration_runs a partir del resumen de MetricasEjecucion y los contadores del proceso.
+    La velocidad es filas leídas / duración total, comparable entre ejecuciones con o sin nuevos.
+    """
+    inicio = datetime.fromisoformat(resumen['inicio'])
+    duracion = resumen['duracion_s'] or 0
+    try:
+        usuario = usuario or getpass.getuser()
+    except Exception:
+        usuario = None
+    return {
+        'proceso': proceso,
+        'archivo': "; ".join(os.path.basename(a) for a in archivos if a),
+        'hash_archivo': hash_archivos(archivos),
+        'usuario': usuario,
+        'equipo': socket.gethostname(),
+        'inicio': inicio,
+        'fin': datetime.now(),
+        'duracion_s': duracion,
+        'etapas': {nombre: etapa['segundos'] for nombre, etapa in resumen['etapas'].items()},
+        'filas_leidas': filas_leidas,
+        'insertados': insertados,
+        'actualizados': actualizados,
+        'omitidos': omitidos,
+        'fallidos': fallidos,
+        'filas_por_segundo': round(filas_leidas / duracion, 1) if duracion > 0 else None,
+        'cancelado': cancelado,
+        'error': error,
+    }
+
+
+class HistorialEjecuciones:
+    """
+    Historial de migraciones y cargas CUPS en la tabla migration_runs: una fila por ejecución
+    con el hash del archivo, usuario, tiempos por etapa y contadores de filas.
+    """
+
+    def __init__(self, conn):
+        """
+        Args:
+            conn: Conexión abierta (la del Query/CupsQuery de la ejecución o del pool); no se cierra.
+        """
+        self.conn = conn
+        self._tabla_verificada = False
+
+    def asegurar_tabla(self):
+        """Crea la tabla y su índice si no existen."""
+        if self._tabla_verificada:
+            return
+        cursor = self.conn.cursor()
+        try:
+            for sentencia in _DDL:
+                cursor.execute(sentencia)
+            self.conn.commit()
+            self._tabla_verificada = True
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def registrar(self, ejecucion: Dict) -> bool:
+        """Inserta una ejecución (ver ejecucion_desde_resumen). Retorna False si no se pudo guardar."""
+        try:
+            self.asegurar_tabla()
+            valores = [json.dumps(ejecucion.get(c)) if c == 'etapas' else ejecucion.get(c) for c in _COLUMNAS]
+            cursor = self.conn.cursor()
+            cursor.execute(
+                f"INSERT INTO migration_runs ({', '.join(_COLUMNAS)}) "
+                f"VALUES ({', '.join(['%s'] * len(_COLUMNAS))});", valores)
+            self.conn.commit()
+            cursor.close()
+            return True
+        except Exception as e:
+            print(f"Error registrando la ejecución en migration_runs: {e}")
+            self.conn.rollback()
+            return False
+
+    def obtener(self, proceso: Optional[str] = None, limite: int = 200) -> List[Dict]:
+        """Últimas ejecuciones (más recientes primero), de un proceso o de todos."""
+        try:
+            self.asegurar_tabla()
+            cursor = self.conn.cursor()
+            condicion = "WHERE proceso = %s" if proceso else ""
+            cursor.execute(
+                f"SELECT id, {', '.join(_COLUMNAS)} FROM migration_runs {condicion} "
+                f"ORDER BY inicio DESC LIMIT %s;", ([proceso] if proceso else []) + [limite])
+            nombres = [d[0] for d in cursor.description]
+            filas = [dict(zip(nombres, fila)) for fila in cursor.fetchall()]
+            cursor.close()
+            self.conn.commit()
+            return filas
+        except Exception as e:
+            print(f"Error consultando migration_runs: {e}")
+            self.conn.rollback()
+            return []
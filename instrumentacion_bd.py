@@ -0,0 +1,265 @@
+"""
+Instrumentación de las llamadas a PostgreSQL de Query, CupsQuery y MonitorConexion.
+
+Las conexiones se abren con connection_factory=ConexionInstrumentada, cuyos cursores
+(CursorInstrumentado) miden cada execute/executemany y cada commit/rollback de la conexión.
+Cada medición se atribuye al método que hizo la llamada (p. ej. "Query.insertar_solicitudes_lote",
+saltando execute_values/execute_batch, SentenciaPreparada y el context manager _cursor) y se acumula en
+registro_consultas: llamadas (idas y vueltas al servidor), errores, filas, tiempo total e
+histograma de latencias. Las sentencias que superan el umbral van al log de consultas lentas,
+con su plan (EXPLAIN ANALYZE) si se activó la captura.
+"""
+import bisect
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from typing import Dict, List, Optional
+
+import psycopg2.extensions
+
+from metricas import escribir_textfile
+
+logger = logging.getLogger("consultas_lentas")
+
+# Módulos cuyos marcos se saltan al buscar el método que originó la llamada
+_MODULOS_INTERMEDIOS = {__name__, 'psycopg2.extras', 'contextlib', 'sentencias_preparadas'}
+_FUNCIONES_INTERMEDIAS = {'_cursor'}
+
+
+def _operacion() -> str:
+    """Nombre calificado (Clase.metodo) de la primera función fuera de psycopg2.extras y de este módulo."""
+    marco = sys._getframe(1)
+    while marco is not None and (marco.f_globals.get('__name__') in _MODULOS_INTERMEDIOS
+                                 or marco.f_code.co_name in _FUNCIONES_INTERMEDIAS):
+        marco = marco.f_back
+    return marco.f_code.co_qualname if marco is not None else "desconocida"
+
+
+class RegistroConsultas:
+    """Contadores, histogramas de latencia y log de consultas lentas por operación (seguro entre hilos)."""
+
+    # Límites superiores (segundos) de los cubos del histograma, como en Prometheus
+    CUBOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, umbral_lento_ms: float = 500, explain: bool = False, max_lentas: int = 100):
+        self.activo = True
+        self.umbral_lento_ms = umbral_lento_ms
+        self.explain = explain
+        self._operaciones: Dict[str, Dict] = {}
+        self._lentas = deque(maxlen=max_lentas)
+        self._manejador: Optional[logging.Handler] = None
+        self._lock = threading.Lock()
+
+    def configurar(self, umbral_lento_ms: Optional[float] = None, explain: Optional[bool] = None,
+                   archivo_log: Optional[str] = None):
+        """
+        Args:
+            umbral_lento_ms: Duración a partir de la cual una sentencia se registra como lenta.
+            explain: Si es True, las SELECT lentas se repiten con EXPLAIN (ANALYZE, BUFFERS)
+                para guardar su plan (duplica su costo; solo para diagnóstico).
+            archivo_log: Log rotativo de consultas lentas (reemplaza al anterior).
+        """
+        if umbral_lento_ms is not None:
+            self.umbral_lento_ms = umbral_lento_ms
+        if explain is not None:
+            self.explain = explain
+        if archivo_log is not None:
+            with self._lock:
+                if self._manejador is not None:
+                    logger.removeHandler(self._manejador)
+                    self._manejador.close()
+                os.makedirs(os.path.dirname(os.path.abspath(archivo_log)), exist_ok=True)
+                self._manejador = RotatingFileHandler(archivo_log, maxBytes=2_000_000, backupCount=3,
+                                                      encoding="utf-8")
+                self._manejador.setFormatter(logging.Formatter("%(asctime)s %(message)s", "%Y-%m-%d %H:%M:%S"))
+                logger.addHandler(self._manejador)
+                logger.propagate = False
+
+    def registrar(self, operacion: str, segundos: float, filas: int = 0, error: bool = False):
+        """Suma una llamada a la operación."""
+        with self._lock:
+            datos = self._operaciones.get(operacion)
+            if datos is None:
+                datos = self._operaciones[operacion] = {'llamadas': 0, 'errores': 0, 'filas': 0,
+                                                        'segundos': 0.0, 'max_s': 0.0,
+                                                        'cubos': [0] * (len(self.CUBOS) + 1)}
+            datos['llamadas'] += 1
+            datos['errores'] += int(error)
+            datos['filas'] += max(filas, 0)
+            datos['segundos'] += segundos
+            datos['max_s'] = max(datos['max_s'], segundos)
+            datos['cubos'][bisect.bisect_left(self.CUBOS, segundos)] += 1
+
+    def registrar_lenta(self, operacion: str, segundos: float, sentencia: str, plan: Optional[str] = None):
+        """Guarda una consulta lenta en memoria y en el log."""
+        entrada = {'momento': time.strftime('%Y-%m-%d %H:%M:%S'), 'operacion': operacion,
+                   'ms': round(segundos * 1000, 1), 'sentencia': sentencia[:2000], 'plan': plan}
+        with self._lock:
+            self._lentas.append(entrada)
+        texto = f"{operacion} {entrada['ms']} ms\n    {entrada['sentencia']}"
+        if plan:
+            texto += "\n    " + plan.replace("\n", "\n    ")
+        logger.warning(texto)
+
+    @property
+    def lentas(self) -> List[Dict]:
+        """Últimas consultas lentas (más recientes al final)."""
+        with self._lock:
+            return list(self._lentas)
+
+    def reiniciar(self):
+        """Borra contadores y consultas lentas."""
+        with self._lock:
+            self._operaciones.clear()
+            self._lentas.clear()
+
+    def _percentil(self, cubos: List[int], fraccion: float) -> Optional[float]:
+        """Cota superior (ms) del cubo que contiene el percentil; None si cae en el último cubo."""
+        objetivo = fraccion * sum(cubos)
+        acumulado = 0
+        for indice, cantidad in enumerate(cubos):
+            acumulado += cantidad
+            if acumulado >= objetivo:
+                return self.CUBOS[indice] * 1000 if indice < len(self.CUBOS) else None
+        return None
+
+    def resumen(self) -> Dict[str, Dict]:
+        """Por operación, ordenado por tiempo total: llamadas, errores, filas, tiempos e histograma acumulado."""
+        with self._lock:
+            operaciones = {nombre: dict(datos, cubos=list(datos['cubos'])) for nombre, datos in self._operaciones.items()}
+        resumen = {}
+        for nombre, datos in sorted(operaciones.items(), key=lambda item: -item[1]['segundos']):
+            acumulados, total = {}, 0
+            for limite, cantidad in zip(self.CUBOS + (float('inf'),), datos['cubos']):
+                total += cantidad
+                acumulados['+Inf' if limite == float('inf') else str(limite)] = total
+            resumen[nombre] = {
+                'llamadas': datos['llamadas'],
+                'errores': datos['errores'],
+                'filas': datos['filas'],
+                'segundos': round(datos['segundos'], 4),
+                'promedio_ms': round(datos['segundos'] / datos['llamadas'] * 1000, 2),
+                'p50_ms': self._percentil(datos['cubos'], 0.50),
+                'p95_ms': self._percentil(datos['cubos'], 0.95),
+                'max_ms': round(datos['max_s'] * 1000, 2),
+                'histograma': acumulados,
+            }
+        return resumen
+
+
+registro_consultas = RegistroConsultas()
+
+
+class CursorInstrumentado(psycopg2.extensions.cursor):
+    """Cursor que mide cada execute/executemany y lo registra en registro_consultas."""
+
+    def execute(self, query, vars=None):
+        if not registro_consultas.activo:
+            return super().execute(query, vars)
+        return self._medir(super().execute, query, vars, unica=True)
+
+    def executemany(self, query, vars_list):
+        if not registro_consultas.activo:
+            return super().executemany(query, vars_list)
+        return self._medir(super().executemany, query, vars_list, unica=False)
+
+    def _medir(self, ejecutar, query, argumentos, unica: bool):
+        operacion = _operacion()
+        inicio = time.perf_counter()
+        try:
+            resultado = ejecutar(query, argumentos)
+        except Exception:
+            registro_consultas.registrar(operacion, time.perf_counter() - inicio, error=True)
+            raise
+        segundos = time.perf_counter() - inicio
+        registro_consultas.registrar(operacion, segundos, self.rowcount)
+        if segundos * 1000 >= registro_consultas.umbral_lento_ms:
+            sentencia = self.query if unica else query
+            if isinstance(sentencia, bytes):
+                codificacion = psycopg2.extensions.encodings.get(self.connection.encoding, "utf-8")
+                sentencia = sentencia.decode(codificacion, errors="replace")
+            plan = self._plan(sentencia) if unica and registro_consultas.explain else None
+            registro_consultas.registrar_lenta(operacion, segundos, " ".join(sentencia.split()), plan)
+        return resultado
+
+    def _plan(self, sentencia: str) -> Optional[str]:
+        """
+        Plan real de una SELECT lenta. Se ejecuta dentro de un savepoint con un cursor sin
+        instrumentar; las sentencias que modifican datos nunca se repiten.
+        """
+        if not sentencia.lstrip().upper().startswith("SELECT") or self.connection.autocommit:
+            return None
+        if self.connection.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_INTRANS:
+            return None
+        cursor = psycopg2.extensions.cursor(self.connection)
+        try:
+            cursor.execute("SAVEPOINT clinizad_explain")
+            try:
+                cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + sentencia)
+                return "\n".join(fila[0] for fila in cursor.fetchall())
+            except Exception as e:
+                return f"(no se pudo obtener el plan: {str(e).strip()})"
+            finally:
+                cursor.execute("ROLLBACK TO SAVEPOINT clinizad_explain")
+                cursor.execute("RELEASE SAVEPOINT clinizad_explain")
+        except Exception:
+            return None
+        finally:
+            cursor.close()
+
+
+class ConexionInstrumentada(psycopg2.extensions.connection):
+    """Conexión cuyos cursores son CursorInstrumentado y cuyos commit/rollback también se miden."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cursor_factory = CursorInstrumentado
+
+    def commit(self):
+        self._medir(super().commit, "commit")
+
+    def rollback(self):
+        self._medir(super().rollback, "rollback")
+
+    @staticmethod
+    def _medir(accion, nombre: str):
+        if not registro_consultas.activo:
+            return accion()
+        operacion = f"{_operacion()} ({nombre})"
+        inicio = time.perf_counter()
+        try:
+            accion()
+        except Exception:
+            registro_consultas.registrar(operacion, time.perf_counter() - inicio, error=True)
+            raise
+        registro_consultas.registrar(operacion, time.perf_counter() - inicio)
+
+
+def formatear_resumen_consultas(resumen: Dict[str, Dict], limite: int = 15) -> str:
+    """Tabla de texto con las operaciones más costosas de un resumen de RegistroConsultas."""
+    lineas = [f"{'Operación':<45}{'Llamadas':>9}{'Total s':>9}{'Prom ms':>9}{'p95 ms':>9}{'Máx ms':>9}{'Err':>5}"]
+    for nombre, datos in list(resumen.items())[:limite]:
+        p95 = f"{datos['p95_ms']:g}" if datos['p95_ms'] is not None else ">10000"
+        lineas.append(f"{nombre[-45:]:<45}{datos['llamadas']:>9,}{datos['segundos']:>9.2f}"
+                      f"{datos['promedio_ms']:>9.1f}{p95:>9}{datos['max_ms']:>9.0f}{datos['errores']:>5}")
+    return "\n".join(lineas)
+
+
+def exportar_prometheus_consultas(resumen: Dict[str, Dict], ruta: str):
+    """Escribe el resumen como histograma de Prometheus (clinizad_bd_llamada_segundos) más contadores."""
+    lineas = ["# HELP clinizad_bd_llamada_segundos Latencia de las llamadas a la base de datos por operación",
+              "# TYPE clinizad_bd_llamada_segundos histogram"]
+    for operacion, datos in resumen.items():
+        for limite, cantidad in datos['histograma'].items():
+            lineas.append(f'clinizad_bd_llamada_segundos_bucket{{operacion="{operacion}",le="{limite}"}} {cantidad}')
+        lineas.append(f'clinizad_bd_llamada_segundos_sum{{operacion="{operacion}"}} {datos["segundos"]}')
+        lineas.append(f'clinizad_bd_llamada_segundos_count{{operacion="{operacion}"}} {datos["llamadas"]}')
+    for nombre, ayuda, clave in (("clinizad_bd_errores_total", "Llamadas a la base de datos con error", 'errores'),
+                                 ("clinizad_bd_filas_total", "Filas afectadas o retornadas", 'filas')):
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} counter"]
+        lineas += [f'{nombre}{{operacion="{operacion}"}} {datos[clave]}' for operacion, datos in resumen.items()]
+    escribir_textfile(lineas, ruta)
@@ -1,24 +1,81 @@
+import time
+_INICIO = time.perf_counter()
+
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, scrolledtext
+from tkinter import ttk, filedialog, messagebox
 import threading
 import queue
+import multiprocessing
+import importlib.util
 import os
+import statistics
 import sys
+from contextlib import contextmanager
 from datetime import datetime
-import pandas as pd
+from grilla_virtual import GrillaVirtual
+from canal_progreso import CanalProgreso
+from panel_log import PanelLog
+from grafico_tendencia import GraficoTendencia
+
+_MODULOS_INTERFAZ = time.perf_counter()
+
+# Pila de datos (pandas, numpy, psycopg2, openpyxl y las clases existentes que los usan).
+# No se importa al cargar el módulo: la ventana se muestra primero y la pila se importa
+# en segundo plano, o en el primer uso si la precarga aún no terminó (cargar_pila_datos).
+pd = None
+Query = EmssanarDataReader = BuscadorAfiliados = MonitorConexion = MotorMigracion = None
+CupsDataReader = CupsQuery = BuscadorCupsIncremental = None
+_pila_lock = threading.Lock()
+_pila_cargada = False
+_error_cups = None
+
+
+def cargar_pila_datos(cups=False):
+    """
+    Importa la pila de datos una sola vez (seguro desde cualquier hilo).
+    Lanza ImportError si falta un módulo, o si cups=True y los módulos CUPS no cargaron.
+    """
+    global pd, Query, EmssanarDataReader, BuscadorAfiliados, LectorAfiliadosBD, MonitorConexion, MotorMigracion
+    global CupsDataReader, CupsQuery, BuscadorCupsIncremental
+    global MetricasEjecucion, formatear_resumen, exportar_json, exportar_prometheus
+    global registro_consultas, formatear_resumen_consultas, exportar_prometheus_consultas
+    global SesionPerfilado, crear_reporte_soporte
+    global HistorialEjecuciones, ejecucion_desde_resumen, GestorEsquema
+    global _pila_cargada, _error_cups
+    
+    with _pila_lock:
+        if not _pila_cargada:
+            import pandas as pd
+            from Query import Query
+            from read_data import EmssanarDataReader
+            from buscador_afiliados import BuscadorAfiliados, LectorAfiliadosBD
+            from monitor_conexion import MonitorConexion
+            from motor_migracion import MotorMigracion
+            from metricas import MetricasEjecucion, formatear_resumen, exportar_json, exportar_prometheus
+            from instrumentacion_bd import registro_consultas, formatear_resumen_consultas, exportar_prometheus_consultas
+            from perfilado import SesionPerfilado, crear_reporte_soporte
+            from historial_ejecuciones import HistorialEjecuciones, ejecucion_desde_resumen
+            from esquema_solicitudes import GestorEsquema
+            try:
+                from read_cups_data import CupsDataReader
+                from cups_query import CupsQuery
+                from buscador_cups import BuscadorCupsIncremental
+            except ImportError as e:
+                _error_cups = str(e)
+            _pila_cargada = True
+    
+    if cups and _error_cups is not None:
+        raise ImportError(f"Módulos CUPS no disponibles: {_error_cups}")
+
+
+def _modulos_disponibles(*nombres):
+    """Indica si los módulos existen, sin importarlos."""
+    return all(importlib.util.find_spec(nombre) is not None for nombre in nombres)
+
 
-# Importar las clases existentes
-try:
-    from Query import Query
-    from read_data import EmssanarDataReader
-    from read_cups_data import CupsDataReader
-    from cups_query import CupsQuery
-except ImportError as e:
-    CupsDataReader = None
-    CupsQuery = None
-    if "Query" in str(e) or "read_data" in str(e):
-        messagebox.showerror("Error", "No se encontraron los archivos Query.py y read_data.py")
-        sys.exit(1)
+if not _modulos_disponibles("Query", "read_data"):
+    messagebox.showerror("Error", "No se encontraron los archivos Query.py y read_data.py")
+    sys.exit(1)
 
 
 class EmssanarGUI:
@@ -43,6 +100,28 @@ class EmssanarGUI:
     
     VERSION = "v1.0.0"
     
+    # Registros por página en la consulta CUPS (paginación por clave)
+    PAGINA_CUPS = 200
+    
+    # Intervalo (ms) con que la interfaz muestrea el progreso de los hilos de trabajo
+    INTERVALO_REFRESCO_MS = 100
+    
+    # Registros por INSERT de varias filas (y por commit) en la migración
+    LOTE_MIGRACION = 500
+    
+    # Líneas que conserva cada panel de log (las anteriores quedan en logs/*.log)
+    LINEAS_LOG = 1000
+    
+    # Espera (ms) tras la última tecla antes de lanzar la búsqueda incremental
+    DEBOUNCE_CUPS_MS = 300
+    
+    # Backend de la migración y la carga CUPS: "psycopg2" (pool del monitor) o "pipeline"
+    # (psycopg 3 en modo pipeline, para enlaces con latencia; ver pipeline_bd.py)
+    BACKEND_BD = os.environ.get("CLINIZAD_BACKEND_BD", "psycopg2")
+    
+    # Banderas del catálogo CUPS en los resultados por afiliado -> encabezado de la grilla
+    ENCABEZADOS_BANDERAS = {'preparacion_especial': "Preparación Especial", 'remitido': "Remitido"}
+    
     # Usuarios válidos
     USUARIOS_VALIDOS = {
         "admin": "admin123",
@@ -50,13 +129,135 @@ class EmssanarGUI:
         "usuario": "password"
     }
 
-    def __init__(self, root):
+    def __init__(self, root, reportar_inicio=False):
+        """
+        Args:
+            reportar_inicio: Si es True, al terminar la precarga se imprime y se guarda
+                en logs/inicio.log el tiempo de cada etapa del arranque.
+        """
         self.root = root
+        self._reportar_inicio = reportar_inicio
+        self._tiempos_inicio = [("Módulos de interfaz importados", _MODULOS_INTERFAZ - _INICIO)]
         self._configurar_ventana()
         self._inicializar_variables()
         self._configurar_estilos()
         self._crear_widgets()
+        self._marcar_inicio("Ventana construida")
         self._verificar_cola()
+        self.root.after_idle(self._iniciar_precarga)
+    
+    # === ARRANQUE ===
+    
+    def _marcar_inicio(self, etapa):
+        """Registra el tiempo transcurrido desde el inicio del módulo hasta una etapa."""
+        self._tiempos_inicio.append((etapa, time.perf_counter() - _INICIO))
+    
+    def _iniciar_precarga(self):
+        """Con la ventana ya visible, importa la pila de datos en segundo plano."""
+        self._marcar_inicio("Ventana visible")
+        
+        def precargar():
+            try:
+                cargar_pila_datos()
+                self.queue.put(("pila_datos_lista", None))
+            except Exception as e:
+                self.queue.put(("pila_datos_lista", str(e)))
+        
+        threading.Thread(target=precargar, daemon=True).start()
+    
+    def _on_pila_datos_lista(self, error):
+        """Termina el arranque: inicia el monitor de conexión y reporta los tiempos."""
+        self._marcar_inicio("Pila de datos importada (segundo plano)")
+        if error is not None:
+            print(f"Error al importar la pila de datos: {error}")
+            self.footer_status.config(text="Error al cargar módulos", fg=self.COLORES['error'])
+        else:
+            try:
+                self._obtener_monitor().configurar(self._parametros_conexion())
+                self._verificar_esquema()
+            except ValueError:
+                pass
+        if self._reportar_inicio:
+            self._guardar_reporte_inicio()
+    
+    def _guardar_reporte_inicio(self):
+        """Imprime los tiempos de arranque y los agrega a logs/inicio.log."""
+        lineas = [f"Arranque {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ({self.VERSION})"]
+        lineas += [f"  {etapa:<45} {segundos * 1000:8.0f} ms" for etapa, segundos in self._tiempos_inicio]
+        reporte = "\n".join(lineas)
+        print(reporte)
+        try:
+            ruta = self._ruta_log("inicio.log")
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            with open(ruta, "a", encoding="utf-8") as archivo:
+                archivo.write(reporte + "\n")
+        except OSError as e:
+            print(f"No se pudo guardar el reporte de arranque: {e}")
+    
+    def _verificar_esquema(self):
+        """Revisa en segundo plano la tabla solicitudes_servicios y sus índices (GestorEsquema)."""
+        def verificar():
+            try:
+                with self._obtener_monitor().conexion() as conn:
+                    resultado = GestorEsquema(conn).verificar()
+                self.queue.put(("esquema_verificado", resultado))
+            except Exception as e:
+                # Sin conexión al arrancar: el footer ya lo muestra
+                print(f"No se pudo verificar el esquema: {e}")
+        
+        threading.Thread(target=verificar, daemon=True).start()
+    
+    def _ofrecer_crear_esquema(self, resultado):
+        """Si al esquema le falta algo, ofrece crearlo (en segundo plano, sin bloquear la tabla)."""
+        if resultado['ok']:
+            return
+        problemas = "\n".join(f"• {p}" for p in resultado['problemas'])
+        if not messagebox.askyesno(
+                "Esquema incompleto",
+                f"La tabla solicitudes_servicios no tiene todo lo necesario:\n\n{problemas}\n\n"
+                "¿Crear ahora lo que falta? Los índices se construyen sin bloquear la tabla, "
+                "pero en tablas grandes pueden tardar varios minutos."):
+            return
+        self.footer_status.config(text="Creando índices...", fg=self.COLORES['azul_principal'])
+        
+        def crear():
+            try:
+                with self._obtener_monitor().conexion() as conn:
+                    resultado = GestorEsquema(conn).asegurar()
+                self.queue.put(("esquema_creado", resultado))
+            except Exception as e:
+                self.queue.put(("esquema_error", str(e).strip()))
+        
+        threading.Thread(target=crear, daemon=True).start()
+    
+    def _mostrar_esquema_creado(self, resultado):
+        """Informa lo creado y lo que quedó pendiente (p. ej. números de solicitud repetidos)."""
+        self.footer_status.config(text="BD: Conectada", fg=self.COLORES['exito'])
+        creados = ", ".join(resultado['creados']) or "nada"
+        if resultado['ok']:
+            messagebox.showinfo("Esquema", f"Esquema completo.\n\nCreado: {creados}")
+        else:
+            problemas = "\n".join(f"• {p}" for p in resultado['problemas'])
+            messagebox.showwarning("Esquema", f"Creado: {creados}\n\nQueda pendiente:\n{problemas}")
+    
+    def _pila_disponible(self, cups=False):
+        """Asegura la pila de datos desde la interfaz; muestra el error si no se puede importar."""
+        try:
+            cargar_pila_datos(cups=cups)
+            return True
+        except ImportError as e:
+            messagebox.showerror("Error", f"No se pudieron cargar los módulos de datos:\n{str(e)}")
+            return False
+    
+    def _obtener_monitor(self):
+        """Retorna el monitor de conexión, creándolo (e importando psycopg2) en el primer uso."""
+        with self._monitor_lock:
+            if self.monitor_conexion is None:
+                cargar_pila_datos()
+                self._configurar_registro_consultas()
+                self.monitor_conexion = MonitorConexion(
+                    al_estado=lambda estado: self.queue.put(("conexion_estado", estado)))
+            return self.monitor_conexion
     
     def _configurar_ventana(self):
         """Configura la ventana principal."""
@@ -105,10 +306,24 @@ class EmssanarGUI:
         self.en_proceso = False
         self.cancelar = False
         self.queue = queue.Queue()
+        self.canal_migracion = CanalProgreso()
+        self.canal_cups = CanalProgreso()
+        # Perfilado de migración y carga CUPS (también con CLINIZAD_PERFILAR=1)
+        self.perfilar = tk.BooleanVar(value=os.environ.get("CLINIZAD_PERFILAR") == "1")
+        
+        # Conexión: sondeo periódico en segundo plano y pool precalentado
+        self._prueba_conexion = None
+        self.monitor_conexion = None
+        self._monitor_lock = threading.Lock()
         
         # Cache
         self._cache_excel = None
         self._cache_archivo = None
+        self._cache_lock = threading.Lock()
+        self._buscador_afiliados = None
+        self._lector_afiliados_bd = None
+        self._fuente_afiliado = None
+        self._bd_conectada = False
         
         # Animación
         self._animacion_activa = False
@@ -116,6 +331,12 @@ class EmssanarGUI:
         
         # CUPS
         self.en_proceso_cups = False
+        self._cups_filtros = None
+        self._cups_cursores = [None]  # Cursor de inicio de cada página visitada
+        self._cups_pagina = 0
+        self._buscador_cups = None
+        self._buscador_cups_conexion = None
+        self._cups_debounce_id = None
     
     def _configurar_estilos(self):
         """Configura los estilos de la interfaz."""
@@ -231,13 +452,31 @@ class EmssanarGUI:
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
         self._crear_pestaña_configuracion()
-        self._crear_pestaña_migracion()
         
-        if CupsDataReader and CupsQuery:
-            try:
-                self._crear_pestaña_codigos_cups()
-            except Exception as e:
-                print(f"Error al crear pestaña CUPS: {e}")
+        # Las demás pestañas se agregan vacías y se construyen en la primera visita
+        self._pestañas_pendientes = {}
+        self._agregar_pestaña_diferida(" Autorizaciones ", self._crear_pestaña_migracion)
+        if _modulos_disponibles("read_cups_data", "cups_query"):
+            self._agregar_pestaña_diferida(" Códigos CUPS ", self._crear_pestaña_codigos_cups)
+        self._agregar_pestaña_diferida(" Historial ", self._crear_pestaña_historial)
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_cambio_pestaña)
+    
+    def _agregar_pestaña_diferida(self, titulo, constructor):
+        """Agrega una pestaña vacía cuyo contenido crea constructor(frame) al visitarla."""
+        frame = ttk.Frame(self.notebook)
+        self.notebook.add(frame, text=titulo)
+        self._pestañas_pendientes[str(frame)] = (titulo.strip(), frame, constructor)
+    
+    def _on_cambio_pestaña(self, event=None):
+        """Construye la pestaña seleccionada si es su primera visita."""
+        pendiente = self._pestañas_pendientes.pop(self.notebook.select(), None)
+        if pendiente is None:
+            return
+        titulo, frame, constructor = pendiente
+        try:
+            constructor(frame)
+        except Exception as e:
+            print(f"Error al crear pestaña {titulo}: {e}")
     
     def _crear_footer(self):
         """Crea la barra de estado."""
@@ -443,36 +682,55 @@ class EmssanarGUI:
             self._actualizar_estado_footer()
             self.entry_usuario_app.focus_set()
     
+    def _parametros_conexion(self):
+        """Parámetros de conexión según la configuración de BD."""
+        return {
+            'host': self.host_db.get(),
+            'port': int(self.puerto_db.get()),
+            'database': self.nombre_db.get(),
+            'user': self.usuario_db.get(),
+            'password': self.password_db.get()
+        }
+    
     def _probar_conexion(self):
-        """Prueba la conexión a la base de datos."""
+        """Pide al monitor un sondeo inmediato; el resultado llega por la cola."""
         c = self.COLORES
+        try:
+            parametros = self._parametros_conexion()
+        except ValueError:
+            self.label_estado_db.config(text="✗ Error: puerto inválido", fg=c['error'])
+            return
+        
+        if not self._pila_disponible():
+            return
         self.label_estado_db.config(text="⏳ Probando conexión...", fg=c['azul_principal'])
-        self.root.update()
+        self._prueba_conexion = parametros
+        self._obtener_monitor().configurar(parametros)
+        self._obtener_monitor().probar()
+    
+    def _mostrar_estado_conexion(self, estado):
+        """Muestra en el footer el resultado de un sondeo (y en la configuración si fue pedido)."""
+        c = self.COLORES
+        self._bd_conectada = estado['conectado']
+        if estado['conectado']:
+            self.footer_status.config(text=f"BD: Conectada ({estado['latencia_ms']:.0f} ms)", fg=c['exito'])
+        else:
+            self.footer_status.config(text="BD: Desconectada", fg=c['error'])
         
-        try:
-            import psycopg2
-            conn = psycopg2.connect(
-                host=self.host_db.get(),
-                port=int(self.puerto_db.get()),
-                database=self.nombre_db.get(),
-                user=self.usuario_db.get(),
-                password=self.password_db.get()
-            )
-            conn.close()
-            self.label_estado_db.config(text="✓ Conexión exitosa", fg=c['exito'])
-            self.footer_status.config(text="BD: Conectada", fg=c['exito'])
+        if self._prueba_conexion is None or estado['parametros'] != self._prueba_conexion:
+            return
+        self._prueba_conexion = None
+        if estado['conectado']:
+            self.label_estado_db.config(text=f"✓ Conexión exitosa ({estado['latencia_ms']:.0f} ms)", fg=c['exito'])
             messagebox.showinfo("Éxito", "Conexión establecida correctamente")
-        except Exception as e:
-            self.label_estado_db.config(text=f"✗ Error: {str(e)}", fg=c['error'])
-            self.footer_status.config(text="BD: Desconectada", fg=c['error'])
-            messagebox.showerror("Error", f"No se pudo conectar:\n{str(e)}")
+        else:
+            self.label_estado_db.config(text=f"✗ Error: {estado['error']}", fg=c['error'])
+            messagebox.showerror("Error", f"No se pudo conectar:\n{estado['error']}")
 
     # === PESTAÑA MIGRACIÓN ===
     
-    def _crear_pestaña_migracion(self):
+    def _crear_pestaña_migracion(self, frame):
         """Pestaña de migración de datos."""
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text=" Autorizaciones ")
         
         # Canvas con scrollbar
         canvas = tk.Canvas(frame, bg=self.COLORES['blanco'], highlightthickness=0)
@@ -555,6 +813,8 @@ class EmssanarGUI:
             activeforeground=c['blanco'], disabledforeground="#D1D5DB", font=("Segoe UI", 9, "bold"),
             relief="flat", cursor="hand2", padx=15, pady=6, bd=0)
         self.btn_cancelar.pack(side=tk.LEFT, padx=(10, 5))
+        
+        ttk.Checkbutton(frame, text="Perfilar ejecución", variable=self.perfilar).pack(side=tk.LEFT, padx=(15, 5))
     
     def _crear_seccion_estadisticas(self, parent):
         """Sección de estadísticas."""
@@ -565,16 +825,18 @@ class EmssanarGUI:
         container = tk.Frame(frame, bg=c['fondo_seccion'])
         container.pack(fill=tk.X, pady=5)
         
+        # Claves de las estadísticas que publica MotorMigracion
         labels = [
-            "Total registros en Excel:", "Registros ya existentes:", "Registros nuevos a insertar:",
-            "Registros insertados:", "Errores:"
+            ('total', "Total registros en Excel:"), ('existentes', "Registros ya existentes:"),
+            ('nuevos', "Registros nuevos a insertar:"), ('insertados', "Registros insertados:"),
+            ('errores', "Errores:")
         ]
         
         self.stats_vars = {}
-        for i, label in enumerate(labels):
+        for i, (clave, label) in enumerate(labels):
             self._crear_label(container, label, anchor="w").grid(row=i, column=0, sticky=tk.W, pady=8, padx=10)
             var = tk.StringVar(value="0")
-            self.stats_vars[label] = var
+            self.stats_vars[clave] = var
             tk.Label(container, textvariable=var, font=("Segoe UI", 10, "bold"),
                     bg=c['fondo_seccion'], fg=c['azul_principal'], anchor="w").grid(row=i, column=1, sticky=tk.W, padx=20, pady=8)
     
@@ -597,15 +859,59 @@ class EmssanarGUI:
         frame = ttk.LabelFrame(parent, text="Log de Operaciones", padding=10)
         frame.pack(fill=tk.X, padx=20, pady=10)
         
-        self.log_text = scrolledtext.ScrolledText(frame, height=6, width=80, wrap=tk.WORD,
-            bg=c['blanco'], fg="#333333", font=("Consolas", 9),
-            insertbackground=c['azul_principal'], selectbackground=c['azul_medio'], selectforeground=c['blanco'])
-        self.log_text.pack(fill=tk.BOTH, expand=True)
-        
-        self.log_text.tag_config("exito", foreground=c['exito'], font=("Consolas", 9, "bold"))
-        self.log_text.tag_config("error", foreground=c['error'], font=("Consolas", 9, "bold"))
-        self.log_text.tag_config("advertencia", foreground="#FF8C00", font=("Consolas", 9, "bold"))
-        self.log_text.tag_config("info", foreground=c['azul_principal'], font=("Consolas", 9))
+        self.panel_log = PanelLog(frame, max_lineas=self.LINEAS_LOG, archivo=self._ruta_log("migracion.log"),
+                                  colores=self._colores_log(), bg=c['fondo_seccion'])
+        self.panel_log.pack(fill=tk.BOTH, expand=True)
+    
+    def _colores_log(self):
+        """Colores de los paneles de log según la paleta de la aplicación."""
+        c = self.COLORES
+        return {'exito': c['exito'], 'error': c['error'], 'info': c['azul_principal'],
+                'fondo': c['blanco'], 'seleccion': c['azul_medio']}
+    
+    def _ruta_log(self, nombre):
+        """Ruta del archivo de log rotativo (carpeta logs junto al ejecutable o al script)."""
+        if getattr(sys, 'frozen', False):
+            base = os.path.dirname(sys.executable)
+        else:
+            base = os.path.dirname(os.path.abspath(__file__))
+        return os.path.join(base, "logs", nombre)
+    
+    def _configurar_registro_consultas(self):
+        """
+        Log de consultas lentas en logs/consultas_lentas.log. Umbral con CLINIZAD_CONSULTA_LENTA_MS
+        (500 por defecto) y captura de planes con CLINIZAD_EXPLAIN_LENTAS=1.
+        """
+        try:
+            umbral = float(os.environ.get("CLINIZAD_CONSULTA_LENTA_MS", "500"))
+        except ValueError:
+            umbral = 500
+        try:
+            registro_consultas.configurar(umbral_lento_ms=umbral,
+                                          explain=os.environ.get("CLINIZAD_EXPLAIN_LENTAS") == "1",
+                                          archivo_log=self._ruta_log("consultas_lentas.log"))
+        except OSError as e:
+            print(f"No se pudo abrir el log de consultas lentas: {e}")
+    
+    def _exportar_metricas(self, resumen):
+        """
+        Deja las métricas de la última ejecución en logs/ (JSON y textfile de Prometheus), junto
+        con las llamadas a la BD acumuladas en la sesión (consultas_bd.json / .prom).
+        """
+        try:
+            exportar_json(resumen, self._ruta_log(f"metricas_{resumen['proceso']}.json"))
+            exportar_prometheus(resumen, self._ruta_log(f"metricas_{resumen['proceso']}.prom"))
+            consultas = registro_consultas.resumen()
+            exportar_json(consultas, self._ruta_log("consultas_bd.json"))
+            exportar_prometheus_consultas(consultas, self._ruta_log("consultas_bd.prom"))
+        except OSError as e:
+            print(f"No se pudieron guardar las métricas: {e}")
+    
+    @staticmethod
+    def _texto_etapas(resumen):
+        """Desglose corto por etapa para los mensajes de fin de proceso."""
+        lineas = [f"• {nombre}: {etapa['segundos']:.1f} s" for nombre, etapa in resumen['etapas'].items()]
+        return f"Tiempo total: {resumen['duracion_s']:.1f} s\n" + "\n".join(lineas)
     
     def _crear_seccion_consulta(self, parent):
         """Sección de consulta de autorizaciones."""
@@ -622,24 +928,19 @@ class EmssanarGUI:
         entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
         entry.bind('<Return>', lambda e: self._buscar_afiliado())
         ttk.Button(container, text="Buscar", command=self._buscar_afiliado).pack(side=tk.LEFT)
+        self.btn_cancelar_busqueda = ttk.Button(container, text="Cancelar", state=tk.DISABLED,
+                                                command=self._cancelar_busqueda_afiliado)
+        self.btn_cancelar_busqueda.pack(side=tk.LEFT, padx=(5, 0))
         
-        # Treeview
-        tree_frame = ttk.Frame(frame)
-        tree_frame.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
-        
-        vsb = ttk.Scrollbar(tree_frame, orient="vertical")
-        hsb = ttk.Scrollbar(tree_frame, orient="horizontal")
+        # Automático: la base de datos (todas las cargas) si hay conexión; si no, el archivo
+        self._crear_label(container, "Buscar en:").pack(side=tk.LEFT, padx=(15, 5))
+        self.fuente_busqueda = tk.StringVar(value="Automático")
+        ttk.Combobox(container, textvariable=self.fuente_busqueda, state="readonly", width=14,
+                     values=("Automático", "Base de datos", "Archivo Excel")).pack(side=tk.LEFT)
         
-        self.tree_resultados = ttk.Treeview(tree_frame, yscrollcommand=vsb.set, xscrollcommand=hsb.set,
-                                            height=6, selectmode="extended")
-        vsb.config(command=self.tree_resultados.yview)
-        hsb.config(command=self.tree_resultados.xview)
-        
-        self.tree_resultados.grid(row=0, column=0, sticky='nsew')
-        vsb.grid(row=0, column=1, sticky='ns')
-        hsb.grid(row=1, column=0, sticky='ew')
-        tree_frame.grid_rowconfigure(0, weight=1)
-        tree_frame.grid_columnconfigure(0, weight=1)
+        # Tabla virtualizada: solo se dibujan las filas visibles
+        self.grilla_resultados = GrillaVirtual(frame, height=6, bg=c['fondo_seccion'])
+        self.grilla_resultados.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
         
         self.label_info_busqueda = tk.Label(frame, text="Ingrese el documento y presione 'Buscar'",
             font=("Segoe UI", 9), bg=c['fondo_seccion'], fg="#666666", anchor="w")
@@ -662,6 +963,7 @@ class EmssanarGUI:
         
         if archivo and os.path.exists(archivo):
             try:
+                cargar_pila_datos()
                 xls = pd.ExcelFile(archivo)
                 self.label_estado_archivo.config(
                     text=f"✓ Archivo válido ({len(xls.sheet_names)} hoja(s))", fg=c['exito'])
@@ -673,9 +975,7 @@ class EmssanarGUI:
     def _agregar_log(self, mensaje, tipo="info"):
         """Agrega un mensaje al log."""
         texto = f"[{datetime.now().strftime('%H:%M:%S')}] {mensaje}\n"
-        self.log_text.insert(tk.END, texto, tipo)
-        self.log_text.see(tk.END)
-        self.root.update()
+        self.panel_log.agregar(texto, tipo)
     
     def _iniciar_migracion(self):
         """Inicia el proceso de migración."""
@@ -694,105 +994,86 @@ class EmssanarGUI:
         self.en_proceso = True
         self.btn_cancelar.config(state=tk.NORMAL)
         self._iniciar_animacion_carga(self.label_progreso, "Procesando")
-        self.log_text.delete(1.0, tk.END)
+        self.panel_log.limpiar()
         
         for var in self.stats_vars.values():
             var.set("0")
         
         self.notebook.select(1)
-        threading.Thread(target=self._proceso_migracion, daemon=True).start()
+        threading.Thread(target=self._proceso_migracion, args=(self.perfilar.get(),), daemon=True).start()
     
-    def _proceso_migracion(self):
-        """Proceso principal de migración (hilo separado)."""
+    @contextmanager
+    def _perfilado(self, proceso, activo):
+        """
+        Perfila el bloque (cProfile y tracemalloc, en logs/perfiles) si se activó
+        "Perfilar ejecución"; al terminar la interfaz ofrece armar el reporte de soporte.
+        """
+        if not activo:
+            yield
+            return
+        sesion = SesionPerfilado(proceso, self._ruta_log("perfiles"))
         try:
-            self.queue.put(("log", "Iniciando migración...", "info"))
-            
-            # Cargar Excel
-            self.queue.put(("log", f"Leyendo: {os.path.basename(self.archivo_excel.get())}", "info"))
-            lector = EmssanarDataReader(self.archivo_excel.get())
-            lector._cargar_datos()
-            df = lector._df
-            
-            if df is None or df.empty:
-                self.queue.put(("log", "Archivo vacío o sin datos válidos", "error"))
-                self.queue.put(("finalizado", False))
-                return
-            
-            total = len(df)
-            self.queue.put(("stat", "Total registros en Excel:", str(total)))
-            self.queue.put(("log", f"Encontrados {total} registros", "exito"))
-            
-            df = df.where(pd.notnull(df), None)
-            
-            # Conectar BD
-            self.queue.put(("log", "Conectando a BD...", "info"))
-            import psycopg2
-            query = Query()
-            query.conn.close()
-            query.conn = psycopg2.connect(
-                host=self.host_db.get(), port=int(self.puerto_db.get()),
-                database=self.nombre_db.get(), user=self.usuario_db.get(), password=self.password_db.get()
-            )
-            self.queue.put(("log", "Conexión establecida", "exito"))
-            
-            # Verificar existentes
-            self.queue.put(("log", "Verificando registros existentes...", "info"))
-            existentes = query.obtener_solicitudes_existentes()
-            self.queue.put(("stat", "Registros ya existentes:", str(len(existentes))))
-            
-            # Filtrar nuevos
-            df['numero_solicitud_str'] = df['numero_solicitud'].astype(str)
-            df_nuevos = df[~df['numero_solicitud_str'].isin(existentes)].copy()
-            df_nuevos = df_nuevos.drop(columns=['numero_solicitud_str'])
-            
-            nuevos = len(df_nuevos)
-            self.queue.put(("stat", "Registros nuevos a insertar:", str(nuevos)))
-            self.queue.put(("log", f"Nuevos: {nuevos}, Duplicados: {total - nuevos}", "info"))
-            
-            if nuevos == 0:
-                self.queue.put(("log", "No hay registros nuevos", "advertencia"))
-                self.queue.put(("finalizado", True))
-                query.cerrar_conexion()
-                return
-            
-            # Insertar
-            self.queue.put(("log", "Insertando registros...", "info"))
-            insertados, errores = 0, 0
-            
-            for _, row in df_nuevos.iterrows():
-                if self.cancelar:
-                    self.queue.put(("log", "Cancelado por usuario", "advertencia"))
-                    break
-                
-                try:
-                    if query.insertar_solicitud_servicio(row.to_dict(), existentes):
-                        insertados += 1
-                        progreso = int((insertados / nuevos) * 100)
-                        self.queue.put(("progreso", progreso, f"Insertando: {insertados}/{nuevos}"))
-                        
-                        if insertados % 10 == 0:
-                            self.queue.put(("stat", "Registros insertados:", str(insertados)))
-                        if insertados % 100 == 0:
-                            self.queue.put(("log", f"Procesados {insertados}/{nuevos}...", "info"))
-                except Exception as e:
-                    errores += 1
-                    self.queue.put(("stat", "Errores:", str(errores)))
-                    if errores <= 5:
-                        self.queue.put(("log", f"Error: {str(e)}", "error"))
-            
-            self.queue.put(("stat", "Registros insertados:", str(insertados)))
-            self.queue.put(("stat", "Errores:", str(errores)))
-            query.cerrar_conexion()
-            
-            self.queue.put(("log", "═" * 50, "info"))
-            self.queue.put(("log", f"¡Completado! Insertados: {insertados}", "exito"))
-            if errores > 0:
-                self.queue.put(("log", f"Errores: {errores}", "error"))
-            self.queue.put(("finalizado", True))
+            with sesion:
+                yield
+        finally:
+            if sesion.archivos:
+                self.queue.put(("perfil_listo", proceso, sesion.archivos))
+    
+    def _ofrecer_reporte_soporte(self, proceso, archivos):
+        """Pregunta si se empaqueta el perfil con los logs y métricas de la ejecución en un .zip."""
+        if not messagebox.askyesno(
+                "Perfil guardado",
+                f"El perfil de la ejecución se guardó en:\n{os.path.dirname(archivos[0])}\n\n"
+                "¿Crear un reporte de soporte (.zip) con el perfil, los logs y las métricas?"):
+            return
+        ruta = filedialog.asksaveasfilename(
+            title="Guardar reporte de soporte", defaultextension=".zip",
+            initialfile=f"reporte_soporte_{proceso}_{datetime.now().strftime('%Y%m%d-%H%M%S')}.zip",
+            filetypes=[("Archivo ZIP", "*.zip")])
+        if not ruta:
+            return
+        log = "migracion.log" if proceso == "migracion" else "cups.log"
+        adicionales = [self._ruta_log(nombre) for nombre in
+                       (log, f"metricas_{proceso}.json", "consultas_bd.json", "consultas_lentas.log", "inicio.log")]
+        try:
+            crear_reporte_soporte(ruta, archivos + adicionales)
+            messagebox.showinfo("Reporte de soporte", f"Reporte creado:\n{ruta}")
+        except OSError as e:
+            messagebox.showerror("Error", f"No se pudo crear el reporte: {e}")
+    
+    def _proceso_migracion(self, perfilar=False):
+        """Proceso principal de migración (hilo separado), sobre el mismo motor que migrar_cli.py."""
+        try:
+            cargar_pila_datos()
+            with self._perfilado("migracion", perfilar):
+                monitor = self._obtener_monitor()
+                parametros = self._parametros_conexion()
+                monitor.configurar(parametros)
+                if self.BACKEND_BD == "pipeline":
+                    from pipeline_bd import QueryPipeline, conectar
+                    crear_query = lambda: QueryPipeline(conectar(**parametros))
+                    liberar_query = lambda query: query.conn.close()
+                    self.canal_migracion.log("Backend: psycopg 3 en modo pipeline", "info")
+                else:
+                    crear_query = lambda: Query(conn=monitor.tomar())
+                    liberar_query = lambda query: monitor.devolver(query.conn)
+                motor = MotorMigracion(
+                    crear_query=crear_query,
+                    liberar_query=liberar_query,
+                    tamano_lote=self.LOTE_MIGRACION,
+                    canal=self.canal_migracion,
+                    cancelado=lambda: self.cancelar,
+                    usuario=self.usuario_actual
+                )
+                stats = motor.migrar_archivo(self.archivo_excel.get())
+                self.canal_migracion.log("Llamadas a la BD en la sesión:\n" +
+                                         formatear_resumen_consultas(registro_consultas.resumen(), limite=8), "info")
+                self._exportar_metricas(stats['metricas'])
+                self.queue.put(("finalizado", stats['total'] > 0, self._texto_etapas(stats['metricas'])))
             
         except Exception as e:
-            self.queue.put(("log", f"Error crítico: {str(e)}", "error"))
-            self.queue.put(("finalizado", False))
+            self.canal_migracion.log(f"Error crítico: {str(e)}", "error")
+            self.queue.put(("finalizado", False, ""))
     
     def _cancelar_migracion(self):
         """Cancela el proceso de migración."""
@@ -800,13 +1081,32 @@ class EmssanarGUI:
             self.cancelar = True
             self._agregar_log("Solicitando cancelación...", "advertencia")
     
-    def _obtener_lector_excel(self):
-        """Obtiene el lector de Excel con cache."""
-        archivo = self.archivo_excel.get()
-        if self._cache_archivo != archivo or self._cache_excel is None:
-            self._cache_excel = EmssanarDataReader(archivo)
-            self._cache_archivo = archivo
-        return self._cache_excel
+    def _obtener_lector_excel(self, archivo):
+        """
+        Obtiene el lector de Excel con cache, o el de la base de datos si archivo es None
+        (se llama desde el hilo del buscador).
+        """
+        with self._cache_lock:
+            if archivo is None:
+                if self._lector_afiliados_bd is None:
+                    self._lector_afiliados_bd = LectorAfiliadosBD(self._obtener_monitor().conexion)
+                return self._lector_afiliados_bd
+            if self._cache_archivo != archivo or self._cache_excel is None:
+                self._cache_excel = EmssanarDataReader(archivo)
+                self._cache_archivo = archivo
+            return self._cache_excel
+    
+    def _obtener_buscador_afiliados(self):
+        """Retorna el buscador de afiliados, creándolo en la primera consulta."""
+        if self._buscador_afiliados is None:
+            cargar_pila_datos()
+            self._buscador_afiliados = BuscadorAfiliados(
+                obtener_lector=self._obtener_lector_excel,
+                al_cargando=lambda gen, archivo: self.queue.put(("afiliado_cargando", gen, archivo)),
+                al_resultado=lambda gen, doc, datos: self.queue.put(("afiliado_resultado", gen, doc, datos)),
+                al_error=lambda gen, mensaje: self.queue.put(("afiliado_error", gen, mensaje))
+            )
+        return self._buscador_afiliados
     
     def _buscar_afiliado(self):
         """Busca información de un afiliado."""
@@ -817,42 +1117,68 @@ class EmssanarGUI:
             messagebox.showwarning("Advertencia", "Ingrese un documento")
             return
         
-        if not self.archivo_excel.get():
+        fuente = self.fuente_busqueda.get()
+        usar_bd = fuente == "Base de datos" or (
+            fuente == "Automático" and (self._bd_conectada or not self.archivo_excel.get()))
+        if usar_bd:
+            try:
+                self._obtener_monitor().configurar(self._parametros_conexion())
+            except ValueError:
+                messagebox.showerror("Error", "El puerto debe ser un número")
+                return
+        elif not self.archivo_excel.get():
             messagebox.showerror("Error", "Seleccione un archivo Excel")
             return
         
-        try:
-            self.tree_resultados.delete(*self.tree_resultados.get_children())
-            resultados = self._obtener_lector_excel().consultar_por_afiliado(doc)
-            
-            if resultados.empty:
-                self.label_info_busqueda.config(text=f"⚠ Sin registros para {doc}", fg=c['advertencia'])
-                return
-            
-            columnas = list(resultados.columns)
-            self.tree_resultados['columns'] = columnas
-            self.tree_resultados['show'] = 'headings'
-            
-            for col in columnas:
-                ancho = min(max(len(str(col)) * 10 + 20, resultados[col].astype(str).str.len().max() * 8 + 20, 80), 300)
-                self.tree_resultados.heading(col, text=col, anchor="w")
-                self.tree_resultados.column(col, width=int(ancho), minwidth=60, anchor="w")
-            
-            for _, row in resultados.iterrows():
-                self.tree_resultados.insert("", tk.END, values=[str(v) if v is not None else "" for v in row])
-            
-            self.label_info_busqueda.config(text=f"✓ {len(resultados)} registro(s) para {doc}", fg=c['exito'])
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error en búsqueda:\n{str(e)}")
-            self.label_info_busqueda.config(text="✗ Error en búsqueda", fg=c['error'])
+        # La consulta (y la carga del índice, si es la primera) corre en el hilo del buscador
+        self.grilla_resultados.limpiar()
+        self._fuente_afiliado = "base de datos" if usar_bd else os.path.basename(self.archivo_excel.get())
+        self._obtener_buscador_afiliados().solicitar(None if usar_bd else self.archivo_excel.get(), doc)
+        self.btn_cancelar_busqueda.config(state=tk.NORMAL)
+        self.label_info_busqueda.config(text=f"Buscando {doc} en {self._fuente_afiliado}...",
+                                        fg=c['texto_secundario'])
+    
+    def _cancelar_busqueda_afiliado(self):
+        """Descarta la consulta en curso (la carga del índice continúa para las siguientes)."""
+        if self._buscador_afiliados is not None:
+            self._buscador_afiliados.cancelar()
+        self.btn_cancelar_busqueda.config(state=tk.DISABLED)
+        self.label_info_busqueda.config(text="Búsqueda cancelada", fg=self.COLORES['advertencia'])
+    
+    def _es_busqueda_afiliado_vigente(self, generacion):
+        """Indica si un mensaje del buscador corresponde a la última consulta."""
+        return self._buscador_afiliados is not None and generacion == self._buscador_afiliados.generacion
+    
+    def _mostrar_resultados_afiliado(self, generacion, doc, resultados):
+        """Muestra los resultados de una consulta por afiliado (descarta los obsoletos)."""
+        c = self.COLORES
+        if not self._es_busqueda_afiliado_vigente(generacion):
+            return
+        self.btn_cancelar_busqueda.config(state=tk.DISABLED)
+        
+        if resultados.empty:
+            self.label_info_busqueda.config(text=f"⚠ Sin registros para {doc} en {self._fuente_afiliado}",
+                                            fg=c['advertencia'])
+            return
+        
+        # Banderas del catálogo CUPS (solo en la consulta a la base de datos), como en la grilla CUPS
+        banderas = [col for col in self.ENCABEZADOS_BANDERAS if col in resultados.columns]
+        if banderas:
+            resultados = resultados.assign(**{col: resultados[col].map(lambda v: "Sí" if v else "No")
+                                              for col in banderas})
+        
+        # La grilla lee directamente del arreglo; solo formatea las filas visibles
+        self.grilla_resultados.configurar_columnas(list(resultados.columns), encabezados=self.ENCABEZADOS_BANDERAS,
+                                                   alineacion={col: tk.CENTER for col in banderas})
+        self.grilla_resultados.establecer_datos(resultados.to_numpy(dtype=object), ajustar_anchos=True)
+        
+        self.label_info_busqueda.config(text=f"✓ {len(resultados)} registro(s) para {doc} ({self._fuente_afiliado})",
+                                        fg=c['exito'])
 
     # === PESTAÑA CUPS ===
     
-    def _crear_pestaña_codigos_cups(self):
+    def _crear_pestaña_codigos_cups(self, frame):
         """Pestaña para códigos CUPS."""
-        frame = ttk.Frame(self.notebook)
-        self.notebook.add(frame, text=" Códigos CUPS ")
         
         # Canvas con scrollbar
         canvas = tk.Canvas(frame, bg=self.COLORES['blanco'], highlightthickness=0)
@@ -925,6 +1251,7 @@ class EmssanarGUI:
         container_btns.pack(fill=tk.X, pady=5)
         self.btn_cargar_cups = ttk.Button(container_btns, text="Cargar Códigos CUPS", command=self._iniciar_carga_cups)
         self.btn_cargar_cups.pack(side=tk.LEFT)
+        ttk.Checkbutton(container_btns, text="Perfilar ejecución", variable=self.perfilar).pack(side=tk.LEFT, padx=(15, 0))
         
         self.label_stats_cups = tk.Label(frame, text="", font=("Segoe UI", 8),
                                          bg=c['fondo_seccion'], fg="#666666", anchor="w")
@@ -949,22 +1276,14 @@ class EmssanarGUI:
         frame = ttk.LabelFrame(parent, text="Log de Operaciones CUPS", padding=10)
         frame.pack(fill=tk.X, pady=(0, 10))
         
-        self.log_cups_text = scrolledtext.ScrolledText(frame, height=6, width=80, wrap=tk.WORD,
-            bg=c['blanco'], fg="#333333", font=("Consolas", 9),
-            insertbackground=c['azul_principal'], selectbackground=c['azul_medio'], selectforeground=c['blanco'])
-        self.log_cups_text.pack(fill=tk.BOTH, expand=True)
-        
-        self.log_cups_text.tag_config("exito", foreground=c['exito'], font=("Consolas", 9, "bold"))
-        self.log_cups_text.tag_config("error", foreground=c['error'], font=("Consolas", 9, "bold"))
-        self.log_cups_text.tag_config("advertencia", foreground="#FF8C00", font=("Consolas", 9, "bold"))
-        self.log_cups_text.tag_config("info", foreground=c['azul_principal'], font=("Consolas", 9))
+        self.panel_log_cups = PanelLog(frame, max_lineas=self.LINEAS_LOG, archivo=self._ruta_log("cups.log"),
+                                       colores=self._colores_log(), bg=c['fondo_seccion'])
+        self.panel_log_cups.pack(fill=tk.BOTH, expand=True)
     
     def _agregar_log_cups(self, mensaje, tipo="info"):
         """Agrega un mensaje al log de CUPS."""
         texto = f"[{datetime.now().strftime('%H:%M:%S')}] {mensaje}\n"
-        self.log_cups_text.insert(tk.END, texto, tipo)
-        self.log_cups_text.see(tk.END)
-        self.root.update()
+        self.panel_log_cups.agregar(texto, tipo)
     
     def _crear_seccion_consulta_cups(self, parent):
         """Sección de consulta CUPS."""
@@ -981,51 +1300,61 @@ class EmssanarGUI:
         entry_codigo = ttk.Entry(frame_busqueda, textvariable=self.busqueda_codigo_cups, width=15)
         entry_codigo.pack(side=tk.LEFT, padx=(0, 10))
         entry_codigo.bind('<Return>', lambda e: self._ejecutar_busqueda_cups())
+        entry_codigo.bind('<KeyRelease>', self._programar_busqueda_cups)
         
         self._crear_label(frame_busqueda, "Nombre:", font_size=9).pack(side=tk.LEFT, padx=(0, 5))
         self.busqueda_nombre_cups = tk.StringVar()
         entry_nombre = ttk.Entry(frame_busqueda, textvariable=self.busqueda_nombre_cups, width=25)
         entry_nombre.pack(side=tk.LEFT, padx=(0, 10))
         entry_nombre.bind('<Return>', lambda e: self._ejecutar_busqueda_cups())
+        entry_nombre.bind('<KeyRelease>', self._programar_busqueda_cups)
         
         self.filtro_preparacion = tk.BooleanVar()
-        ttk.Checkbutton(frame_busqueda, text="Prep. Especial", variable=self.filtro_preparacion).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Checkbutton(frame_busqueda, text="Prep. Especial", variable=self.filtro_preparacion,
+                        command=self._ejecutar_busqueda_cups).pack(side=tk.LEFT, padx=(0, 5))
         
         self.filtro_remitido = tk.BooleanVar()
-        ttk.Checkbutton(frame_busqueda, text="Remitido", variable=self.filtro_remitido).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Checkbutton(frame_busqueda, text="Remitido", variable=self.filtro_remitido,
+                        command=self._ejecutar_busqueda_cups).pack(side=tk.LEFT, padx=(0, 10))
+        
+        self._crear_label(frame_busqueda, "Orden:", font_size=9).pack(side=tk.LEFT, padx=(0, 5))
+        self.orden_cups = tk.StringVar(value="Código")
+        combo_orden = ttk.Combobox(frame_busqueda, textvariable=self.orden_cups, values=("Código", "Nombre"),
+                                   state="readonly", width=8)
+        combo_orden.pack(side=tk.LEFT, padx=(0, 10))
+        combo_orden.bind('<<ComboboxSelected>>', lambda e: self._ejecutar_busqueda_cups())
         
         ttk.Button(frame_busqueda, text="Buscar", command=self._ejecutar_busqueda_cups).pack(side=tk.LEFT, padx=(0, 5))
         ttk.Button(frame_busqueda, text="Limpiar", command=self._limpiar_busqueda_cups).pack(side=tk.LEFT)
         
-        self.label_resultados_cups = tk.Label(frame, text="", font=("Segoe UI", 9),
+        frame_paginacion = tk.Frame(frame, bg=c['fondo_seccion'])
+        frame_paginacion.pack(fill=tk.X)
+        
+        self.label_resultados_cups = tk.Label(frame_paginacion, text="", font=("Segoe UI", 9),
                                               bg=c['fondo_seccion'], fg="#666666", anchor="w")
-        self.label_resultados_cups.pack(fill=tk.X)
-        
-        # Tabla
-        frame_tabla = tk.Frame(frame, bg=c['fondo_seccion'])
-        frame_tabla.pack(fill=tk.BOTH, expand=True)
-        
-        scrollbar_y = ttk.Scrollbar(frame_tabla, orient=tk.VERTICAL)
-        scrollbar_y.pack(side=tk.RIGHT, fill=tk.Y)
-        scrollbar_x = ttk.Scrollbar(frame_tabla, orient=tk.HORIZONTAL)
-        scrollbar_x.pack(side=tk.BOTTOM, fill=tk.X)
-        
-        self.tree_cups = ttk.Treeview(frame_tabla, columns=("codigo", "nombre", "preparacion", "remitido"),
-                                      show="headings", yscrollcommand=scrollbar_y.set,
-                                      xscrollcommand=scrollbar_x.set, height=10)
-        
-        for col, (text, width, anchor) in {
-            "codigo": ("Código CUPS", 120, tk.CENTER),
-            "nombre": ("Nombre del Estudio", 400, tk.W),
-            "preparacion": ("Preparación Especial", 150, tk.CENTER),
-            "remitido": ("Remitido", 120, tk.CENTER)
-        }.items():
-            self.tree_cups.heading(col, text=text)
-            self.tree_cups.column(col, width=width, anchor=anchor)
-        
-        self.tree_cups.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar_y.config(command=self.tree_cups.yview)
-        scrollbar_x.config(command=self.tree_cups.xview)
+        self.label_resultados_cups.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        self.btn_siguiente_cups = ttk.Button(frame_paginacion, text="Siguiente ▶", state=tk.DISABLED,
+                                             command=lambda: self._cambiar_pagina_cups(1))
+        self.btn_siguiente_cups.pack(side=tk.RIGHT)
+        self.btn_anterior_cups = ttk.Button(frame_paginacion, text="◀ Anterior", state=tk.DISABLED,
+                                            command=lambda: self._cambiar_pagina_cups(-1))
+        self.btn_anterior_cups.pack(side=tk.RIGHT, padx=(0, 5))
+        
+        # Tabla virtualizada sobre la página de resultados
+        self.grilla_cups = GrillaVirtual(frame, height=10, bg=c['fondo_seccion'], formatear=lambda r: (
+            r['codigo_cups'], r['nombre_estudio'] or "",
+            "Sí" if r['preparacion_especial'] else "No",
+            "Sí" if r['remitido'] else "No"
+        ))
+        self.grilla_cups.configurar_columnas(
+            ("codigo", "nombre", "preparacion", "remitido"),
+            encabezados={"codigo": "Código CUPS", "nombre": "Nombre del Estudio",
+                         "preparacion": "Preparación Especial", "remitido": "Remitido"},
+            anchos={"codigo": 120, "nombre": 400, "preparacion": 150, "remitido": 120},
+            alineacion={"codigo": tk.CENTER, "nombre": tk.W, "preparacion": tk.CENTER, "remitido": tk.CENTER}
+        )
+        self.grilla_cups.pack(fill=tk.BOTH, expand=True)
     
     def _seleccionar_archivo_cups(self, tipo):
         """Selecciona archivo para códigos CUPS."""
@@ -1056,7 +1385,7 @@ class EmssanarGUI:
         self._iniciar_animacion_carga(self.label_estado_cups, "Cargando datos")
         
         # Limpiar log antes de iniciar
-        self.log_cups_text.delete(1.0, tk.END)
+        self.panel_log_cups.limpiar()
         self._agregar_log_cups("Iniciando carga de códigos CUPS...", "info")
         
         if archivo_prep:
@@ -1064,92 +1393,193 @@ class EmssanarGUI:
         if archivo_rem:
             self._agregar_log_cups(f"Archivo remitidos: {os.path.basename(archivo_rem)}", "info")
         
-        threading.Thread(target=self._procesar_carga_cups, args=(archivo_prep, archivo_rem), daemon=True).start()
+        threading.Thread(target=self._procesar_carga_cups, args=(archivo_prep, archivo_rem, self.perfilar.get()),
+                         daemon=True).start()
     
-    def _procesar_carga_cups(self, archivo_prep, archivo_rem):
-        """Procesa carga de CUPS (hilo separado)."""
+    def _procesar_carga_cups(self, archivo_prep, archivo_rem, perfilar=False):
+        """
+        Procesa carga de CUPS (hilo separado); perfilada si se activó "Perfilar ejecución".
+        La carga queda en migration_runs también si falla, antes de avisar a la interfaz.
+        """
+        db = None
+        metricas = stats = error = None
+        resultado = None  # mensaje para la cola, después de registrar la carga
         try:
-            self.queue.put(("cups_log", "Leyendo archivos Excel...", "info"))
-            reader = CupsDataReader(ruta_preparacion=archivo_prep, ruta_remitidos=archivo_rem)
-            
-            self.queue.put(("cups_estado", "Cargando archivos Excel..."))
-            df = reader.cargar_datos()
-            
-            if df is None or df.empty:
-                self.queue.put(("cups_log", "No se pudieron cargar datos de los archivos", "error"))
-                self.queue.put(("cups_error", "No se pudieron cargar datos"))
-                return
-            
-            self.queue.put(("cups_log", f"✓ Datos cargados: {len(df)} registros encontrados", "exito"))
-            self.queue.put(("cups_estado", f"Cargados: {len(df)} registros"))
-            
-            self.queue.put(("cups_log", "Conectando a base de datos...", "info"))
-            self.queue.put(("cups_estado", "Conectando a BD..."))
-            
-            db = CupsQuery(
-                host=self.host_db.get(), port=int(self.puerto_db.get()),
-                database=self.nombre_db.get(), user=self.usuario_db.get(), password=self.password_db.get()
-            )
-            
-            self.queue.put(("cups_log", f"✓ Conexión establecida ({self.host_db.get()}:{self.puerto_db.get()})", "exito"))
-            self.queue.put(("cups_estado", "Procesando datos..."))
-            self.queue.put(("cups_log", "Procesando e insertando datos...", "info"))
-            
-            stats = db.procesar_dataframe(df)
-            
-            # Log detallado de resultados
-            self.queue.put(("cups_log", "═" * 45, "info"))
-            self.queue.put(("cups_log", "RESUMEN DE OPERACIÓN:", "info"))
-            self.queue.put(("cups_log", f"  • Total procesados: {stats['total']}", "info"))
-            self.queue.put(("cups_log", f"  • Registros nuevos insertados: {stats['insertados']}", "exito"))
-            self.queue.put(("cups_log", f"  • Registros actualizados: {stats['actualizados']}", "advertencia" if stats['actualizados'] > 0 else "info"))
+            cargar_pila_datos(cups=True)
+            with self._perfilado("cups", perfilar):
+                metricas = MetricasEjecucion('cups')
+                self.canal_cups.log("Leyendo archivos Excel...", "info")
+                reader = CupsDataReader(ruta_preparacion=archivo_prep, ruta_remitidos=archivo_rem)
+                
+                self.canal_cups.estado("Cargando archivos Excel...")
+                tamano = sum(os.path.getsize(ruta) for ruta in (archivo_prep, archivo_rem) if ruta)
+                with metricas.etapa('lectura', bytes_=tamano) as medida:
+                    df = reader.cargar_datos()
+                    medida['filas'] = 0 if df is None else len(df)
+                
+                if df is None or df.empty:
+                    error = "No se pudieron cargar datos"
+                    self.canal_cups.log("No se pudieron cargar datos de los archivos", "error")
+                    resultado = ("cups_error", error)
+                    return
+                
+                self.canal_cups.log(f"✓ Datos cargados: {len(df)} registros encontrados", "exito")
+                self.canal_cups.estado(f"Cargados: {len(df)} registros")
+                
+                self.canal_cups.log("Conectando a base de datos...", "info")
+                self.canal_cups.estado("Conectando a BD...")
+                
+                parametros = self._parametros_conexion()
+                self._obtener_monitor().configurar(parametros)
+                if self.BACKEND_BD == "pipeline":
+                    from pipeline_bd import CupsQueryPipeline, conectar
+                    db = CupsQueryPipeline(conectar(**parametros))
+                    self.canal_cups.log("Backend: psycopg 3 en modo pipeline", "info")
+                else:
+                    db = CupsQuery(**parametros, conn=self._obtener_monitor().tomar())
+                
+                self.canal_cups.log(f"✓ Conexión establecida ({self.host_db.get()}:{self.puerto_db.get()})", "exito")
+                self.canal_cups.estado("Procesando datos...")
+                self.canal_cups.log("Procesando e insertando datos...", "info")
+                
+                stats = db.procesar_dataframe(df, metricas=metricas)
+                metricas.finalizar()
+                resumen = metricas.resumen()
+                self._exportar_metricas(resumen)
+                
+                # Log detallado de resultados
+                self.canal_cups.log("═" * 45, "info")
+                self.canal_cups.log("RESUMEN DE OPERACIÓN:", "info")
+                self.canal_cups.log(f"  • Total procesados: {stats['total']}", "info")
+                self.canal_cups.log(f"  • Registros nuevos insertados: {stats['insertados']}", "exito")
+                self.canal_cups.log(f"  • Registros actualizados: {stats['actualizados']}", "advertencia" if stats['actualizados'] > 0 else "info")
+                
+                if stats['errores'] > 0:
+                    self.canal_cups.log(f"  • Errores: {stats['errores']}", "error")
+                else:
+                    self.canal_cups.log(f"  • Errores: 0", "exito")
+                
+                self.canal_cups.log("═" * 45, "info")
+                self.canal_cups.log("¡Proceso completado exitosamente!", "exito")
+                self.canal_cups.log("Tiempo por etapa:\n" + formatear_resumen(resumen), "info")
+                self.canal_cups.log("Llamadas a la BD en la sesión:\n" +
+                                    formatear_resumen_consultas(registro_consultas.resumen(), limite=8), "info")
+                
+                mensaje = (f"Total: {stats['total']}\n• Nuevos: {stats['insertados']}\n"
+                          f"• Actualizados: {stats['actualizados']}\n• Errores: {stats['errores']}")
+                
+                resultado = ("cups_resultado", mensaje, stats, resumen)
             
-            if stats['errores'] > 0:
-                self.queue.put(("cups_log", f"  • Errores: {stats['errores']}", "error"))
+        except Exception as e:
+            error = str(e).strip()
+            self.canal_cups.log(f"Error crítico: {str(e)}", "error")
+            resultado = ("cups_error", f"Error: {str(e)}")
+        finally:
+            if metricas is not None:
+                self._registrar_carga_cups([archivo_prep, archivo_rem], metricas, stats, error,
+                                           None if db is None else db.conn)
+            if db is not None:
+                if self.BACKEND_BD == "pipeline":
+                    db.conn.close()
+                else:
+                    self._obtener_monitor().devolver(db.conn)
+            if resultado is not None:
+                self.queue.put(resultado)
+    
+    def _registrar_carga_cups(self, archivos, metricas, stats, error, conn=None):
+        """
+        Guarda la carga CUPS en migration_runs, con error si falló (como
+        MotorMigracion._registrar_historial); un fallo aquí solo se advierte en el log.
+        """
+        stats = stats or {}
+        try:
+            ejecucion = ejecucion_desde_resumen(
+                'cups', archivos, metricas.resumen(), filas_leidas=stats.get('total', 0),
+                insertados=stats.get('insertados', 0), actualizados=stats.get('actualizados', 0),
+                fallidos=stats.get('errores', 0), error=error, usuario=self.usuario_actual)
+            if conn is not None:
+                if error is not None:
+                    conn.rollback()  # la transacción pudo quedar abortada por el error
+                registrada = HistorialEjecuciones(conn).registrar(ejecucion)
             else:
-                self.queue.put(("cups_log", f"  • Errores: 0", "exito"))
-            
-            self.queue.put(("cups_log", "═" * 45, "info"))
-            self.queue.put(("cups_log", "¡Proceso completado exitosamente!", "exito"))
-            
-            mensaje = (f"Total: {stats['total']}\n• Nuevos: {stats['insertados']}\n"
-                      f"• Actualizados: {stats['actualizados']}\n• Errores: {stats['errores']}")
-            
-            self.queue.put(("cups_resultado", mensaje, stats))
-            db.cerrar_conexion()
-            self.queue.put(("cups_log", "Conexión a BD cerrada", "info"))
-            
+                # La carga falló antes de conectarse: se usa una conexión del monitor
+                monitor = self._obtener_monitor()
+                monitor.configurar(self._parametros_conexion())
+                with monitor.conexion() as conn:
+                    registrada = HistorialEjecuciones(conn).registrar(ejecucion)
         except Exception as e:
-            self.queue.put(("cups_log", f"Error crítico: {str(e)}", "error"))
-            self.queue.put(("cups_error", f"Error: {str(e)}"))
+            self.canal_cups.log(f"No se registró la carga en el historial: {str(e).strip()}", "advertencia")
+            return
+        if not registrada:
+            self.canal_cups.log("No se registró la carga en el historial", "advertencia")
+    
+    def _programar_busqueda_cups(self, event=None):
+        """Reprograma la búsqueda incremental tras cada tecla (debounce)."""
+        if event is not None and event.keysym in ("Return", "Tab", "Shift_L", "Shift_R",
+                                                   "Control_L", "Control_R", "Left", "Right"):
+            return
+        if self._cups_debounce_id is not None:
+            self.root.after_cancel(self._cups_debounce_id)
+        self._cups_debounce_id = self.root.after(self.DEBOUNCE_CUPS_MS, self._ejecutar_busqueda_cups)
+    
+    def _obtener_buscador_cups(self):
+        """Retorna el buscador incremental, recreándolo si cambió la configuración de BD."""
+        conexion = (self.host_db.get(), self.puerto_db.get(), self.nombre_db.get(),
+                    self.usuario_db.get(), self.password_db.get())
+        if self._buscador_cups is None or self._buscador_cups_conexion != conexion:
+            cargar_pila_datos(cups=True)
+            if self._buscador_cups is not None:
+                self._buscador_cups.detener()
+            host, puerto, base, usuario, password = conexion
+            self._buscador_cups = BuscadorCupsIncremental(
+                crear_conexion=lambda: CupsQuery(host=host, port=int(puerto), database=base,
+                                                 user=usuario, password=password, usar_catalogo=True),
+                al_resultado=lambda gen, datos: self.queue.put(("cups_busqueda_resultado", gen, datos)),
+                al_error=lambda gen, mensaje: self.queue.put(("cups_busqueda_error", gen, mensaje))
+            )
+            self._buscador_cups_conexion = conexion
+        return self._buscador_cups
     
     def _ejecutar_busqueda_cups(self):
-        """Ejecuta búsqueda de códigos CUPS."""
+        """Ejecuta búsqueda de códigos CUPS (primera página)."""
+        if self._cups_debounce_id is not None:
+            self.root.after_cancel(self._cups_debounce_id)
+            self._cups_debounce_id = None
+        
         codigo = self.busqueda_codigo_cups.get().strip() or None
         nombre = self.busqueda_nombre_cups.get().strip() or None
         prep = self.filtro_preparacion.get() if self.filtro_preparacion.get() else None
         rem = self.filtro_remitido.get() if self.filtro_remitido.get() else None
+        orden = 'nombre' if self.orden_cups.get() == "Nombre" else 'codigo'
         
-        threading.Thread(target=self._procesar_busqueda_cups, args=(codigo, nombre, prep, rem), daemon=True).start()
+        self._cups_filtros = (codigo, nombre, prep, rem, orden)
+        self._cups_cursores = [None]
+        self._cups_pagina = 0
+        self._solicitar_pagina_cups()
     
-    def _procesar_busqueda_cups(self, codigo, nombre, prep, rem):
-        """Procesa búsqueda CUPS (hilo separado)."""
-        try:
-            db = CupsQuery(
-                host=self.host_db.get(), port=int(self.puerto_db.get()),
-                database=self.nombre_db.get(), user=self.usuario_db.get(), password=self.password_db.get()
-            )
-            
-            resultados = db.buscar_con_filtros(codigo_cups=codigo, nombre_busqueda=nombre,
-                                               preparacion_especial=prep, remitido=rem, limite=1000)
-            total = db.contar_registros(codigo_cups=codigo, nombre_busqueda=nombre,
-                                        preparacion_especial=prep, remitido=rem)
-            db.cerrar_conexion()
-            
-            self.queue.put(("cups_busqueda_resultado", resultados, total))
-            
-        except Exception as e:
-            self.queue.put(("cups_busqueda_error", f"Error: {str(e)}"))
+    def _cambiar_pagina_cups(self, direccion):
+        """Avanza o retrocede una página en los resultados CUPS."""
+        if self._cups_filtros is None:
+            return
+        nueva = self._cups_pagina + direccion
+        if nueva < 0 or nueva >= len(self._cups_cursores) or (direccion > 0 and self._cups_cursores[nueva] is None):
+            return
+        self._cups_pagina = nueva
+        self._solicitar_pagina_cups()
+    
+    def _solicitar_pagina_cups(self):
+        """Envía la consulta de la página actual al buscador incremental."""
+        self.btn_anterior_cups.config(state=tk.DISABLED)
+        self.btn_siguiente_cups.config(state=tk.DISABLED)
+        codigo, nombre, prep, rem, orden = self._cups_filtros
+        self._obtener_buscador_cups().solicitar({
+            'codigo_cups': codigo, 'nombre_busqueda': nombre,
+            'preparacion_especial': prep, 'remitido': rem,
+            'sin_acentos': True, 'orden': orden,
+            'despues_de': self._cups_cursores[self._cups_pagina],
+            'limite': self.PAGINA_CUPS, 'estimar_total': True
+        })
+        self.label_resultados_cups.config(text="Buscando...", fg="#666666")
     
     def _limpiar_busqueda_cups(self):
         """Limpia campos de búsqueda CUPS."""
@@ -1157,71 +1587,188 @@ class EmssanarGUI:
         self.busqueda_nombre_cups.set("")
         self.filtro_preparacion.set(False)
         self.filtro_remitido.set(False)
-        
-        for item in self.tree_cups.get_children():
-            self.tree_cups.delete(item)
+        self._cups_filtros = None
+        self._cups_cursores = [None]
+        self._cups_pagina = 0
+        if self._cups_debounce_id is not None:
+            self.root.after_cancel(self._cups_debounce_id)
+            self._cups_debounce_id = None
+        if self._buscador_cups is not None:
+            self._buscador_cups.descartar()
+        self.btn_anterior_cups.config(state=tk.DISABLED)
+        self.btn_siguiente_cups.config(state=tk.DISABLED)
+        
+        self.grilla_cups.limpiar()
         
         self.label_resultados_cups.config(text="Ingrese criterios y presione 'Buscar'", fg="#666666")
     
-    def _mostrar_resultados_busqueda_cups(self, resultados, total):
-        """Muestra resultados de búsqueda CUPS."""
+    def _mostrar_resultados_busqueda_cups(self, generacion, pagina_datos):
+        """Muestra una página de resultados de búsqueda CUPS (descarta resultados obsoletos)."""
         c = self.COLORES
+        if self._buscador_cups is None or generacion != self._buscador_cups.generacion:
+            return
+        pagina = self._cups_pagina
+        resultados, siguiente = pagina_datos['registros'], pagina_datos['siguiente']
+        total = f"~{pagina_datos['total']}" if pagina_datos['estimado'] else pagina_datos['total']
+        
+        # Registrar el cursor de la página siguiente para poder avanzar
+        del self._cups_cursores[pagina + 1:]
+        self._cups_cursores.append(siguiente)
         
-        for item in self.tree_cups.get_children():
-            self.tree_cups.delete(item)
+        self.grilla_cups.establecer_datos(resultados)
         
-        for r in resultados:
-            self.tree_cups.insert("", tk.END, values=(
-                r['codigo_cups'], r['nombre_estudio'] or "",
-                "Sí" if r['preparacion_especial'] else "No",
-                "Sí" if r['remitido'] else "No"
-            ))
+        self.btn_anterior_cups.config(state=tk.NORMAL if pagina > 0 else tk.DISABLED)
+        self.btn_siguiente_cups.config(state=tk.NORMAL if siguiente is not None else tk.DISABLED)
         
-        if total > 0:
-            self.label_resultados_cups.config(text=f"{len(resultados)} de {total} registros (máx 1000)", fg=c['exito'])
+        if resultados:
+            desde = pagina * self.PAGINA_CUPS + 1
+            hasta = desde + len(resultados) - 1
+            self.label_resultados_cups.config(
+                text=f"Página {pagina + 1}: registros {desde}-{hasta} de {total}", fg=c['exito'])
         else:
             self.label_resultados_cups.config(text="Sin resultados", fg=c['error'])
 
+    # === PESTAÑA HISTORIAL ===
+    
+    def _crear_pestaña_historial(self, frame):
+        """Pestaña con las ejecuciones guardadas en migration_runs y la tendencia de filas/s."""
+        c = self.COLORES
+        main = tk.Frame(frame, bg=c['blanco'])
+        main.pack(fill=tk.BOTH, expand=True, padx=15, pady=10)
+        
+        controles = tk.Frame(main, bg=c['blanco'])
+        controles.pack(fill=tk.X, pady=(0, 8))
+        self._crear_label(controles, "Proceso:", font_size=9, bg=c['blanco']).pack(side=tk.LEFT, padx=(0, 5))
+        self.proceso_historial = tk.StringVar(value="Todos")
+        combo = ttk.Combobox(controles, textvariable=self.proceso_historial, state="readonly", width=14,
+                             values=("Todos", "Migración", "CUPS"))
+        combo.pack(side=tk.LEFT, padx=(0, 10))
+        combo.bind("<<ComboboxSelected>>", lambda e: self._cargar_historial())
+        ttk.Button(controles, text="Actualizar", command=self._cargar_historial).pack(side=tk.LEFT)
+        self.label_historial = self._crear_label(controles, "", font_size=9, bg=c['blanco'], anchor="w")
+        self.label_historial.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
+        
+        grafico = ttk.LabelFrame(main, text="Filas por segundo (rojo: con fallos o cancelada)", padding=5)
+        grafico.pack(fill=tk.X, pady=(0, 8))
+        self.grafico_historial = GraficoTendencia(grafico, color_linea=c['azul_principal'],
+                                                  color_destacado=c['error'], height=200)
+        self.grafico_historial.pack(fill=tk.X)
+        
+        self.grilla_historial = GrillaVirtual(main, height=12, bg=c['blanco'], formatear=lambda r: (
+            r['inicio'].strftime('%Y-%m-%d %H:%M'), r['proceso'], r['archivo'] or "", r['usuario'] or "",
+            f"{float(r['duracion_s'] or 0):.1f}", r['filas_leidas'], r['insertados'],
+            r['actualizados'] or r['omitidos'], r['fallidos'],
+            f"{float(r['filas_por_segundo']):,.0f}" if r['filas_por_segundo'] is not None else "-",
+            "Cancelada" if r['cancelado'] else ("Error" if r['error'] else "OK")
+        ))
+        self.grilla_historial.configurar_columnas(
+            ("inicio", "proceso", "archivo", "usuario", "duracion", "filas", "insertados",
+             "omitidos", "fallidos", "velocidad", "estado"),
+            encabezados={"inicio": "Inicio", "proceso": "Proceso", "archivo": "Archivo", "usuario": "Usuario",
+                         "duracion": "Duración (s)", "filas": "Leídas", "insertados": "Insertados",
+                         "omitidos": "Omitidos/Act.", "fallidos": "Fallidos", "velocidad": "Filas/s",
+                         "estado": "Estado"},
+            anchos={"inicio": 120, "proceso": 80, "archivo": 220, "usuario": 90, "duracion": 90,
+                    "filas": 80, "insertados": 80, "omitidos": 90, "fallidos": 70, "velocidad": 80,
+                    "estado": 80}
+        )
+        self.grilla_historial.pack(fill=tk.BOTH, expand=True)
+        self._cargar_historial()
+    
+    def _cargar_historial(self):
+        """Consulta migration_runs en segundo plano."""
+        if not hasattr(self, 'grilla_historial'):
+            return
+        proceso = {"Migración": "migracion", "CUPS": "cups"}.get(self.proceso_historial.get())
+        self.label_historial.config(text="Consultando...", fg=self.COLORES['azul_principal'])
+        
+        def consultar():
+            try:
+                with self._obtener_monitor().conexion() as conn:
+                    filas = HistorialEjecuciones(conn).obtener(proceso)
+                self.queue.put(("historial_resultado", filas))
+            except Exception as e:
+                self.queue.put(("historial_error", str(e).strip()))
+        
+        threading.Thread(target=consultar, daemon=True).start()
+    
+    def _mostrar_historial(self, filas):
+        """Llena la grilla (más recientes primero) y el gráfico (orden cronológico)."""
+        self.grilla_historial.establecer_datos(filas)
+        cronologicas = list(reversed(filas))
+        self.grafico_historial.establecer_serie([
+            (r['inicio'].strftime('%d/%m %H:%M'),
+             float(r['filas_por_segundo']) if r['filas_por_segundo'] is not None else None,
+             bool(r['fallidos'] or r['cancelado'] or r['error']))
+            for r in cronologicas])
+        velocidades = [float(r['filas_por_segundo']) for r in cronologicas if r['filas_por_segundo'] is not None]
+        if not velocidades:
+            self.label_historial.config(text="Sin ejecuciones registradas", fg="#666666")
+            return
+        mediana = statistics.median(velocidades)
+        variacion = (velocidades[-1] / mediana - 1) * 100 if mediana else 0
+        self.label_historial.config(
+            text=f"{len(filas)} ejecuciones · última {velocidades[-1]:,.0f} filas/s "
+                 f"({variacion:+.0f}% frente a la mediana {mediana:,.0f})",
+            fg=self.COLORES['error'] if variacion <= -30 else "#333333")
+    
     # === COLA DE MENSAJES ===
     
+    def _aplicar_canales(self):
+        """Muestra lo publicado por los hilos desde el último muestreo (un lote por canal)."""
+        progreso, _, stats, logs = self.canal_migracion.tomar()
+        if progreso is not None:
+            self.progreso['value'] = progreso[0]
+            self.label_progreso.config(text=progreso[1])
+        for clave, valor in stats.items():
+            if clave in self.stats_vars:
+                self.stats_vars[clave].set(valor)
+        if hasattr(self, 'panel_log'):
+            self.panel_log.agregar_lote(logs)
+            self.panel_log.volcar()
+        
+        if hasattr(self, 'panel_log_cups'):
+            _, estado, _, logs = self.canal_cups.tomar()
+            if estado is not None:
+                self.label_estado_cups.config(text=estado, fg=self.COLORES['azul_principal'])
+            self.panel_log_cups.agregar_lote(logs)
+            self.panel_log_cups.volcar()
+    
     def _verificar_cola(self):
-        """Verifica la cola de mensajes del hilo de migración."""
+        """Muestrea los canales de progreso y procesa los eventos de la cola."""
         c = self.COLORES
+        self._aplicar_canales()
         
         try:
             while True:
                 msg = self.queue.get_nowait()
                 tipo = msg[0]
                 
-                if tipo == "log":
-                    self._agregar_log(msg[1], msg[2])
-                
-                elif tipo == "stat":
-                    self.stats_vars[msg[1]].set(msg[2])
-                
-                elif tipo == "progreso":
-                    self.progreso['value'] = msg[1]
-                    self.label_progreso.config(text=msg[2])
-                
-                elif tipo == "finalizado":
+                if tipo == "finalizado":
+                    self._aplicar_canales()
                     self.en_proceso = False
                     self._detener_animacion_carga()
                     self.btn_cancelar.config(state=tk.DISABLED)
                     self.progreso['value'] = 100
                     self.label_progreso.config(text="Completado")
                     
+                    self._cargar_historial()
                     if msg[1]:
-                        messagebox.showinfo("Completado", "Migración completada correctamente")
+                        messagebox.showinfo("Completado", f"Migración completada correctamente\n\n{msg[2]}")
                     else:
                         messagebox.showerror("Error", "Migración terminó con errores")
                 
-                elif tipo == "cups_estado":
-                    self.label_estado_cups.config(text=msg[1], fg=c['azul_principal'])
+                elif tipo == "historial_resultado":
+                    self._mostrar_historial(msg[1])
+                
+                elif tipo == "historial_error":
+                    self.label_historial.config(text=f"Error: {msg[1]}", fg=c['error'])
                 
-                elif tipo == "cups_log":
-                    self._agregar_log_cups(msg[1], msg[2])
+                elif tipo == "perfil_listo":
+                    self._ofrecer_reporte_soporte(msg[1], msg[2])
                 
                 elif tipo == "cups_resultado":
+                    self._aplicar_canales()
                     self._detener_animacion_carga()
                     self.progreso_cups.stop()
                     self.progreso_cups.config(mode='determinate', value=100)
@@ -1229,33 +1776,72 @@ class EmssanarGUI:
                     self.label_stats_cups.config(text=msg[1], fg="#333333")
                     self.en_proceso_cups = False
                     self.btn_cargar_cups.config(state=tk.NORMAL)
-                    messagebox.showinfo("Completado", f"Carga completada:\n\n{msg[1]}")
+                    self._cargar_historial()
+                    messagebox.showinfo("Completado", f"Carga completada:\n\n{msg[1]}\n\n{self._texto_etapas(msg[3])}")
                 
                 elif tipo == "cups_error":
+                    self._aplicar_canales()
                     self._detener_animacion_carga()
                     self.progreso_cups.stop()
                     self.progreso_cups.config(mode='determinate', value=0)
                     self.label_estado_cups.config(text="Error", fg=c['error'])
                     self.en_proceso_cups = False
                     self.btn_cargar_cups.config(state=tk.NORMAL)
+                    self._cargar_historial()
                     messagebox.showerror("Error", msg[1])
                 
+                elif tipo == "pila_datos_lista":
+                    self._on_pila_datos_lista(msg[1])
+                
+                elif tipo == "esquema_verificado":
+                    self._ofrecer_crear_esquema(msg[1])
+                
+                elif tipo == "esquema_creado":
+                    self._mostrar_esquema_creado(msg[1])
+                
+                elif tipo == "esquema_error":
+                    self.footer_status.config(text="Error creando el esquema", fg=c['error'])
+                    messagebox.showerror("Error", f"No se pudo crear el esquema:\n{msg[1]}")
+                
+                elif tipo == "conexion_estado":
+                    self._mostrar_estado_conexion(msg[1])
+                
+                elif tipo == "afiliado_cargando":
+                    if self._es_busqueda_afiliado_vigente(msg[1]):
+                        origen = os.path.basename(msg[2]) if msg[2] else "la base de datos"
+                        self.label_info_busqueda.config(
+                            text=f"⏳ Preparando índice de {origen} (solo la primera vez)...",
+                            fg=c['azul_principal'])
+                
+                elif tipo == "afiliado_resultado":
+                    self._mostrar_resultados_afiliado(*msg[1:])
+                
+                elif tipo == "afiliado_error":
+                    if self._es_busqueda_afiliado_vigente(msg[1]):
+                        self.btn_cancelar_busqueda.config(state=tk.DISABLED)
+                        self.label_info_busqueda.config(text="✗ Error en búsqueda", fg=c['error'])
+                        messagebox.showerror("Error", f"Error en búsqueda:\n{msg[2]}")
+                
                 elif tipo == "cups_busqueda_resultado":
-                    self._mostrar_resultados_busqueda_cups(msg[1], msg[2])
+                    self._mostrar_resultados_busqueda_cups(*msg[1:])
                 
                 elif tipo == "cups_busqueda_error":
-                    self.label_resultados_cups.config(text=msg[1], fg=c['error'])
-                    messagebox.showerror("Error", msg[1])
+                    if self._buscador_cups is not None and msg[1] == self._buscador_cups.generacion:
+                        self.label_resultados_cups.config(text=msg[2], fg=c['error'])
         
         except queue.Empty:
             pass
         
-        self.root.after(100, self._verificar_cola)
+        self.root.after(self.INTERVALO_REFRESCO_MS, self._verificar_cola)
 
 
 def main():
+    # Necesario para el pool de procesos de CupsDataReader en el ejecutable de PyInstaller
+    multiprocessing.freeze_support()
     root = tk.Tk()
-    EmssanarGUI(root)
+    # Reporte de tiempos de arranque: --tiempos-inicio o CLINIZAD_TIEMPOS_INICIO=1
+    reportar_inicio = "--tiempos-inicio" in sys.argv or os.environ.get("CLINIZAD_TIEMPOS_INICIO") == "1"
+    EmssanarGUI(root, reportar_inicio=reportar_inicio)
     root.mainloop()
 
 
@@ -18,8 +18,25 @@ a = Analysis(
         'tkinter.filedialog',
         'tkinter.messagebox',
         'tkinter.scrolledtext',
+        'psycopg2.pool',
+        # Módulos de la aplicación que la interfaz importa de forma diferida
         'Query',
         'read_data',
+        'read_cups_data',
+        'cups_query',
+        'cups_catalog',
+        'buscador_cups',
+        'buscador_afiliados',
+        'enriquecimiento_cups',
+        'monitor_conexion',
+        'motor_migracion',
+        'metricas',
+        'instrumentacion_bd',
+        'perfilado',
+        'historial_ejecuciones',
+        'esquema_solicitudes',
+        'sentencias_preparadas',
+        'pipeline_bd',
         'numpy',
         'pandas._libs.tslibs.timedeltas',
         'pandas._libs.tslibs.nattype',
@@ -0,0 +1,174 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, Optional
+
+
+def memoria_pico_bytes() -> Optional[int]:
+    """Pico de memoria residente del proceso (None si no se puede obtener en esta plataforma)."""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            class _Contadores(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                            ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                            ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+            contadores = _Contadores()
+            contadores.cb = ctypes.sizeof(_Contadores)
+            proceso = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(proceso, ctypes.byref(contadores), contadores.cb):
+                return int(contadores.PeakWorkingSetSize)
+            return None
+
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reporta KiB; macOS, bytes
+        return int(pico if sys.platform == "darwin" else pico * 1024)
+    except Exception:
+        return None
+
+
+def medir(metricas: Optional["MetricasEjecucion"], etapa: str, filas: int = 0, bytes_: int = 0):
+    """metricas.etapa(...) o un contexto vacío si no se están registrando métricas."""
+    return metricas.etapa(etapa, filas, bytes_) if metricas is not None else nullcontext({})
+
+
+class MetricasEjecucion:
+    """
+    Tiempo, filas y bytes por etapa de una ejecución (migración o carga CUPS).
+
+    Las etapas se acumulan: si varios hilos cargan lotes en paralelo, los segundos de
+    'carga' son la suma del tiempo de cada hilo, no el tiempo de reloj de la etapa.
+    """
+
+    # Orden en que se muestran las etapas conocidas; otras se agregan al final
+    ETAPAS = ('lectura', 'cache', 'deduplicacion', 'transformacion', 'particiones', 'carga', 'commit',
+              'analisis')
+
+    def __init__(self, proceso: str):
+        self.proceso = proceso
+        self.inicio = datetime.now()
+        self._t0 = time.perf_counter()
+        self._duracion: Optional[float] = None
+        self._memoria_pico: Optional[int] = None
+        self._etapas: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def etapa(self, nombre: str, filas: int = 0, bytes_: int = 0):
+        """
+        Mide el bloque como parte de la etapa. Se entrega un dict donde pueden ajustarse
+        'filas' y 'bytes' cuando solo se conocen al final del bloque.
+        """
+        medida = {'filas': filas, 'bytes': bytes_}
+        inicio = time.perf_counter()
+        try:
+            yield medida
+        finally:
+            self.agregar(nombre, time.perf_counter() - inicio, medida['filas'], medida['bytes'])
+
+    def agregar(self, nombre: str, segundos: float, filas: int = 0, bytes_: int = 0):
+        """Suma una medición a la etapa indicada."""
+        with self._lock:
+            etapa = self._etapas.setdefault(nombre, {'segundos': 0.0, 'filas': 0, 'bytes': 0})
+            etapa['segundos'] += segundos
+            etapa['filas'] += filas
+            etapa['bytes'] += bytes_
+
+    def finalizar(self):
+        """Fija la duración total y el pico de memoria del proceso."""
+        self._duracion = time.perf_counter() - self._t0
+        self._memoria_pico = memoria_pico_bytes()
+
+    def resumen(self) -> Dict:
+        """Métricas en un dict serializable a JSON."""
+        with self._lock:
+            nombres = [e for e in self.ETAPAS if e in self._etapas] + \
+                      [e for e in self._etapas if e not in self.ETAPAS]
+            etapas = {}
+            for nombre in nombres:
+                datos = self._etapas[nombre]
+                segundos = datos['segundos']
+                etapas[nombre] = {
+                    'segundos': round(segundos, 4),
+                    'filas': int(datos['filas']),
+                    'bytes': int(datos['bytes']),
+                    'filas_por_segundo': round(datos['filas'] / segundos, 1) if segundos > 0 and datos['filas'] else None,
+                }
+        duracion = self._duracion if self._duracion is not None else time.perf_counter() - self._t0
+        return {'proceso': self.proceso, 'inicio': self.inicio.isoformat(timespec='seconds'),
+                'duracion_s': round(duracion, 3), 'memoria_pico_bytes': self._memoria_pico, 'etapas': etapas}
+
+
+def formatear_resumen(resumen: Dict) -> str:
+    """Tabla de texto con el desglose por etapa de un resumen de MetricasEjecucion."""
+    lineas = [f"{'Etapa':<15}{'Tiempo':>10}{'%':>6}{'Filas':>10}{'Filas/s':>12}{'MB':>9}"]
+    duracion = resumen['duracion_s'] or 0
+    for nombre, etapa in resumen['etapas'].items():
+        porcentaje = (etapa['segundos'] / duracion * 100) if duracion else 0
+        velocidad = f"{etapa['filas_por_segundo']:,.0f}" if etapa['filas_por_segundo'] else "-"
+        megas = f"{etapa['bytes'] / 1_048_576:.1f}" if etapa['bytes'] else "-"
+        lineas.append(f"{nombre:<15}{etapa['segundos']:>9.2f}s{porcentaje:>5.0f}%{etapa['filas']:>10,}{velocidad:>12}{megas:>9}")
+    lineas.append(f"{'Total':<15}{duracion:>9.2f}s")
+    if resumen.get('memoria_pico_bytes'):
+        lineas.append(f"Memoria pico del proceso: {resumen['memoria_pico_bytes'] / 1_048_576:.0f} MB")
+    return "\n".join(lineas)
+
+
+def exportar_json(resumen: Dict, ruta: str):
+    """Escribe el resumen en JSON."""
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(resumen, archivo, ensure_ascii=False, indent=2)
+
+
+def exportar_prometheus(resumen: Dict, ruta: str):
+    """
+    Escribe el resumen en formato de texto de Prometheus (para el textfile collector de
+    node_exporter/windows_exporter). Se escribe a un temporal y se renombra, para que el
+    recolector nunca lea un archivo a medias.
+    """
+    proceso = resumen['proceso']
+    metricas = [
+        ("clinizad_etapa_segundos", "Segundos por etapa en la última ejecución", 'segundos'),
+        ("clinizad_etapa_filas", "Filas procesadas por etapa en la última ejecución", 'filas'),
+        ("clinizad_etapa_filas_por_segundo", "Filas por segundo por etapa en la última ejecución", 'filas_por_segundo'),
+        ("clinizad_etapa_bytes", "Bytes leídos por etapa en la última ejecución", 'bytes'),
+    ]
+    lineas = []
+    for nombre, ayuda, clave in metricas:
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} gauge"]
+        for etapa, datos in resumen['etapas'].items():
+            if datos[clave] is not None:
+                lineas.append(f'{nombre}{{proceso="{proceso}",etapa="{etapa}"}} {datos[clave]}')
+    lineas += ["# HELP clinizad_duracion_segundos Duración total de la última ejecución",
+               "# TYPE clinizad_duracion_segundos gauge",
+               f'clinizad_duracion_segundos{{proceso="{proceso}"}} {resumen["duracion_s"]}']
+    if resumen.get('memoria_pico_bytes') is not None:
+        lineas += ["# HELP clinizad_memoria_pico_bytes Pico de memoria residente del proceso",
+                   "# TYPE clinizad_memoria_pico_bytes gauge",
+                   f'clinizad_memoria_pico_bytes{{proceso="{proceso}"}} {resumen["memoria_pico_bytes"]}']
+    lineas += ["# HELP clinizad_ultima_ejecucion_timestamp_segundos Inicio de la última ejecución (epoch)",
+               "# TYPE clinizad_ultima_ejecucion_timestamp_segundos gauge",
+               f'clinizad_ultima_ejecucion_timestamp_segundos{{proceso="{proceso}"}} '
+               f'{datetime.fromisoformat(resumen["inicio"]).timestamp():.0f}']
+    escribir_textfile(lineas, ruta)
+
+
+def escribir_textfile(lineas, ruta: str):
+    """Escribe líneas de formato Prometheus a un temporal y lo renombra sobre la ruta."""
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8", newline="\n") as archivo:
+        archivo.write("\n".join(lineas) + "\n")
+    os.replace(temporal, ruta)
@@ -0,0 +1,269 @@
+"""
+Migración Excel -> solicitudes_servicios sin interfaz gráfica.
+
+Usa el mismo motor que la interfaz (MotorMigracion) y está pensada para el Programador
+de tareas de Windows o un servidor Linux junto a la base de datos. El log va a stderr
+y las estadísticas, en JSON, a stdout o al archivo indicado con --json.
+
+Ejemplo:
+    python migrar_cli.py --host 127.0.0.1 --lote 1000 --workers 4 datos_enero.xlsx datos_febrero.xlsx
+
+Mantenimiento (sin archivos o antes de migrarlos):
+    python migrar_cli.py --particionar mensual          # convierte solicitudes_servicios
+    python migrar_cli.py --retener-desde 2020-01-01     # elimina las particiones anteriores
+
+Código de salida: 0 si todo se migró, 1 si algún archivo falló o hubo registros rechazados.
+"""
+import argparse
+import contextlib
+import json
+import os
+import signal
+import sys
+import threading
+from datetime import datetime
+
+import psycopg2
+
+from Query import Query
+from motor_migracion import CanalConsola, MotorMigracion
+from metricas import exportar_prometheus
+from perfilado import SesionPerfilado
+from instrumentacion_bd import ConexionInstrumentada, exportar_prometheus_consultas, registro_consultas
+from esquema_solicitudes import GRANULARIDADES, GestorEsquema
+from pipeline_bd import BACKENDS, QueryPipeline, conectar as conectar_pipeline, verificar_disponible
+
+
+def agregar_argumentos_conexion(parser: argparse.ArgumentParser):
+    """Agrega las opciones de conexión y de carga (compartidas con servicio_ingesta.py)."""
+    bd = parser.add_argument_group("conexión")
+    bd.add_argument("--host", default="192.168.9.177")
+    bd.add_argument("--puerto", type=int, default=5432)
+    bd.add_argument("--base", default="practica")
+    bd.add_argument("--usuario", default="postgres")
+    bd.add_argument("--password", default=os.environ.get("CLINIZAD_DB_PASSWORD", "postgres"),
+                    help="Por defecto la variable de entorno CLINIZAD_DB_PASSWORD")
+    bd.add_argument("--timeout", type=int, default=10, help="connect_timeout en segundos")
+    bd.add_argument("--backend", choices=BACKENDS, default="psycopg2",
+                    help="pipeline: psycopg 3 en modo pipeline, para enlaces con latencia (requiere psycopg 3)")
+    bd.add_argument("--sin-preparadas", action="store_true",
+                    help="No usar sentencias preparadas en el servidor (p. ej. detrás de pgbouncer en modo transacción)")
+
+    carga = parser.add_argument_group("carga")
+    carga.add_argument("--lote", type=int, default=500, help="Registros por INSERT y por commit")
+    carga.add_argument("--workers", type=int, default=1, help="Conexiones que insertan en paralelo")
+    carga.add_argument("--crear-esquema", action="store_true",
+                       help="Crear la tabla e índices de solicitudes_servicios que falten antes de migrar")
+    carga.add_argument("--sin-analyze", action="store_true",
+                       help="No ejecutar ANALYZE de solicitudes_servicios después de cada carga")
+
+    diagnostico = parser.add_argument_group("diagnóstico")
+    diagnostico.add_argument("--lento-ms", type=float, default=500,
+                             help="Registrar en el log las sentencias que tarden al menos esto (ms)")
+    diagnostico.add_argument("--explain", action="store_true",
+                             help="Guardar el plan (EXPLAIN ANALYZE) de las SELECT lentas")
+
+
+def validar_backend(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    """Con --backend pipeline, termina con error de uso si psycopg 3 no está disponible."""
+    if args.backend == "pipeline":
+        try:
+            verificar_disponible()
+        except ImportError as e:
+            parser.error(str(e))
+
+
+def parametros_conexion(args: argparse.Namespace) -> dict:
+    """Parámetros de psycopg2.connect a partir de las opciones de conexión."""
+    return {'host': args.host, 'port': args.puerto, 'database': args.base,
+            'user': args.usuario, 'password': args.password, 'connect_timeout': args.timeout}
+
+
+def crear_motor(args: argparse.Namespace, canal, cancelado) -> MotorMigracion:
+    """
+    MotorMigracion con una conexión propia por Query (instrumentada con psycopg2, o de psycopg 3
+    con --backend pipeline), según las opciones de conexión y carga.
+    """
+    parametros = parametros_conexion(args)
+    registro_consultas.configurar(umbral_lento_ms=args.lento_ms, explain=args.explain)
+    if args.backend == "pipeline":
+        crear_query = lambda: QueryPipeline(conectar_pipeline(**parametros))
+    else:
+        crear_query = lambda: Query(conn=psycopg2.connect(**parametros, connection_factory=ConexionInstrumentada),
+                                    preparar=False if args.sin_preparadas else None)
+    return MotorMigracion(
+        crear_query=crear_query,
+        liberar_query=lambda query: query.conn.close(),
+        tamano_lote=args.lote,
+        workers=args.workers,
+        canal=canal,
+        cancelado=cancelado,
+        analizar_tras_carga=not args.sin_analyze
+    )
+
+
+def preparar_esquema(args: argparse.Namespace, canal) -> bool:
+    """
+    Verifica el esquema de solicitudes_servicios (o crea lo que falte con --crear-esquema) y
+    advierte en el canal de los problemas. Retorna True si el esquema está completo.
+    """
+    try:
+        conn = psycopg2.connect(**parametros_conexion(args))
+    except Exception as e:
+        canal.log(f"No se pudo verificar el esquema: {str(e).strip()}", "advertencia")
+        return False
+    try:
+        gestor = GestorEsquema(conn)
+        resultado = gestor.asegurar() if args.crear_esquema else gestor.verificar()
+        if resultado.get('creados'):
+            canal.log(f"Creado en el esquema: {', '.join(resultado['creados'])}", "exito")
+        for problema in resultado['problemas']:
+            canal.log(f"Esquema: {problema}", "advertencia")
+        if resultado['problemas'] and not args.crear_esquema:
+            canal.log("Ejecute con --crear-esquema (o setup_solicitudes_servicios_table.sql) para corregirlo",
+                      "advertencia")
+        return resultado['ok']
+    except Exception as e:
+        canal.log(f"No se pudo verificar el esquema: {str(e).strip()}", "advertencia")
+        return False
+    finally:
+        conn.close()
+
+
+def agregar_argumento_prometheus(grupo):
+    """Opción --prometheus (compartida con servicio_ingesta.py)."""
+    grupo.add_argument("--prometheus", metavar="RUTA",
+                       help="Archivo .prom con el tiempo por etapa del último archivo migrado "
+                            "(textfile collector de node_exporter/windows_exporter); las llamadas "
+                            "a la BD van a <RUTA>_bd.prom")
+
+
+def exportar_prometheus_ejecucion(stats: dict, ruta: str):
+    """Escribe las métricas del archivo migrado en RUTA y las de las llamadas a la BD en <RUTA>_bd.prom."""
+    exportar_prometheus(stats['metricas'], ruta)
+    exportar_prometheus_consultas(registro_consultas.resumen(), f"{os.path.splitext(ruta)[0]}_bd.prom")
+
+
+def mantenimiento(args: argparse.Namespace, canal) -> dict:
+    """
+    Conversión a tabla particionada (--particionar) y retención por particiones (--retener-desde).
+    Retorna lo hecho; los errores se registran en el canal y quedan en la clave 'error'.
+    """
+    resultado = {}
+    try:
+        conn = psycopg2.connect(**parametros_conexion(args))
+    except Exception as e:
+        canal.log(f"No se pudo conectar para el mantenimiento: {str(e).strip()}", "error")
+        return {'error': str(e).strip()}
+    try:
+        gestor = GestorEsquema(conn)
+        if args.particionar:
+            canal.log(f"Convirtiendo {gestor.TABLA} a tabla particionada ({args.particionar})...", "info")
+            resultado['particionado'] = gestor.convertir_a_particionada(args.particionar)
+            canal.log(f"Particionada: {resultado['particionado']['filas']} filas en "
+                      f"{resultado['particionado']['particiones']} particiones; la tabla anterior quedó como "
+                      f"{resultado['particionado']['tabla_anterior']}", "exito")
+        if args.retener_desde:
+            resultado['particiones_eliminadas'] = gestor.eliminar_particiones_anteriores(args.retener_desde)
+            canal.log(f"Particiones eliminadas: {', '.join(resultado['particiones_eliminadas']) or 'ninguna'}",
+                      "exito")
+    except Exception as e:
+        canal.log(f"Error en el mantenimiento: {str(e).strip()}", "error")
+        resultado['error'] = str(e).strip()
+    finally:
+        conn.close()
+    return resultado
+
+
+def _fecha(texto: str):
+    try:
+        return datetime.strptime(texto, "%Y-%m-%d").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha no válida: {texto} (use AAAA-MM-DD)")
+
+
+def _argumentos(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Migra archivos Excel de Emssanar a solicitudes_servicios.")
+    parser.add_argument("archivos", nargs="*", help="Archivos Excel a migrar (en orden)")
+    agregar_argumentos_conexion(parser)
+
+    particiones = parser.add_argument_group("particiones")
+    particiones.add_argument("--particionar", choices=GRANULARIDADES,
+                             help="Convertir solicitudes_servicios en tabla particionada por fecha_autorizacion_1 "
+                                  "(bloquea la tabla mientras copia las filas)")
+    particiones.add_argument("--retener-desde", type=_fecha, metavar="AAAA-MM-DD",
+                             help="Eliminar las particiones cuyo periodo termina antes de esta fecha")
+
+    salida = parser.add_argument_group("salida")
+    salida.add_argument("--json", default="-", help="Archivo para las estadísticas JSON ('-' = stdout)")
+    salida.add_argument("--silencioso", action="store_true", help="Solo registrar advertencias y errores")
+    agregar_argumento_prometheus(salida)
+    salida.add_argument("--perfilar", metavar="CARPETA",
+                        help="Guardar en CARPETA el perfil (cProfile + tracemalloc) de la ejecución")
+    args = parser.parse_args(argv)
+    validar_backend(parser, args)
+    if not args.archivos and not (args.particionar or args.retener_desde or args.crear_esquema):
+        parser.error("indique los archivos a migrar o una operación de esquema")
+    return args
+
+
+def main(argv=None) -> int:
+    args = _argumentos(argv)
+
+    # Ctrl+C o la detención de la tarea terminan el lote en curso y se detienen
+    cancelar = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: cancelar.set())
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda *_: cancelar.set())
+
+    motor = crear_motor(args, CanalConsola(silencioso=args.silencioso), cancelar.is_set)
+
+    inicio = datetime.now()
+    resultados = []
+    perfil = SesionPerfilado("migracion", args.perfilar) if args.perfilar else contextlib.nullcontext()
+    # Los print de los lectores van a stderr para no mezclarse con el JSON
+    operaciones = {}
+    with contextlib.redirect_stdout(sys.stderr), perfil:
+        if args.particionar or args.retener_desde:
+            operaciones = mantenimiento(args, motor.canal)
+        preparar_esquema(args, motor.canal)
+        for archivo in args.archivos:
+            if cancelar.is_set():
+                break
+            try:
+                stats = motor.migrar_archivo(archivo)
+                resultados.append(stats)
+                if args.prometheus:
+                    exportar_prometheus_ejecucion(stats, args.prometheus)
+            except Exception as e:
+                motor.canal.log(f"Error crítico en {archivo}: {str(e)}", "error")
+                resultados.append({'archivo': os.path.abspath(archivo), 'error': str(e).strip()})
+
+    exito = all('error' not in r and not r['errores'] for r in resultados) and \
+        len(resultados) == len(args.archivos) and 'error' not in operaciones
+    reporte = {
+        'inicio': inicio.isoformat(timespec='seconds'),
+        'fin': datetime.now().isoformat(timespec='seconds'),
+        'parametros': {'host': args.host, 'puerto': args.puerto, 'base': args.base,
+                       'lote': args.lote, 'workers': args.workers, 'backend': args.backend},
+        'archivos': resultados,
+        'totales': {clave: sum(r.get(clave, 0) for r in resultados)
+                    for clave in ('total', 'nuevos', 'duplicados', 'insertados', 'errores')},
+        'mantenimiento': operaciones or None,
+        'consultas_bd': registro_consultas.resumen(),
+        'perfil': perfil.archivos if args.perfilar else None,
+        'cancelado': cancelar.is_set(),
+        'exito': exito,
+    }
+
+    texto = json.dumps(reporte, ensure_ascii=False, indent=2)
+    if args.json == "-":
+        print(texto)
+    else:
+        with open(args.json, "w", encoding="utf-8") as archivo:
+            archivo.write(texto + "\n")
+    return 0 if exito else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+import psycopg2
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+from instrumentacion_bd import ConexionInstrumentada
+
+
+class MonitorConexion:
+    """
+    Verifica en segundo plano el estado de la base de datos y mantiene un pool de conexiones.
+
+    Cada sondeo toma una conexión del pool (creándolo con connect_timeout si no existe),
+    mide el tiempo de ida y vuelta de SELECT 1 y reporta el resultado por callback. La
+    interfaz nunca espera el timeout TCP del sistema, y cuando empieza la primera operación
+    real el pool ya tiene una conexión abierta.
+    """
+
+    def __init__(self, al_estado: Callable[[Dict], None], intervalo: float = 30.0,
+                 timeout: int = 5, max_conexiones: int = 5):
+        """
+        Args:
+            al_estado: Se llama (desde el hilo del monitor) con el resultado de cada sondeo:
+                {'parametros', 'conectado', 'latencia_ms', 'error'}.
+            intervalo: Segundos entre sondeos periódicos.
+            timeout: connect_timeout (segundos) de cada conexión nueva.
+            max_conexiones: Conexiones simultáneas que entrega el pool.
+        """
+        self._al_estado = al_estado
+        self.intervalo = intervalo
+        self.timeout = timeout
+        self.max_conexiones = max_conexiones
+        self._lock = threading.Lock()
+        self._parametros: Optional[Dict] = None
+        self._pool: Optional[ThreadedConnectionPool] = None
+        self._prestadas: Dict[int, ThreadedConnectionPool] = {}
+        self._evento = threading.Event()
+        self._activo = True
+        self._hilo = threading.Thread(target=self._ciclo, daemon=True)
+        self._hilo.start()
+
+    def configurar(self, parametros: Dict):
+        """
+        Define los parámetros de conexión (host, port, database, user, password) y pide
+        un sondeo inmediato. Si cambiaron, el pool anterior se retira.
+        """
+        with self._lock:
+            if parametros != self._parametros:
+                self._parametros = dict(parametros)
+                self._retirar_pool()
+        self._evento.set()
+
+    def probar(self):
+        """Pide un sondeo inmediato."""
+        self._evento.set()
+
+    def detener(self):
+        """Detiene el monitor y cierra las conexiones libres del pool."""
+        self._activo = False
+        self._evento.set()
+        with self._lock:
+            self._retirar_pool()
+
+    def tomar(self):
+        """
+        Retorna una conexión del pool (lo crea si hace falta). Debe devolverse con devolver().
+        Lanza psycopg2.OperationalError si el servidor no responde dentro del timeout.
+
+        Las conexiones se abren fuera del lock: configurar() (llamado desde la interfaz) nunca
+        espera el connect_timeout de un sondeo en curso.
+        """
+        with self._lock:
+            parametros, pool = self._parametros, self._pool
+        if parametros is None:
+            raise psycopg2.OperationalError("No hay parámetros de conexión configurados")
+        if pool is None:
+            pool = self._instalar_pool(parametros)
+        try:
+            conn = pool.getconn()
+            if conn.closed:
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+        except PoolError:
+            if pool.closed:
+                raise psycopg2.OperationalError("Los parámetros de conexión cambiaron")
+            raise
+        with self._lock:
+            if pool.closed:
+                # Retirado y cerrado entre getconn y el registro: la conexión ya no sirve
+                raise psycopg2.OperationalError("Los parámetros de conexión cambiaron")
+            self._prestadas[id(conn)] = pool
+        return conn
+
+    def _instalar_pool(self, parametros: Dict) -> ThreadedConnectionPool:
+        """
+        Crea un pool para los parámetros (sin lock) y lo instala si siguen vigentes; si otro
+        hilo ya instaló uno para los mismos parámetros, usa ese y cierra el nuevo.
+        """
+        nuevo = ThreadedConnectionPool(1, self.max_conexiones, connect_timeout=self.timeout,
+                                       connection_factory=ConexionInstrumentada, **parametros)
+        with self._lock:
+            vigentes = parametros == self._parametros
+            if vigentes and self._pool is None:
+                self._pool = nuevo
+                return nuevo
+            pool = self._pool if vigentes else None
+        nuevo.closeall()
+        if pool is None:
+            raise psycopg2.OperationalError("Los parámetros de conexión cambiaron")
+        return pool
+
+    def devolver(self, conn):
+        """Devuelve una conexión al pool (se cierra si su pool ya fue retirado)."""
+        with self._lock:
+            pool = self._prestadas.pop(id(conn), None)
+            if pool is None:
+                return
+            if pool is self._pool:
+                pool.putconn(conn, close=bool(conn.closed))
+            else:
+                pool.putconn(conn, close=True)
+                if pool not in self._prestadas.values():
+                    pool.closeall()
+
+    @contextmanager
+    def conexion(self):
+        """Context manager que toma una conexión del pool y la devuelve al salir."""
+        conn = self.tomar()
+        try:
+            yield conn
+        finally:
+            self.devolver(conn)
+
+    def _retirar_pool(self):
+        """Descarta el pool vigente; las conexiones prestadas se cierran al devolverse (con lock)."""
+        pool, self._pool = self._pool, None
+        if pool is not None and pool not in self._prestadas.values():
+            pool.closeall()
+
+    def _sondear(self) -> Dict:
+        """Mide la latencia de SELECT 1; reintenta una vez si la conexión del pool estaba rota."""
+        parametros = self._parametros
+        try:
+            for intento in range(2):
+                with self.conexion() as conn:
+                    try:
+                        inicio = time.perf_counter()
+                        with conn.cursor() as cursor:
+                            cursor.execute("SELECT 1")
+                            cursor.fetchone()
+                        latencia = (time.perf_counter() - inicio) * 1000
+                        conn.rollback()
+                        return {'parametros': parametros, 'conectado': True, 'latencia_ms': latencia, 'error': None}
+                    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                        # Conexión caída (p. ej. reinicio del servidor): se descarta al devolverla
+                        conn.close()
+                        if intento:
+                            raise
+        except Exception as e:
+            with self._lock:
+                if parametros == self._parametros:
+                    self._retirar_pool()
+            return {'parametros': parametros, 'conectado': False, 'latencia_ms': None, 'error': str(e).strip()}
+
+    def _ciclo(self):
+        while True:
+            self._evento.wait(self.intervalo)
+            self._evento.clear()
+            if not self._activo:
+                break
+            if self._parametros is not None:
+                self._al_estado(self._sondear())
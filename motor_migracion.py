@@ -0,0 +1,321 @@
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from Query import Query
+from read_data import EmssanarDataReader
+from enriquecimiento_cups import enriquecer_con_cups, normalizar_codigos, resumen_banderas
+from metricas import MetricasEjecucion, formatear_resumen
+from perfilado import perfilar_hilo
+from historial_ejecuciones import HistorialEjecuciones, ejecucion_desde_resumen
+from esquema_solicitudes import GestorEsquema, repartir_por_particion
+
+
+class CanalConsola:
+    """
+    Canal de progreso para ejecuciones sin interfaz: escribe el log en un stream
+    (stderr por defecto, para dejar stdout a la salida JSON). Progreso y estadísticas
+    se ignoran; el resultado final queda en las estadísticas que retorna el motor.
+    """
+
+    def __init__(self, stream=None, silencioso: bool = False):
+        self._stream = stream or sys.stderr
+        self._silencioso = silencioso
+        self._lock = threading.Lock()
+
+    def progreso(self, valor: float, texto: str = ""):
+        pass
+
+    def estado(self, texto: str):
+        pass
+
+    def stat(self, clave: str, valor):
+        pass
+
+    def log(self, mensaje: str, tipo: str = "info"):
+        if self._silencioso and tipo not in ("error", "advertencia"):
+            return
+        with self._lock:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] {mensaje}", file=self._stream, flush=True)
+
+
+class MotorMigracion:
+    """
+    Migración Excel -> solicitudes_servicios, compartida por la interfaz, Query.py y migrar_cli.py.
+
+    Etapas: lectura del Excel (EmssanarDataReader, con su caché pickle), consulta de las
+    solicitudes existentes, filtro de nuevas, transformación e inserción por lotes
+    (Query.insertar_solicitudes_lote) repartida entre `workers` conexiones.
+    La transformación guarda codigo_servicio_completo normalizado (normalizar_codigos), la clave
+    con la que v_solicitudes_cups y Query.consultar_por_afiliado cruzan con codigos_cups. Las
+    banderas CUPS no se guardan en la tabla: el cruce en memoria (enriquecer_con_cups) solo
+    alimenta los conteos de preparación especial y remitidas del log y de las estadísticas.
+    Si la tabla está particionada por fecha_autorizacion_1 se crean antes las particiones que
+    falten y cada lote va directo a su partición. Si se insertó algo, la carga termina con
+    ANALYZE de la tabla (GestorEsquema.analizar).
+    El avance se publica en un canal con la interfaz de CanalProgreso (log, stat, progreso).
+    """
+
+    def __init__(self, crear_query: Callable[[], Query],
+                 liberar_query: Optional[Callable[[Query], None]] = None,
+                 tamano_lote: int = 500, workers: int = 1, canal=None,
+                 cancelado: Optional[Callable[[], bool]] = None,
+                 usuario: Optional[str] = None, registrar_historial: bool = True,
+                 analizar_tras_carga: bool = True):
+        """
+        Args:
+            crear_query: Retorna un Query conectado; se llama una vez por worker más
+                una para las consultas previas.
+            liberar_query: Libera un Query al terminar (por defecto cerrar_conexion()).
+            tamano_lote: Registros por INSERT de varias filas (y por commit).
+            workers: Conexiones que insertan lotes en paralelo.
+            canal: Destino del avance (CanalProgreso, CanalConsola...).
+            cancelado: Se consulta entre lotes; si retorna True la migración se detiene.
+            usuario: Usuario que se registra en migration_runs (por defecto el del sistema).
+            registrar_historial: Guardar cada ejecución en migration_runs (HistorialEjecuciones).
+            analizar_tras_carga: Ejecutar ANALYZE de solicitudes_servicios si se insertaron filas.
+        """
+        self.crear_query = crear_query
+        self.liberar_query = liberar_query or (lambda query: query.cerrar_conexion())
+        self.tamano_lote = max(1, tamano_lote)
+        self.workers = max(1, workers)
+        self.canal = canal or CanalConsola()
+        self.cancelado = cancelado or (lambda: False)
+        self.usuario = usuario
+        self.registrar_historial = registrar_historial
+        self.analizar_tras_carga = analizar_tras_carga
+        self._existentes: Optional[Set[str]] = None
+
+    def migrar_archivo(self, ruta: str) -> Dict:
+        """
+        Migra un archivo Excel. Las solicitudes existentes se consultan una sola vez por
+        motor y se actualizan con lo insertado, de modo que varios archivos seguidos no
+        dupliquen registros entre sí.
+
+        Returns:
+            Estadísticas: archivo, total, existentes, nuevos, duplicados, insertados, errores,
+            preparacion_especial, remitido, cancelado, duracion_s y metricas (resumen de
+            MetricasEjecucion con el tiempo por etapa). La ejecución, también si falla, queda
+            en migration_runs.
+        """
+        metricas = MetricasEjecucion('migracion')
+        stats = {'archivo': os.path.abspath(ruta), 'total': 0, 'existentes': 0, 'nuevos': 0,
+                 'duplicados': 0, 'insertados': 0, 'errores': 0, 'preparacion_especial': 0,
+                 'remitido': 0, 'cancelado': False, 'duracion_s': 0.0}
+        try:
+            self._migrar(ruta, stats, metricas)
+        except Exception as e:
+            self._terminar(stats, metricas, error=str(e).strip())
+            raise
+        return self._terminar(stats, metricas)
+
+    def _migrar(self, ruta: str, stats: Dict, metricas: MetricasEjecucion):
+        """Etapas de migrar_archivo; completa stats."""
+        canal = self.canal
+        canal.log("Iniciando migración...", "info")
+        canal.log(f"Leyendo: {os.path.basename(ruta)}", "info")
+        lector = EmssanarDataReader(ruta)
+        inicio_lectura = time.perf_counter()
+        lector.cargar()
+        df = lector.datos
+        metricas.agregar('cache' if lector.origen == 'cache' else 'lectura', time.perf_counter() - inicio_lectura,
+                         filas=0 if df is None else len(df), bytes_=os.path.getsize(lector.ruta_origen))
+
+        if df is None or df.empty:
+            canal.log("Archivo vacío o sin datos válidos", "error")
+            return
+
+        stats['total'] = len(df)
+        canal.stat('total', stats['total'])
+        canal.log(f"Encontrados {stats['total']} registros", "exito")
+
+        canal.log("Conectando a BD...", "info")
+        query = self.crear_query()
+        try:
+            canal.log("Conexión establecida", "exito")
+
+            with metricas.etapa('deduplicacion', filas=stats['total']):
+                if self._existentes is None:
+                    canal.log("Verificando registros existentes...", "info")
+                    self._existentes = query.obtener_solicitudes_existentes()
+                df_nuevos = self._filtrar_nuevos(df)
+            stats['existentes'] = len(self._existentes)
+            canal.stat('existentes', stats['existentes'])
+            stats['nuevos'] = len(df_nuevos)
+            stats['duplicados'] = stats['total'] - stats['nuevos']
+            canal.stat('nuevos', stats['nuevos'])
+            canal.log(f"Nuevos: {stats['nuevos']}, Duplicados: {stats['duplicados']}", "info")
+
+            if df_nuevos.empty:
+                canal.log("No hay registros nuevos", "advertencia")
+                return
+
+            # Normalizar la clave del cruce con CUPS, contar las banderas y convertir a registros
+            with metricas.etapa('transformacion', filas=stats['nuevos']):
+                df_nuevos = df_nuevos.assign(
+                    codigo_servicio_completo=normalizar_codigos(df_nuevos['codigo_servicio_completo']))
+                df_nuevos = enriquecer_con_cups(df_nuevos, query.obtener_banderas_cups())
+                stats.update(resumen_banderas(df_nuevos))
+                registros = self._a_registros(df_nuevos)
+            canal.log(f"Con preparación especial: {stats['preparacion_especial']}, "
+                      f"Remitidas: {stats['remitido']}", "info")
+
+            with metricas.etapa('particiones'):
+                grupos = self._repartir(query, registros)
+        finally:
+            self.liberar_query(query)
+
+        canal.log("Insertando registros...", "info")
+        insertados, errores, cancelado = self._insertar(grupos, len(registros), metricas)
+
+        stats.update(insertados=insertados, errores=errores, cancelado=cancelado)
+        canal.stat('insertados', insertados)
+        canal.stat('errores', errores)
+        canal.log("═" * 50, "info")
+        canal.log(f"¡Completado! Insertados: {insertados}", "exito")
+        if errores > 0:
+            canal.log(f"Errores: {errores}", "error")
+        if insertados > 0 and self.analizar_tras_carga:
+            self._analizar(metricas)
+
+    def _analizar(self, metricas: MetricasEjecucion):
+        """ANALYZE tras la carga; un fallo aquí solo se advierte (las filas ya están guardadas)."""
+        try:
+            query = self.crear_query()
+        except Exception as e:
+            self.canal.log(f"No se actualizaron las estadísticas de la tabla: {str(e).strip()}", "advertencia")
+            return
+        try:
+            with metricas.etapa('analisis'):
+                GestorEsquema(query.conn).analizar()
+            self.canal.log("Estadísticas de solicitudes_servicios actualizadas (ANALYZE)", "info")
+        except Exception as e:
+            self.canal.log(f"No se actualizaron las estadísticas de la tabla: {str(e).strip()}", "advertencia")
+        finally:
+            self.liberar_query(query)
+
+    def _terminar(self, stats: Dict, metricas: MetricasEjecucion, error: Optional[str] = None) -> Dict:
+        """Cierra las métricas, registra el desglose por etapa y la ejecución, y completa las estadísticas."""
+        metricas.finalizar()
+        resumen = metricas.resumen()
+        stats['duracion_s'] = resumen['duracion_s']
+        stats['metricas'] = resumen
+        self.canal.log("Tiempo por etapa:\n" + formatear_resumen(resumen), "info")
+        if self.registrar_historial:
+            self._registrar_historial(stats, resumen, error)
+        return stats
+
+    def _registrar_historial(self, stats: Dict, resumen: Dict, error: Optional[str]):
+        """Guarda la ejecución en migration_runs; un fallo aquí solo se advierte en el log."""
+        ejecucion = ejecucion_desde_resumen(
+            'migracion', [stats['archivo']], resumen, filas_leidas=stats['total'],
+            insertados=stats['insertados'], omitidos=stats['duplicados'], fallidos=stats['errores'],
+            cancelado=stats['cancelado'], error=error, usuario=self.usuario)
+        try:
+            query = self.crear_query()
+        except Exception as e:
+            self.canal.log(f"No se registró la ejecución en el historial: {str(e).strip()}", "advertencia")
+            return
+        try:
+            if not HistorialEjecuciones(query.conn).registrar(ejecucion):
+                self.canal.log("No se registró la ejecución en el historial", "advertencia")
+        except Exception as e:
+            self.canal.log(f"No se registró la ejecución en el historial: {str(e).strip()}", "advertencia")
+        finally:
+            self.liberar_query(query)
+
+    def _filtrar_nuevos(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Conserva las filas cuyo numero_solicitud no está en la base de datos, y de las repetidas
+        dentro del archivo solo la primera (el índice único rechazaría las demás).
+        """
+        claves = df['numero_solicitud'].astype(str)
+        return df[~claves.isin(self._existentes) & ~claves.duplicated()].copy()
+
+    @staticmethod
+    def _a_registros(df: pd.DataFrame) -> List[Dict]:
+        """Convierte el DataFrame a diccionarios, con None en lugar de NaN/NaT."""
+        df = df.astype(object).where(pd.notnull(df), None)
+        return df.to_dict('records')
+
+    def _repartir(self, query: Query, registros: List[Dict]) -> Dict[Optional[str], List[Dict]]:
+        """
+        Agrupa los registros por tabla de destino: con la tabla particionada, crea las particiones
+        que falten y asigna cada registro a la suya; si no, todos van a la tabla (clave None).
+        """
+        gestor = GestorEsquema(query.conn)
+        if not gestor.es_particionada():
+            return {None: registros}
+        granularidad = gestor.granularidad() or "mensual"
+        particiones = gestor.asegurar_particiones(
+            (r['fecha_autorizacion_1'] for r in registros if isinstance(r['fecha_autorizacion_1'], datetime)),
+            granularidad)
+        grupos = repartir_por_particion(registros, granularidad, particiones)
+        self.canal.log(f"Tabla particionada ({granularidad}): {len([t for t in grupos if t])} partición(es) "
+                       f"de destino", "info")
+        return grupos
+
+    def _insertar(self, grupos: Dict[Optional[str], List[Dict]], total: int, metricas: MetricasEjecucion):
+        """Reparte los lotes (de una sola tabla cada uno) entre los workers; retorna (insertados, errores, cancelado)."""
+        canal = self.canal
+        lotes: "queue.Queue[Tuple[Optional[str], List[Dict]]]" = queue.Queue()
+        for tabla, registros in grupos.items():
+            for i in range(0, len(registros), self.tamano_lote):
+                lotes.put((tabla, registros[i:i + self.tamano_lote]))
+
+        lock = threading.Lock()
+        acumulado = {'insertados': 0, 'errores': 0, 'procesados': 0, 'cancelado': False}
+
+        def trabajar():
+            query = self.crear_query()
+            try:
+                while True:
+                    if self.cancelado():
+                        with lock:
+                            acumulado['cancelado'] = True
+                        return
+                    try:
+                        tabla, lote = lotes.get_nowait()
+                    except queue.Empty:
+                        return
+                    insertados, errores = query.insertar_solicitudes_lote(lote, self.tamano_lote, metricas, tabla)
+                    with lock:
+                        self._registrar_lote(acumulado, lote, insertados, errores, total)
+            finally:
+                self.liberar_query(query)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futuros = [executor.submit(perfilar_hilo(trabajar)) for _ in range(min(self.workers, lotes.qsize()))]
+            for futuro in futuros:
+                futuro.result()
+
+        if acumulado['cancelado']:
+            canal.log("Cancelado por usuario", "advertencia")
+        return acumulado['insertados'], acumulado['errores'], acumulado['cancelado']
+
+    def _registrar_lote(self, acumulado: Dict, lote: List[Dict], insertados: int,
+                        errores: List[Tuple[str, str]], total: int):
+        """Actualiza contadores, existentes y progreso tras un lote (con lock)."""
+        canal = self.canal
+        acumulado['insertados'] += insertados
+        acumulado['procesados'] += len(lote)
+        fallidos = {numero for numero, _ in errores}
+        self._existentes.update(numero for numero in (str(r['numero_solicitud']) for r in lote)
+                                if numero not in fallidos)
+
+        for numero, mensaje in errores:
+            acumulado['errores'] += 1
+            if acumulado['errores'] <= 5:
+                canal.log(f"Error en solicitud {numero}: {mensaje}", "error")
+        canal.stat('insertados', acumulado['insertados'])
+        canal.stat('errores', acumulado['errores'])
+        canal.progreso((acumulado['procesados'] / total) * 100,
+                       f"Insertando: {acumulado['procesados']}/{total}")
+        canal.log(f"Procesados {acumulado['procesados']}/{total}...", "info")
@@ -0,0 +1,122 @@
+import logging
+import os
+import tkinter as tk
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from tkinter import scrolledtext
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class PanelLog(tk.Frame):
+    """
+    Panel de log con costo acotado por mensaje.
+
+    Las líneas se guardan en un buffer circular de tamaño fijo (deque con maxlen) y se
+    vuelcan al widget por lotes con volcar(); el widget nunca conserva más de max_lineas
+    líneas (las más antiguas se recortan). Opcionalmente cada línea se copia a un archivo
+    de log rotativo, para no perder el historial completo de ejecuciones largas.
+    """
+
+    # Formato de cada tipo de mensaje: (color, negrita)
+    ESTILOS = {
+        'exito': ("#10B981", True),
+        'error': ("#EF4444", True),
+        'advertencia': ("#FF8C00", True),
+        'info': ("#0066CC", False),
+    }
+
+    def __init__(self, parent, max_lineas: int = 1000, archivo: Optional[str] = None,
+                 max_bytes: int = 1_000_000, respaldos: int = 3,
+                 colores: Optional[Dict[str, str]] = None, bg: Optional[str] = None,
+                 height: int = 6, width: int = 80, **kwargs):
+        """
+        Args:
+            max_lineas: Líneas que conservan el buffer y el widget.
+            archivo: Ruta del archivo de log rotativo (None para no escribir a disco).
+            max_bytes: Tamaño a partir del cual se rota el archivo.
+            respaldos: Cantidad de archivos rotados que se conservan.
+            colores: Colores por tipo de mensaje que reemplazan los de ESTILOS.
+        """
+        super().__init__(parent, bg=bg, **kwargs)
+        self.max_lineas = max_lineas
+        self._buffer: deque = deque(maxlen=max_lineas)
+        self._pendientes = 0
+        self._lineas_widget = 0
+        self._logger = self._crear_logger(archivo, max_bytes, respaldos) if archivo else None
+
+        colores = colores or {}
+        self.text = scrolledtext.ScrolledText(self, height=height, width=width, wrap=tk.WORD,
+            bg=colores.get('fondo', "#FFFFFF"), fg="#333333", font=("Consolas", 9),
+            insertbackground=colores.get('info', "#0066CC"), selectbackground=colores.get('seleccion', "#4A90D9"),
+            selectforeground="#FFFFFF")
+        self.text.pack(fill=tk.BOTH, expand=True)
+        for tipo, (color, negrita) in self.ESTILOS.items():
+            fuente = ("Consolas", 9, "bold") if negrita else ("Consolas", 9)
+            self.text.tag_config(tipo, foreground=colores.get(tipo, color), font=fuente)
+
+    def _crear_logger(self, archivo: str, max_bytes: int, respaldos: int) -> Optional[logging.Logger]:
+        """Crea un logger propio con RotatingFileHandler; None si el archivo no es escribible."""
+        try:
+            directorio = os.path.dirname(os.path.abspath(archivo))
+            os.makedirs(directorio, exist_ok=True)
+            manejador = RotatingFileHandler(archivo, maxBytes=max_bytes, backupCount=respaldos, encoding="utf-8")
+        except OSError as e:
+            print(f"No se pudo abrir el archivo de log {archivo}: {e}")
+            return None
+        manejador.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger(f"panel_log.{id(self)}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(manejador)
+        return logger
+
+    @property
+    def lineas(self) -> List[Tuple[str, str]]:
+        """Copia de las líneas (texto, tipo) retenidas en el buffer."""
+        return list(self._buffer)
+
+    def agregar(self, texto: str, tipo: str = "info"):
+        """Agrega una línea (ya formateada, terminada en salto de línea) sin tocar el widget."""
+        self._buffer.append((texto, tipo))
+        self._pendientes = min(self._pendientes + 1, self.max_lineas)
+        if self._logger is not None:
+            self._logger.info(f"{tipo.upper():<11} {texto.rstrip()}")
+
+    def agregar_lote(self, lineas: Iterable[Tuple[str, str]]):
+        """Agrega varias líneas (texto, tipo)."""
+        for texto, tipo in lineas:
+            self.agregar(texto, tipo)
+
+    def volcar(self):
+        """Inserta en el widget las líneas pendientes con una sola llamada y recorta las antiguas."""
+        if not self._pendientes:
+            return
+        nuevas = list(self._buffer)[-self._pendientes:]
+        self._pendientes = 0
+
+        argumentos = []
+        for texto, tipo in nuevas:
+            argumentos.extend((texto, tipo))
+        self.text.insert(tk.END, *argumentos)
+        self._lineas_widget += sum(texto.count("\n") for texto, _ in nuevas)
+
+        sobrantes = self._lineas_widget - self.max_lineas
+        if sobrantes > 0:
+            self.text.delete("1.0", f"{sobrantes + 1}.0")
+            self._lineas_widget = self.max_lineas
+        self.text.see(tk.END)
+
+    def limpiar(self):
+        """Vacía el buffer y el widget (el archivo de log se conserva)."""
+        self._buffer.clear()
+        self._pendientes = 0
+        self._lineas_widget = 0
+        self.text.delete("1.0", tk.END)
+
+    def cerrar(self):
+        """Cierra el archivo de log, si hay uno."""
+        if self._logger is not None:
+            for manejador in list(self._logger.handlers):
+                manejador.close()
+                self._logger.removeHandler(manejador)
+            self._logger = None
@@ -0,0 +1,151 @@
+"""
+Captura de perfil de una ejecución (migración o carga CUPS) para diagnosticar lentitud.
+
+SesionPerfilado se abre en el hilo de trabajo de la ejecución: perfila ese hilo con cProfile,
+y los hilos que la ejecución reparte con perfilar_hilo() (los workers de MotorMigracion) con
+un perfil propio cada uno; al cerrar se combinan en un solo archivo .prof. Además toma una
+instantánea de tracemalloc. Archivos generados (en la carpeta indicada, logs/perfiles por defecto):
+
+    <proceso>_<fecha>.prof             pstats combinado (snakeviz, gprof2dot, python -m pstats)
+    <proceso>_<fecha>_perfil.txt       las funciones con más tiempo acumulado
+    <proceso>_<fecha>.tracemalloc      instantánea de memoria (tracemalloc.Snapshot.load)
+    <proceso>_<fecha>_memoria.txt      las líneas que más memoria tenían asignada al terminar
+
+Los procesos del pool de CupsDataReader no se perfilan (solo el hilo que los espera).
+Desde Python 3.12 cProfile admite un solo perfilador activo en el proceso; los hilos que no
+pueden tener perfil propio se omiten y su tiempo queda en el perfil del hilo principal.
+"""
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import tracemalloc
+import zipfile
+from datetime import datetime
+from typing import Callable, List, Optional
+
+_local = threading.local()
+
+
+class _PerfilTerminado:
+    """Adaptador para pstats.Stats: entrega las estadísticas de un perfil ya deshabilitado."""
+
+    def __init__(self, perfil: cProfile.Profile):
+        self._perfil = perfil
+        self.stats = None
+
+    def create_stats(self):
+        # snapshot_stats y no create_stats: este último deshabilitaría el perfilador del hilo actual
+        self._perfil.snapshot_stats()
+        self.stats = self._perfil.stats
+
+
+class SesionPerfilado:
+    """Context manager que perfila la ejecución del hilo actual y de sus workers."""
+
+    FUNCIONES_REPORTE = 40
+    LINEAS_MEMORIA = 30
+
+    def __init__(self, proceso: str, carpeta: str):
+        self.proceso = proceso
+        self.carpeta = carpeta
+        self.archivos: List[str] = []
+        self._perfiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._principal: Optional[cProfile.Profile] = None
+        self._inicio_tracemalloc = False
+        self._memoria = None
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._inicio_tracemalloc = True
+        self._principal = self._habilitar()
+        _local.sesion = self
+        return self
+
+    def __exit__(self, *exc):
+        _local.sesion = None
+        if self._principal is not None:
+            self._principal.disable()
+        instantanea = None
+        if tracemalloc.is_tracing():
+            instantanea = tracemalloc.take_snapshot()
+            self._memoria = tracemalloc.get_traced_memory()
+        if self._inicio_tracemalloc:
+            tracemalloc.stop()
+        try:
+            self._guardar(instantanea)
+        except OSError as e:
+            print(f"No se pudo guardar el perfil: {e}")
+        return False
+
+    def _habilitar(self) -> Optional[cProfile.Profile]:
+        """Perfil nuevo habilitado en el hilo actual (None si ya hay otro perfilador activo)."""
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            return None
+        with self._lock:
+            self._perfiles.append(perfil)
+        return perfil
+
+    def envolver(self, funcion: Callable) -> Callable:
+        """La función, ejecutada con un perfil propio en el hilo que la corra."""
+        @functools.wraps(funcion)
+        def perfilada(*args, **kwargs):
+            perfil = self._habilitar()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                if perfil is not None:
+                    perfil.disable()
+        return perfilada
+
+    def _guardar(self, instantanea):
+        os.makedirs(self.carpeta, exist_ok=True)
+        base = os.path.join(self.carpeta, f"{self.proceso}_{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+
+        with self._lock:
+            perfiles = list(self._perfiles)
+        if perfiles:
+            estadisticas = pstats.Stats(_PerfilTerminado(perfiles[0]))
+            for perfil in perfiles[1:]:
+                estadisticas.add(_PerfilTerminado(perfil))
+            estadisticas.dump_stats(f"{base}.prof")
+            texto = io.StringIO()
+            pstats.Stats(f"{base}.prof", stream=texto).sort_stats("cumulative").print_stats(self.FUNCIONES_REPORTE)
+            with open(f"{base}_perfil.txt", "w", encoding="utf-8") as archivo:
+                archivo.write(f"Perfil de {self.proceso}: {len(perfiles)} hilo(s) combinados\n")
+                archivo.write(texto.getvalue())
+            self.archivos += [f"{base}.prof", f"{base}_perfil.txt"]
+
+        if instantanea is not None:
+            instantanea.dump(f"{base}.tracemalloc")
+            with open(f"{base}_memoria.txt", "w", encoding="utf-8") as archivo:
+                actual, pico = self._memoria
+                archivo.write(f"Memoria rastreada: {actual / 1_048_576:.1f} MB (pico {pico / 1_048_576:.1f} MB)\n")
+                for estadistica in instantanea.statistics("lineno")[:self.LINEAS_MEMORIA]:
+                    archivo.write(f"{estadistica}\n")
+            self.archivos += [f"{base}.tracemalloc", f"{base}_memoria.txt"]
+
+
+def perfilar_hilo(funcion: Callable) -> Callable:
+    """
+    Para funciones que se ejecutarán en otro hilo: si el hilo actual tiene una SesionPerfilado
+    abierta, la función se perfila dentro de ella; si no, se retorna sin cambios.
+    """
+    sesion = getattr(_local, "sesion", None)
+    return sesion.envolver(funcion) if sesion is not None else funcion
+
+
+def crear_reporte_soporte(ruta_zip: str, archivos: List[str]) -> str:
+    """Comprime en ruta_zip los archivos que existan (perfiles, logs, métricas). Retorna la ruta."""
+    with zipfile.ZipFile(ruta_zip, "w", compression=zipfile.ZIP_DEFLATED) as reporte:
+        for ruta in archivos:
+            if ruta and os.path.isfile(ruta):
+                reporte.write(ruta, arcname=os.path.basename(ruta))
+    return ruta_zip
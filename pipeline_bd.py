@@ -0,0 +1,72 @@
+"""
+Backend alternativo de carga con psycopg 3 en modo pipeline, para la migración y la carga CUPS.
+
+Con psycopg2 cada ida y vuelta espera la respuesta del servidor antes de enviar la siguiente
+sentencia, así que en un enlace con latencia (WAN a 192.168.9.177) el tiempo de carga crece con
+el número de sentencias. En modo pipeline (libpq 14 o superior) psycopg 3 envía las sentencias
+del lote sin esperar cada respuesta y las recoge al sincronizar, con muchas en vuelo por conexión.
+
+QueryPipeline y CupsQueryPipeline son Query y CupsQuery sobre una conexión de psycopg 3: solo
+cambia el envío de los lotes (_enviar_lote), de modo que MotorMigracion y procesar_dataframe
+producen las mismas estadísticas y métricas por etapa. psycopg 3 prepara por sí mismo las
+sentencias repetidas, por eso se desactiva SentenciaPreparada. Sus llamadas no pasan por
+instrumentacion_bd (que envuelve cursores de psycopg2).
+
+psycopg 3 es opcional (pip install "psycopg[binary]>=3.1"); sin él conectar() lanza ImportError.
+"""
+from typing import Dict, List
+
+from Query import Query
+from cups_query import CupsQuery
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+BACKENDS = ("psycopg2", "pipeline")
+
+
+def verificar_disponible():
+    """Lanza ImportError si falta psycopg 3 o su libpq no admite el modo pipeline."""
+    if psycopg is None:
+        raise ImportError('El backend "pipeline" requiere psycopg 3: pip install "psycopg[binary]>=3.1"')
+    if not psycopg.Pipeline.is_supported():
+        raise ImportError('El backend "pipeline" requiere libpq 14 o superior')
+
+
+def conectar(host: str, port: int, database: str, user: str, password: str, connect_timeout: int = 10):
+    """Conexión de psycopg 3 con los mismos parámetros que psycopg2.connect en la aplicación."""
+    verificar_disponible()
+    return psycopg.connect(host=host, port=port, dbname=database, user=user, password=password,
+                           connect_timeout=connect_timeout)
+
+
+class QueryPipeline(Query):
+    """Query sobre psycopg 3: cada lote de la migración se envía en modo pipeline."""
+
+    def __init__(self, conn):
+        """
+        Args:
+            conn: Conexión de psycopg 3 (ver conectar); la cierra quien la abrió.
+        """
+        super().__init__(conn=conn, preparar=False)
+
+    def _enviar_lote(self, cursor, registros: List[Dict], tamano_pagina: int, tabla: str = None):
+        with self.conn.pipeline():
+            cursor.executemany(self._sql_insertar(tabla=tabla), [self._valores_solicitud(r) for r in registros])
+
+
+class CupsQueryPipeline(CupsQuery):
+    """CupsQuery sobre psycopg 3: los INSERT y UPDATE de procesar_dataframe van en modo pipeline."""
+
+    def __init__(self, conn):
+        """
+        Args:
+            conn: Conexión de psycopg 3 (ver conectar); la cierra quien la abrió.
+        """
+        super().__init__(conn=conn, preparar=False)
+
+    def _enviar_lote(self, cursor, sql: str, registros: List[tuple]):
+        with self.conn.pipeline():
+            cursor.executemany(sql, registros)
@@ -1,6 +1,14 @@
 import pandas as pd
 import os
-from typing import Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import chain, islice
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+def _ejecutar_carga(lector: 'CupsDataReader', metodo: str) -> pd.DataFrame:
+    """Ejecuta un método de carga del lector (punto de entrada para los procesos del pool)."""
+    return getattr(lector, metodo)()
+
 
 class CupsDataReader:
     """
@@ -8,15 +16,33 @@ class CupsDataReader:
     Maneja dos tipos de archivos:
     1. Exámenes que requieren preparación especial
     2. Exámenes para remitir a laboratorios de referencia
+    
+    Los encabezados se detectan leyendo solo las primeras filas en modo streaming
+    (openpyxl read-only) y el cuerpo se lee una sola vez, conservando solo las columnas necesarias.
     """
+    
+    # Formatos que openpyxl puede leer en modo streaming; el resto (.xls) se lee con pandas
+    _EXTENSIONES_STREAMING = ('.xlsx', '.xlsm', '.xltx', '.xltm')
+    
+    # Fuentes independientes del catálogo: (atributo con la ruta, método de carga).
+    # Se cargan en paralelo y se combinan al terminar todas.
+    _FUENTES = (
+        ('ruta_preparacion', '_cargar_preparacion'),
+        ('ruta_remitidos', '_cargar_remitidos'),
+    )
+    
+    # Filas revisadas al buscar la fila de encabezados
+    _FILAS_SONDEO_PREPARACION = 5
+    _FILAS_SONDEO_REMITIDOS = 11
 
-    def __init__(self, ruta_preparacion: str = None, ruta_remitidos: str = None):
+    def __init__(self, ruta_preparacion: str = None, ruta_remitidos: str = None, paralelo: bool = True):
         """
         Inicializa el lector de datos CUPS.
         
         Args:
             ruta_preparacion: Ruta al archivo "NOMBRES Y CUPS DE EXAMENES QUE REQUIEREN PREPARACION.xlsx"
             ruta_remitidos: Ruta al archivo "F-OS048 Exámenes para remitir a laboratorios de referencia.xlsx"
+            paralelo: Si es True, los archivos se leen simultáneamente en un pool de procesos
         """
         script_dir = os.path.dirname(os.path.abspath(__file__))
         
@@ -27,10 +53,71 @@ class CupsDataReader:
         
         self.ruta_preparacion = ruta_preparacion
         self.ruta_remitidos = ruta_remitidos
+        self.paralelo = paralelo
         self._df_preparacion: Optional[pd.DataFrame] = None
         self._df_remitidos: Optional[pd.DataFrame] = None
         self._df_combinado: Optional[pd.DataFrame] = None
 
+    @contextmanager
+    def _abrir_libro(self, ruta: str):
+        """
+        Abre un libro Excel y retorna (nombres_hojas, filas) donde filas(hoja) es un
+        iterador perezoso de tuplas de valores. Con openpyxl en modo read-only solo se
+        parsean las filas que realmente se consumen.
+        """
+        if ruta.lower().endswith(self._EXTENSIONES_STREAMING):
+            import openpyxl
+            libro = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+            try:
+                yield libro.sheetnames, lambda hoja: libro[hoja].iter_rows(values_only=True)
+            finally:
+                libro.close()
+        else:
+            with pd.ExcelFile(ruta) as xls:
+                def filas(hoja):
+                    df = pd.read_excel(xls, sheet_name=hoja, header=None)
+                    for fila in df.itertuples(index=False, name=None):
+                        yield tuple(None if pd.isna(v) else v for v in fila)
+                yield xls.sheet_names, filas
+
+    @staticmethod
+    def _valor_celda(valor):
+        """Normaliza un valor de celda: vacíos a NaN y códigos numéricos (903801.0) a entero."""
+        if valor is None:
+            return float('nan')
+        if isinstance(valor, float) and valor.is_integer():
+            return int(valor)
+        return valor
+
+    def _leer_cuerpo(self, filas: Iterator[tuple], columnas: Dict[str, int]) -> pd.DataFrame:
+        """Lee las filas restantes conservando solo las columnas indicadas ({nombre: índice})."""
+        nombres = list(columnas.keys())
+        indices = [columnas[n] for n in nombres]
+        datos = []
+        for fila in filas:
+            valores = [fila[i] if i < len(fila) else None for i in indices]
+            if all(v is None for v in valores):
+                continue  # Fila en blanco
+            datos.append([self._valor_celda(v) for v in valores])
+        return pd.DataFrame(datos, columns=nombres)
+
+    @staticmethod
+    def _texto_fila(fila: tuple) -> str:
+        """Une los valores no vacíos de una fila en un solo texto."""
+        return ' '.join(str(v) for v in fila if v is not None and not (isinstance(v, float) and pd.isna(v)))
+
+    def _mapear_columnas(self, encabezados: tuple,
+                         clasificar: Callable[[str], Optional[str]]) -> Dict[str, int]:
+        """Asigna a cada columna destino el índice de la primera columna que la clasifica."""
+        columnas = {}
+        for idx, valor in enumerate(encabezados):
+            if valor is None:
+                continue
+            destino = clasificar(str(valor).strip())
+            if destino and destino not in columnas:
+                columnas[destino] = idx
+        return columnas
+
     def _cargar_preparacion(self) -> pd.DataFrame:
         """
         Carga el archivo de exámenes que requieren preparación especial.
@@ -41,68 +128,56 @@ class CupsDataReader:
         
         print(f"Cargando archivo de preparación: {self.ruta_preparacion}")
         
+        def clasificar(col: str) -> Optional[str]:
+            col_lower = col.lower()
+            if 'codigo' in col_lower or 'cups' in col_lower:
+                return 'codigo_cups'
+            if 'nombre' in col_lower or 'estudio' in col_lower:
+                return 'nombre_estudio'
+            return None
+        
         try:
-            # Leer el Excel sin encabezados
-            df = pd.read_excel(self.ruta_preparacion, sheet_name=0, header=None)
-            
-            # Buscar la fila que contiene los encabezados (nombre_estudio, codigo_cups)
-            fila_encabezados = None
-            for idx in range(min(5, len(df))):  # Buscar en las primeras 5 filas
-                fila = df.iloc[idx]
-                valores_fila = [str(val).lower().strip() for val in fila.values if pd.notna(val)]
-                if 'nombre' in ' '.join(valores_fila) and ('codigo' in ' '.join(valores_fila) or 'cups' in ' '.join(valores_fila)):
-                    fila_encabezados = idx
-                    break
-            
-            if fila_encabezados is None:
-                # Si no encontramos encabezados, asumir que están en la fila 1
-                fila_encabezados = 1
-            
-            # El archivo tiene encabezados en la fila encontrada
-            # Las columnas son: nombre_estudio, codigo_cups
-            if len(df.columns) >= 2 and len(df) > fila_encabezados:
-                # Obtener los nombres de las columnas de la fila de encabezados
-                fila_enc = df.iloc[fila_encabezados]
-                nombres_columnas = [str(col).strip().lower() if pd.notna(col) else f'col_{i}' 
-                                   for i, col in enumerate(fila_enc.values)]
-                
-                # Asignar nombres de columnas
-                df.columns = nombres_columnas
+            with self._abrir_libro(self.ruta_preparacion) as (hojas, filas_hoja):
+                filas = iter(filas_hoja(hojas[0]))
                 
-                # Eliminar las filas hasta la fila de encabezados (incluyendo la fila de encabezados)
-                df = df.iloc[fila_encabezados + 1:].reset_index(drop=True)
+                # Buscar la fila de encabezados (nombre_estudio, codigo_cups) solo en las primeras filas
+                superiores = list(islice(filas, self._FILAS_SONDEO_PREPARACION))
+                fila_encabezados = None
+                for idx, fila in enumerate(superiores):
+                    texto = self._texto_fila(fila).lower()
+                    if 'nombre' in texto and ('codigo' in texto or 'cups' in texto):
+                        fila_encabezados = idx
+                        break
                 
-                # Normalizar nombres de columnas
-                columnas_map = {}
-                for col in df.columns:
-                    col_lower = str(col).lower()
-                    if 'codigo' in col_lower or 'cups' in col_lower:
-                        columnas_map[col] = 'codigo_cups'
-                    elif 'nombre' in col_lower or 'estudio' in col_lower:
-                        columnas_map[col] = 'nombre_estudio'
+                if fila_encabezados is None:
+                    # Si no encontramos encabezados, asumir que están en la fila 1
+                    fila_encabezados = 1
                 
-                df.rename(columns=columnas_map, inplace=True)
+                if len(superiores) <= fila_encabezados:
+                    print(f"  [ERROR] El archivo no tiene suficientes filas")
+                    return pd.DataFrame(columns=['codigo_cups', 'nombre_estudio', 'preparacion_especial'])
                 
-                # Asegurar que tenemos las columnas necesarias
-                if 'codigo_cups' in df.columns and 'nombre_estudio' in df.columns:
-                    # Limpiar datos
-                    df = df[['codigo_cups', 'nombre_estudio']].copy()
-                    df['codigo_cups'] = df['codigo_cups'].astype(str).str.strip()
-                    df['nombre_estudio'] = df['nombre_estudio'].astype(str).str.strip()
-                    df['preparacion_especial'] = True  # Todos requieren preparación
-                    
-                    # Eliminar filas vacías
-                    df = df[df['codigo_cups'].notna() & (df['codigo_cups'] != '')].copy()
-                    df = df[df['nombre_estudio'].notna() & (df['nombre_estudio'] != '')].copy()
-                    
-                    print(f"  [OK] Cargados {len(df)} registros de preparacion")
-                    return df
-                else:
-                    print(f"  [ERROR] No se encontraron las columnas esperadas. Columnas: {list(df.columns)}")
+                columnas = self._mapear_columnas(superiores[fila_encabezados], clasificar)
+                if 'codigo_cups' not in columnas or 'nombre_estudio' not in columnas:
+                    print(f"  [ERROR] No se encontraron las columnas esperadas. "
+                          f"Encabezados: {list(superiores[fila_encabezados])}")
                     return pd.DataFrame(columns=['codigo_cups', 'nombre_estudio', 'preparacion_especial'])
-            else:
-                print(f"  [ERROR] El archivo no tiene suficientes columnas")
-                return pd.DataFrame(columns=['codigo_cups', 'nombre_estudio', 'preparacion_especial'])
+                
+                # Leer el cuerpo una sola vez, continuando después de la fila de encabezados
+                df = self._leer_cuerpo(chain(superiores[fila_encabezados + 1:], filas),
+                                       {c: columnas[c] for c in ('codigo_cups', 'nombre_estudio')})
+            
+            # Limpiar datos
+            df['codigo_cups'] = df['codigo_cups'].astype(str).str.strip()
+            df['nombre_estudio'] = df['nombre_estudio'].astype(str).str.strip()
+            df['preparacion_especial'] = True  # Todos requieren preparación
+            
+            # Eliminar filas vacías
+            df = df[df['codigo_cups'].notna() & (df['codigo_cups'] != '')].copy()
+            df = df[df['nombre_estudio'].notna() & (df['nombre_estudio'] != '')].copy()
+            
+            print(f"  [OK] Cargados {len(df)} registros de preparacion")
+            return df
                 
         except Exception as e:
             print(f"  [ERROR] Error al leer archivo de preparacion: {e}")
@@ -118,81 +193,77 @@ class CupsDataReader:
         
         print(f"Cargando archivo de remitidos: {self.ruta_remitidos}")
         
+        def clasificar(col: str) -> Optional[str]:
+            col_str = col.upper()
+            # Buscar columna CUPS
+            if 'CUPS' in col_str:
+                return 'codigo_cups'
+            # Buscar columna ESTUDIO (pero no PROCESO PRE-ANALITICO)
+            if 'ESTUDIO' in col_str and 'PRE' not in col_str and 'ANALITICO' not in col_str:
+                return 'nombre_estudio'
+            return None
+        
         try:
-            # Leer el Excel
-            xls = pd.ExcelFile(self.ruta_remitidos)
-            
-            # Buscar la hoja correcta (puede ser "ACTUALIZACION" o similar)
-            hoja_correcta = None
-            for nombre_hoja in xls.sheet_names:
-                df_temp = pd.read_excel(xls, sheet_name=nombre_hoja, nrows=10)
-                # Buscar la fila que contiene "CUPS" en alguna columna
-                for idx, row in df_temp.iterrows():
-                    row_str = ' '.join([str(val) for val in row.values if pd.notna(val)]).upper()
-                    if 'CUPS' in row_str and 'ESTUDIO' in row_str:
-                        hoja_correcta = nombre_hoja
-                        fila_encabezados = idx
+            with self._abrir_libro(self.ruta_remitidos) as (hojas, filas_hoja):
+                # Buscar la hoja correcta (puede ser "ACTUALIZACION" o similar) leyendo solo sus primeras filas
+                hoja_correcta, filas, superiores, fila_encabezados = None, None, [], None
+                for nombre_hoja in hojas:
+                    filas = iter(filas_hoja(nombre_hoja))
+                    superiores = list(islice(filas, self._FILAS_SONDEO_REMITIDOS))
+                    for idx, fila in enumerate(superiores):
+                        texto = self._texto_fila(fila).upper()
+                        if 'CUPS' in texto and 'ESTUDIO' in texto:
+                            hoja_correcta, fila_encabezados = nombre_hoja, idx
+                            break
+                    if hoja_correcta:
                         break
-                if hoja_correcta:
-                    break
-            
-            if hoja_correcta is None:
-                # Intentar con la primera hoja
-                hoja_correcta = xls.sheet_names[0]
-                fila_encabezados = 6  # Basado en la estructura observada
-            
-            print(f"  Usando hoja: {hoja_correcta}, fila de encabezados: {fila_encabezados}")
+                
+                if hoja_correcta is None:
+                    # Intentar con la primera hoja
+                    hoja_correcta = hojas[0]
+                    fila_encabezados = 6  # Basado en la estructura observada
+                    filas = iter(filas_hoja(hoja_correcta))
+                    superiores = list(islice(filas, self._FILAS_SONDEO_REMITIDOS))
+                
+                print(f"  Usando hoja: {hoja_correcta}, fila de encabezados: {fila_encabezados}")
+                
+                if len(superiores) <= fila_encabezados:
+                    print(f"  [ERROR] No se pudieron mapear las columnas CUPS y ESTUDIO")
+                    return pd.DataFrame(columns=['codigo_cups', 'nombre_estudio', 'remitido'])
+                
+                columnas = self._mapear_columnas(superiores[fila_encabezados], clasificar)
+                
+                # Si no encontramos las columnas, intentar con la fila siguiente
+                if not columnas and len(superiores) > fila_encabezados + 1:
+                    fila_encabezados += 1
+                    columnas = self._mapear_columnas(superiores[fila_encabezados], clasificar)
+                
+                if not columnas:
+                    print(f"  [ERROR] No se pudieron mapear las columnas CUPS y ESTUDIO")
+                    return pd.DataFrame(columns=['codigo_cups', 'nombre_estudio', 'remitido'])
+                
+                if 'codigo_cups' not in columnas or 'nombre_estudio' not in columnas:
+                    print(f"  [ERROR] No se encontraron las columnas esperadas. "
+                          f"Encabezados: {list(superiores[fila_encabezados])}")
+                    return pd.DataFrame(columns=['codigo_cups', 'nombre_estudio', 'remitido'])
+                
+                # Leer el cuerpo una sola vez, solo con las columnas necesarias
+                df = self._leer_cuerpo(chain(superiores[fila_encabezados + 1:], filas),
+                                       {c: columnas[c] for c in ('codigo_cups', 'nombre_estudio')})
             
-            # Leer desde la fila de encabezados
-            df = pd.read_excel(xls, sheet_name=hoja_correcta, header=fila_encabezados)
+            df['codigo_cups'] = df['codigo_cups'].astype(str).str.strip()
+            df['nombre_estudio'] = df['nombre_estudio'].astype(str).str.strip()
+            df['remitido'] = True  # Todos son remitidos
             
-            # Buscar columnas relevantes (CUPS y ESTUDIO)
-            columnas_map = {}
-            for col in df.columns:
-                col_str = str(col).upper().strip()
-                # Buscar columna CUPS
-                if 'CUPS' in col_str:
-                    columnas_map[col] = 'codigo_cups'
-                # Buscar columna ESTUDIO (pero no PROCESO PRE-ANALITICO)
-                elif 'ESTUDIO' in col_str and 'PRE' not in col_str and 'ANALITICO' not in col_str:
-                    columnas_map[col] = 'nombre_estudio'
+            # Eliminar filas vacías o con valores NaN
+            df = df[df['codigo_cups'].notna() & (df['codigo_cups'] != '') & (df['codigo_cups'] != 'nan')].copy()
+            df = df[df['nombre_estudio'].notna() & (df['nombre_estudio'] != '') & (df['nombre_estudio'] != 'nan')].copy()
             
-            # Si no encontramos las columnas, intentar buscar en los valores de la primera fila
-            if not columnas_map and len(df) > 0:
-                primera_fila = df.iloc[0]
-                for idx, val in enumerate(primera_fila):
-                    val_str = str(val).upper().strip() if pd.notna(val) else ''
-                    col_name = df.columns[idx]
-                    if 'CUPS' in val_str:
-                        columnas_map[col_name] = 'codigo_cups'
-                    elif 'ESTUDIO' in val_str and 'PRE' not in val_str:
-                        columnas_map[col_name] = 'nombre_estudio'
+            # Eliminar filas donde codigo_cups no sea numérico (filas de encabezado)
+            df = df[df['codigo_cups'].str.isdigit()].copy()
             
-            if columnas_map:
-                df.rename(columns=columnas_map, inplace=True)
-                
-                # Asegurar que tenemos las columnas necesarias
-                if 'codigo_cups' in df.columns and 'nombre_estudio' in df.columns:
-                    df = df[['codigo_cups', 'nombre_estudio']].copy()
-                    df['codigo_cups'] = df['codigo_cups'].astype(str).str.strip()
-                    df['nombre_estudio'] = df['nombre_estudio'].astype(str).str.strip()
-                    df['remitido'] = True  # Todos son remitidos
-                    
-                    # Eliminar filas vacías o con valores NaN
-                    df = df[df['codigo_cups'].notna() & (df['codigo_cups'] != '') & (df['codigo_cups'] != 'nan')].copy()
-                    df = df[df['nombre_estudio'].notna() & (df['nombre_estudio'] != '') & (df['nombre_estudio'] != 'nan')].copy()
-                    
-                    # Eliminar filas donde codigo_cups no sea numérico (filas de encabezado)
-                    df = df[df['codigo_cups'].str.isdigit()].copy()
-                    
-                    print(f"  [OK] Cargados {len(df)} registros de remitidos")
-                    return df
-                else:
-                    print(f"  [ERROR] No se encontraron las columnas esperadas. Columnas: {list(df.columns)}")
-                    return pd.DataFrame(columns=['codigo_cups', 'nombre_estudio', 'remitido'])
-            else:
-                print(f"  [ERROR] No se pudieron mapear las columnas CUPS y ESTUDIO")
-                return pd.DataFrame(columns=['codigo_cups', 'nombre_estudio', 'remitido'])
+            print(f"  [OK] Cargados {len(df)} registros de remitidos")
+            return df
                 
         except Exception as e:
             print(f"  [ERROR] Error al leer archivo de remitidos: {e}")
@@ -200,6 +271,33 @@ class CupsDataReader:
             traceback.print_exc()
             return pd.DataFrame(columns=['codigo_cups', 'nombre_estudio', 'remitido'])
 
+    def _cargar_fuentes(self) -> Dict[str, pd.DataFrame]:
+        """
+        Carga todas las fuentes de _FUENTES y retorna {método: DataFrame}.
+        El parseo de Excel es CPU-bound (el GIL impide paralelizarlo con hilos), por lo que
+        las fuentes con archivo existente se leen en procesos separados; si el pool no puede
+        usarse se cargan en secuencia.
+        """
+        existentes = [metodo for ruta_attr, metodo in self._FUENTES
+                      if getattr(self, ruta_attr) and os.path.exists(getattr(self, ruta_attr))]
+        
+        if self.paralelo and len(existentes) > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=len(existentes)) as pool:
+                    futuros = {metodo: pool.submit(_ejecutar_carga, self, metodo) for metodo in existentes}
+                    resultados = {metodo: futuro.result() for metodo, futuro in futuros.items()}
+            except Exception as e:
+                print(f"  [ADVERTENCIA] No se pudo cargar en paralelo ({e}); cargando en secuencia")
+                resultados = {}
+        else:
+            resultados = {}
+        
+        # Fuentes pendientes (o sin archivo: su método informa la advertencia y retorna vacío)
+        for _, metodo in self._FUENTES:
+            if metodo not in resultados:
+                resultados[metodo] = getattr(self, metodo)()
+        return resultados
+
     def cargar_datos(self) -> pd.DataFrame:
         """
         Carga ambos archivos y los combina en un solo DataFrame.
@@ -209,9 +307,10 @@ class CupsDataReader:
         print("Cargando datos de códigos CUPS...")
         print("=" * 60)
         
-        # Cargar ambos archivos
-        df_prep = self._cargar_preparacion()
-        df_rem = self._cargar_remitidos()
+        # Cargar ambos archivos (en paralelo) y combinar cuando terminen
+        resultados = self._cargar_fuentes()
+        df_prep = self._df_preparacion = resultados['_cargar_preparacion']
+        df_rem = self._df_remitidos = resultados['_cargar_remitidos']
         
         # Combinar los DataFrames
         # Primero, crear DataFrames completos con todas las columnas
@@ -28,6 +28,28 @@ class EmssanarDataReader:
         self.ruta_archivo = ruta_archivo
         self._df: Optional[pd.DataFrame] = None
         self._ruta_cache = f"{ruta_archivo}.pkl"
+        # De dónde salieron los datos en la última carga: 'cache' o 'excel'
+        self.origen: Optional[str] = None
+
+    @property
+    def cargado(self) -> bool:
+        """Indica si los datos ya están en memoria (la próxima consulta no lee el archivo)."""
+        return self._df is not None
+
+    @property
+    def ruta_origen(self) -> str:
+        """Archivo del que salieron los datos en la última carga (la caché o el Excel)."""
+        return self._ruta_cache if self.origen == 'cache' else self.ruta_archivo
+
+    @property
+    def datos(self) -> Optional[pd.DataFrame]:
+        """Datos cargados, indexados por doc_afiliado (None antes de cargar())."""
+        return self._df
+
+    def cargar(self) -> None:
+        """Carga los datos si aún no están en memoria."""
+        if self._df is None:
+            self._cargar_datos()
 
     def _cargar_datos(self) -> None:
         """Carga el archivo Excel en memoria solo con las columnas necesarias."""
@@ -36,10 +58,12 @@ class EmssanarDataReader:
         
         # Verificar caché
         if self._cargar_desde_cache():
+            self.origen = 'cache'
             return
 
         print("Leyendo archivo Excel, por favor espere...")
         self._cargar_desde_excel()
+        self.origen = 'excel'
 
     def _cargar_desde_cache(self) -> bool:
         """Intenta cargar desde caché pickle si es válida."""
@@ -0,0 +1,92 @@
+"""
+Sentencias preparadas en el servidor (PREPARE / EXECUTE) para las consultas frecuentes de
+Query y CupsQuery.
+
+psycopg2 interpola los parámetros en el cliente y envía cada sentencia como texto, de modo
+que el servidor la analiza y planifica en cada llamada. Una SentenciaPreparada se prepara una
+vez por conexión (en la primera ejecución) y luego se ejecuta con EXECUTE, reutilizando el
+análisis y, tras unas ejecuciones, el plan genérico. Las sentencias preparadas viven en la
+sesión: no se deshacen con el rollback y desaparecen al cerrar la conexión.
+
+Se desactivan con CLINIZAD_SENTENCIAS_PREPARADAS=0 (o preparar=False en Query/CupsQuery), p. ej.
+detrás de un pgbouncer en modo transacción, donde la sesión del servidor cambia entre llamadas.
+"""
+import hashlib
+import os
+import threading
+import weakref
+from typing import Dict, Optional, Sequence, Set
+
+import psycopg2
+
+# Valor por defecto de preparar en Query y CupsQuery
+PREPARADAS_HABILITADAS = os.environ.get("CLINIZAD_SENTENCIAS_PREPARADAS", "1") != "0"
+
+# Conexión -> nombres de las sentencias ya preparadas en su sesión
+_preparadas: "weakref.WeakKeyDictionary[object, Set[str]]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _preparadas_de(conn) -> Set[str]:
+    with _lock:
+        preparadas = _preparadas.get(conn)
+        if preparadas is None:
+            preparadas = _preparadas[conn] = set()
+        return preparadas
+
+
+class SentenciaPreparada:
+    """Una sentencia con marcadores %s que se ejecuta como PREPARE/EXECUTE en cada conexión."""
+
+    _por_sql: Dict[str, "SentenciaPreparada"] = {}
+
+    def __init__(self, nombre: str, sql: str):
+        """
+        Args:
+            nombre: Nombre de la sentencia en el servidor (identificador SQL, único por sentencia).
+            sql: Sentencia con marcadores %s (sin %% literales).
+        """
+        self.nombre = nombre
+        self.sql = sql
+        partes = sql.rstrip().rstrip(";").split("%s")
+        self.parametros = len(partes) - 1
+        self._sql_servidor = "".join(parte + (f"${i}" if i <= self.parametros else "")
+                                     for i, parte in enumerate(partes, start=1))
+
+    @classmethod
+    def para(cls, prefijo: str, sql: str) -> "SentenciaPreparada":
+        """
+        Sentencia compartida para un texto SQL, para las consultas que se arman según los filtros:
+        cada combinación de filtros es una sentencia distinta, con nombre prefijo_<hash del SQL>.
+        """
+        with _lock:
+            sentencia = cls._por_sql.get(sql)
+            if sentencia is None:
+                sufijo = hashlib.md5(sql.encode("utf-8")).hexdigest()[:12]
+                sentencia = cls._por_sql[sql] = cls(f"{prefijo}_{sufijo}", sql)
+            return sentencia
+
+    def ejecutar(self, cursor, valores: Sequence = (), preparar: Optional[bool] = None):
+        """
+        Ejecuta la sentencia en el cursor; la prepara antes si su conexión aún no la tiene.
+
+        Args:
+            preparar: False para enviarla como texto (cursor.execute normal); None toma
+                PREPARADAS_HABILITADAS.
+        """
+        if not (PREPARADAS_HABILITADAS if preparar is None else preparar):
+            cursor.execute(self.sql, valores)
+            return
+        preparadas = _preparadas_de(cursor.connection)
+        if self.nombre not in preparadas:
+            cursor.execute(f"PREPARE {self.nombre} AS {self._sql_servidor}")
+            preparadas.add(self.nombre)
+        marcadores = f" ({', '.join(['%s'] * self.parametros)})" if self.parametros else ""
+        try:
+            cursor.execute(f"EXECUTE {self.nombre}{marcadores}", valores)
+        except psycopg2.Error as e:
+            # invalid_sql_statement_name: la sesión la perdió (DEALLOCATE, DISCARD ALL); se
+            # vuelve a preparar en la próxima llamada
+            if e.pgcode == "26000":
+                preparadas.discard(self.nombre)
+            raise
@@ -0,0 +1,276 @@
+"""
+Servicio de ingesta: vigila una carpeta y migra los libros de Emssanar que llegan a ella.
+
+Cada archivo .xlsx nuevo espera a que su tamaño y fecha de modificación no cambien
+durante --espera segundos (copia terminada), entra a una cola y se migra con MotorMigracion
+(EmssanarDataReader -> Query) en un pool de --concurrentes hilos. Al terminar se mueve a
+la carpeta de procesados, o a la de cuarentena si sus datos fallaron o tuvo registros
+rechazados, junto con un .json con sus estadísticas. Un archivo interrumpido por la detención
+del servicio se queda en la entrada y se reintenta al volver a iniciar; uno que falló por la
+conexión con la base se queda también y se reintenta con espera creciente (las solicitudes
+ya insertadas se omiten).
+
+Ejemplo (Programador de tareas de Windows "al iniciar el sistema", o systemd en Linux):
+    python servicio_ingesta.py --entrada D:\\Emssanar\\entrada --host 127.0.0.1 --concurrentes 2
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Optional, Set, Tuple
+
+import psycopg2
+
+from migrar_cli import agregar_argumento_prometheus, agregar_argumentos_conexion, crear_motor, \
+    exportar_prometheus_ejecucion, preparar_esquema, validar_backend
+from pipeline_bd import psycopg
+
+logger = logging.getLogger("servicio_ingesta")
+
+# Fallas de la conexión o del servidor (no de los datos del archivo): el archivo se reintenta
+ERRORES_CONEXION = (psycopg2.OperationalError, psycopg2.InterfaceError)
+if psycopg is not None:
+    ERRORES_CONEXION += (psycopg.OperationalError, psycopg.InterfaceError)
+
+
+class CanalLogging:
+    """Canal de progreso que envía el log del motor al logger del servicio, con el archivo como prefijo."""
+
+    _NIVELES = {'error': logging.ERROR, 'advertencia': logging.WARNING}
+
+    def __init__(self, nombre: str):
+        self._nombre = nombre
+
+    def progreso(self, valor: float, texto: str = ""):
+        pass
+
+    def estado(self, texto: str):
+        pass
+
+    def stat(self, clave: str, valor):
+        pass
+
+    def log(self, mensaje: str, tipo: str = "info"):
+        logger.log(self._NIVELES.get(tipo, logging.INFO), "[%s] %s", self._nombre, mensaje)
+
+
+class ServicioIngesta:
+    """Vigila la carpeta de entrada y migra cada libro estable con concurrencia acotada."""
+
+    # EmssanarDataReader lee con openpyxl, que no abre el formato .xls
+    EXTENSIONES = ('.xlsx',)
+
+    def __init__(self, entrada: str, procesados: str, cuarentena: str, crear_motor_archivo,
+                 intervalo: float = 5.0, espera: float = 10.0, concurrentes: int = 2,
+                 prometheus: Optional[str] = None, reintento_max: float = 900.0):
+        """
+        Args:
+            crear_motor_archivo: Fábrica (canal, cancelado) -> MotorMigracion; se crea un motor
+                por archivo para que cada uno compare contra el estado actual de la base.
+            intervalo: Segundos entre revisiones de la carpeta.
+            espera: Segundos que tamaño y fecha deben mantenerse para considerar la copia terminada.
+            concurrentes: Archivos que se migran a la vez.
+            prometheus: Archivo .prom que se reescribe con las métricas del último archivo migrado.
+            reintento_max: Segundos máximos de espera antes de reintentar un archivo que falló por
+                la conexión (la espera empieza en `intervalo` y se duplica en cada fallo).
+        """
+        self.entrada = os.path.abspath(entrada)
+        self.procesados = os.path.abspath(procesados)
+        self.cuarentena = os.path.abspath(cuarentena)
+        self._crear_motor = crear_motor_archivo
+        self.intervalo = intervalo
+        self.espera = espera
+        self.prometheus = prometheus
+        self.reintento_max = reintento_max
+        self._pool = ThreadPoolExecutor(max_workers=max(1, concurrentes))
+        self._vistos: Dict[str, Tuple[int, float, float]] = {}
+        self._en_proceso: Set[str] = set()
+        # Archivo -> (fallos de conexión seguidos, instante monotónico desde el que se reintenta)
+        self._reintentos: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        for carpeta in (self.entrada, self.procesados, self.cuarentena):
+            os.makedirs(carpeta, exist_ok=True)
+
+    def detener(self):
+        """Pide detener el servicio; los archivos en curso terminan su lote actual."""
+        self._detener.set()
+
+    def ejecutar(self):
+        """Ciclo principal: revisa la carpeta hasta que se llame detener()."""
+        logger.info("Vigilando %s (procesados: %s, cuarentena: %s)", self.entrada, self.procesados, self.cuarentena)
+        try:
+            while not self._detener.is_set():
+                try:
+                    for ruta in self._archivos_listos():
+                        with self._lock:
+                            self._en_proceso.add(ruta)
+                        self._pool.submit(self._procesar, ruta)
+                except OSError as e:
+                    logger.error("No se pudo revisar la carpeta de entrada: %s", e)
+                self._detener.wait(self.intervalo)
+        finally:
+            logger.info("Deteniendo: esperando los archivos en curso...")
+            self._pool.shutdown(wait=True)
+            logger.info("Servicio detenido")
+
+    def _archivos_listos(self):
+        """Archivos cuyo tamaño y fecha no cambiaron durante `espera` segundos (y no están en curso)."""
+        ahora = time.monotonic()
+        presentes = set()
+        listos = []
+        for nombre in sorted(os.listdir(self.entrada)):
+            ruta = os.path.join(self.entrada, nombre)
+            # ~$ son los archivos de bloqueo que deja Excel con el libro abierto
+            if nombre.startswith("~$") or not nombre.lower().endswith(self.EXTENSIONES) or not os.path.isfile(ruta):
+                continue
+            presentes.add(ruta)
+            with self._lock:
+                if ruta in self._en_proceso:
+                    continue
+                reintento = self._reintentos.get(ruta)
+            if reintento is not None and ahora < reintento[1]:
+                continue
+            estado = os.stat(ruta)
+            firma = (estado.st_size, estado.st_mtime)
+            anterior = self._vistos.get(ruta)
+            if anterior is None or anterior[:2] != firma:
+                self._vistos[ruta] = (*firma, ahora)
+                continue
+            if ahora - anterior[2] >= self.espera and self._se_puede_abrir(ruta):
+                del self._vistos[ruta]
+                listos.append(ruta)
+        for ruta in set(self._vistos) - presentes:
+            del self._vistos[ruta]
+        with self._lock:
+            for ruta in set(self._reintentos) - presentes - self._en_proceso:
+                del self._reintentos[ruta]
+        return listos
+
+    @staticmethod
+    def _se_puede_abrir(ruta: str) -> bool:
+        """En Windows un archivo que aún se está copiando no puede abrirse."""
+        try:
+            with open(ruta, "rb"):
+                return True
+        except OSError:
+            return False
+
+    def _procesar(self, ruta: str):
+        nombre = os.path.basename(ruta)
+        inicio = datetime.now()
+        stats: Optional[Dict] = None
+        error = None
+        try:
+            logger.info("[%s] Iniciando", nombre)
+            motor = self._crear_motor(CanalLogging(nombre), self._detener.is_set)
+            stats = motor.migrar_archivo(ruta)
+            if self.prometheus:
+                with self._lock:
+                    exportar_prometheus_ejecucion(stats, self.prometheus)
+        except ERRORES_CONEXION as e:
+            with self._lock:
+                fallos = self._reintentos.get(ruta, (0, 0.0))[0] + 1
+                espera = min(self.intervalo * 2 ** fallos, self.reintento_max)
+                self._reintentos[ruta] = (fallos, time.monotonic() + espera)
+                self._en_proceso.discard(ruta)
+            logger.warning("[%s] Falla de conexión con la base (%s); se reintentará en %.0f s",
+                           nombre, str(e).strip(), espera)
+            return
+        except Exception as e:
+            error = str(e).strip()
+            logger.error("[%s] Error crítico: %s", nombre, error)
+
+        try:
+            if stats is not None and stats['cancelado']:
+                logger.warning("[%s] Interrumpido; se reintentará en el próximo inicio", nombre)
+                return
+            with self._lock:
+                self._reintentos.pop(ruta, None)
+            fallido = error is not None or stats['total'] == 0 or stats['errores'] > 0
+            destino = self.cuarentena if fallido else self.procesados
+            self._archivar(ruta, destino, inicio, stats, error)
+            logger.info("[%s] Movido a %s", nombre, "cuarentena" if fallido else "procesados")
+        except OSError as e:
+            logger.error("[%s] No se pudo mover el archivo: %s", nombre, e)
+        finally:
+            with self._lock:
+                self._en_proceso.discard(ruta)
+
+    @staticmethod
+    def _archivar(ruta: str, carpeta: str, inicio: datetime, stats: Optional[Dict], error: Optional[str]):
+        """Mueve el archivo con marca de tiempo, deja su .json de estadísticas y borra la caché pickle."""
+        base = f"{inicio.strftime('%Y%m%d-%H%M%S')}_{os.path.basename(ruta)}"
+        destino = os.path.join(carpeta, base)
+        shutil.move(ruta, destino)
+        with open(f"{destino}.json", "w", encoding="utf-8") as archivo:
+            json.dump({'inicio': inicio.isoformat(timespec='seconds'),
+                       'fin': datetime.now().isoformat(timespec='seconds'),
+                       'estadisticas': stats, 'error': error}, archivo, ensure_ascii=False, indent=2)
+        cache = f"{ruta}.pkl"
+        if os.path.exists(cache):
+            os.remove(cache)
+
+
+def _configurar_logging(ruta_log: Optional[str]):
+    formato = logging.Formatter("%(asctime)s %(levelname)-8s %(message)s", "%Y-%m-%d %H:%M:%S")
+    manejadores = [logging.StreamHandler(sys.stderr)]
+    if ruta_log:
+        os.makedirs(os.path.dirname(os.path.abspath(ruta_log)), exist_ok=True)
+        manejadores.append(RotatingFileHandler(ruta_log, maxBytes=5_000_000, backupCount=5, encoding="utf-8"))
+    for manejador in manejadores:
+        manejador.setFormatter(formato)
+        for destino in (logger, logging.getLogger("consultas_lentas")):
+            destino.addHandler(manejador)
+    logger.setLevel(logging.INFO)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Vigila una carpeta y migra los libros de Emssanar que llegan.")
+    carpetas = parser.add_argument_group("carpetas")
+    carpetas.add_argument("--entrada", required=True, help="Carpeta donde se dejan los archivos")
+    carpetas.add_argument("--procesados", help="Destino de los archivos migrados (por defecto <entrada>/procesados)")
+    carpetas.add_argument("--cuarentena", help="Destino de los archivos fallidos (por defecto <entrada>/cuarentena)")
+    agregar_argumentos_conexion(parser)
+    servicio = parser.add_argument_group("servicio")
+    servicio.add_argument("--concurrentes", type=int, default=2, help="Archivos que se migran a la vez")
+    servicio.add_argument("--intervalo", type=float, default=5.0, help="Segundos entre revisiones de la carpeta")
+    servicio.add_argument("--espera", type=float, default=10.0,
+                          help="Segundos sin cambios antes de considerar completa una copia")
+    servicio.add_argument("--reintento-max", type=float, default=900.0,
+                          help="Segundos máximos entre reintentos de un archivo que falló por la conexión")
+    servicio.add_argument("--log", help="Archivo de log rotativo (además de stderr)")
+    agregar_argumento_prometheus(servicio)
+    args = parser.parse_args(argv)
+    validar_backend(parser, args)
+
+    _configurar_logging(args.log)
+    preparar_esquema(args, CanalLogging("esquema"))
+    servicio_ingesta = ServicioIngesta(
+        entrada=args.entrada,
+        procesados=args.procesados or os.path.join(args.entrada, "procesados"),
+        cuarentena=args.cuarentena or os.path.join(args.entrada, "cuarentena"),
+        crear_motor_archivo=lambda canal, cancelado: crear_motor(args, canal, cancelado),
+        intervalo=args.intervalo,
+        espera=args.espera,
+        concurrentes=args.concurrentes,
+        prometheus=args.prometheus,
+        reintento_max=args.reintento_max
+    )
+    signal.signal(signal.SIGINT, lambda *_: servicio_ingesta.detener())
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda *_: servicio_ingesta.detener())
+    servicio_ingesta.ejecutar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+-- Script para crear/verificar la tabla migration_runs (historial de ejecuciones)
+-- La aplicación la crea sola en la primera migración o carga CUPS; este script es
+-- para crearla de antemano o con un usuario que sí tenga permisos de DDL
+
+-- Una fila por migración (proceso = 'migracion') o carga CUPS (proceso = 'cups')
+CREATE TABLE IF NOT EXISTS migration_runs (
+    id SERIAL PRIMARY KEY,
+    proceso VARCHAR(20) NOT NULL,
+    archivo VARCHAR,
+    hash_archivo CHAR(64),              -- SHA-256 del contenido del (los) archivo(s)
+    usuario VARCHAR(100),
+    equipo VARCHAR(100),
+    inicio TIMESTAMP NOT NULL,
+    fin TIMESTAMP NOT NULL,
+    duracion_s NUMERIC(12, 3),
+    etapas JSONB,                       -- segundos por etapa: lectura, deduplicacion, carga...
+    filas_leidas INTEGER DEFAULT 0,
+    insertados INTEGER DEFAULT 0,
+    actualizados INTEGER DEFAULT 0,
+    omitidos INTEGER DEFAULT 0,         -- duplicados (ya existían)
+    fallidos INTEGER DEFAULT 0,
+    filas_por_segundo NUMERIC(12, 1),
+    cancelado BOOLEAN DEFAULT FALSE,
+    error VARCHAR
+);
+
+CREATE INDEX IF NOT EXISTS idx_migration_runs_proceso_inicio ON migration_runs (proceso, inicio DESC);
+
+-- Velocidad por semana, para detectar regresiones
+SELECT
+    proceso,
+    date_trunc('week', inicio) AS semana,
+    COUNT(*) AS ejecuciones,
+    ROUND(AVG(filas_por_segundo), 1) AS filas_por_segundo_promedio,
+    ROUND(AVG((etapas->>'carga')::numeric), 2) AS carga_s_promedio
+FROM migration_runs
+GROUP BY proceso, semana
+ORDER BY proceso, semana DESC;
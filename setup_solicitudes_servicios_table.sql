@@ -0,0 +1,65 @@
+-- Script para crear/verificar la tabla solicitudes_servicios y sus índices
+-- Es el mismo esquema que crea la aplicación (esquema_solicitudes.GestorEsquema) al arrancar
+-- o con migrar_cli.py --crear-esquema. Ejecutar en psql fuera de una transacción:
+-- CREATE INDEX CONCURRENTLY no bloquea las inserciones pero no admite BEGIN/COMMIT
+-- Tabla particionada por fecha_autorizacion_1: migrar_cli.py --particionar mensual|anual
+-- (en ella CONCURRENTLY no se admite sobre la tabla: sus índices los crea la aplicación o
+-- migrar_cli.py --crear-esquema, partición por partición)
+
+CREATE TABLE IF NOT EXISTS solicitudes_servicios (
+    id SERIAL PRIMARY KEY,
+    codigo_servicio_completo VARCHAR(50),
+    doc_afiliado VARCHAR(30),
+    numero_solicitud VARCHAR(50) NOT NULL,
+    cod_diag VARCHAR(20),
+    desc_diag VARCHAR,
+    clasificacion_servicios_acceso VARCHAR,
+    descr_servicio_1 VARCHAR,
+    estado_solicitud VARCHAR(50),
+    num_autorizacion VARCHAR(50),
+    fecha_autorizacion_1 TIMESTAMP,
+    ips_asignada VARCHAR,
+    ciudad_ips_asignada VARCHAR(100),
+    cantidad INTEGER,
+    primer_nom VARCHAR(100),
+    segundo_nom VARCHAR(100),
+    primer_ape VARCHAR(100),
+    segundo_ape VARCHAR(100),
+    edad_anios INTEGER,
+    estado_solicitud_2 VARCHAR(50),
+    ips_solicitante VARCHAR
+);
+
+-- Antes del índice único: números de solicitud repetidos (deben depurarse, si no falla)
+SELECT numero_solicitud, COUNT(*) AS veces
+FROM solicitudes_servicios
+GROUP BY numero_solicitud
+HAVING COUNT(*) > 1
+ORDER BY veces DESC
+LIMIT 50;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_solicitudes_servicios_numero_solicitud
+    ON solicitudes_servicios (numero_solicitud);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_solicitudes_servicios_doc_afiliado
+    ON solicitudes_servicios (doc_afiliado);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_solicitudes_servicios_fecha_autorizacion
+    ON solicitudes_servicios (fecha_autorizacion_1);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_solicitudes_servicios_estado
+    ON solicitudes_servicios (estado_solicitud);
+
+ANALYZE solicitudes_servicios;
+
+-- Índices y su validez (una creación interrumpida deja el índice inválido: DROP INDEX
+-- CONCURRENTLY y volver a crearlo)
+SELECT c.relname AS indice, i.indisunique AS unico, i.indisvalid AS valido
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+WHERE i.indrelid = 'solicitudes_servicios'::regclass
+ORDER BY c.relname;
+
+-- Con la tabla particionada: particiones, su rango y filas estimadas
+SELECT c.relname AS particion, pg_get_expr(c.relpartbound, c.oid) AS rango, c.reltuples::bigint AS filas
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'solicitudes_servicios'::regclass
+ORDER BY c.relname;